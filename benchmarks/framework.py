@@ -0,0 +1,93 @@
+"""Per-call and per-batch latency of the framework models, as the
+dimensionality D and the number of mixed models K grow.
+
+The framework needs `pypolychord`; without it these benchmarks are
+skipped.
+
+Run with `asv run`, or `asv dev -b framework` for a quick look.
+"""
+import numpy as np
+
+from .proposals import BATCH, BOUNDS, COMPONENTS, DIMENSIONS, _peak_allocation
+
+
+def _import_models():
+    try:
+        from supernest.framework import gaussian_models, mixtures
+    except ImportError as e:
+        raise NotImplementedError(f'The framework is unavailable: {e}')
+    return gaussian_models, mixtures
+
+
+class _ModelBenchmark:
+    """Shared timings. Subclasses build `self.model` in `setup`."""
+
+    def _points(self):
+        rng = np.random.default_rng(0)
+        nDims = self.model.dimensionality
+        self.cube = rng.uniform(size=nDims)
+        self.cubes = rng.uniform(size=(BATCH, nDims))
+        self.theta = self.model.prior_quantile(self.cube)
+        self.thetas = self.model.prior_quantile_batch(self.cubes)
+
+    def time_prior_quantile(self, *params):
+        self.model.prior_quantile(self.cube)
+
+    def time_prior_quantile_batch(self, *params):
+        self.model.prior_quantile_batch(self.cubes)
+
+    def time_log_likelihood(self, *params):
+        self.model.log_likelihood(self.theta)
+
+    def time_log_likelihood_batch(self, *params):
+        self.model.log_likelihood_batch(self.thetas)
+
+    def peakmem_log_likelihood_batch(self, *params):
+        self.model.log_likelihood_batch(self.thetas)
+
+    def track_log_likelihood_batch_allocations(self, *params):
+        return _peak_allocation(self.model.log_likelihood_batch, self.thetas)
+
+    track_log_likelihood_batch_allocations.unit = 'bytes'
+
+
+def _covariance(D):
+    return np.diag(np.random.default_rng(0).uniform(0.5, 2, D))
+
+
+class PowerPosterior(_ModelBenchmark):
+    params = [DIMENSIONS]
+    param_names = ['D']
+
+    def setup(self, D):
+        gaussian_models, _ = _import_models()
+        self.model = gaussian_models.PowerPosteriorPrior(
+            BOUNDS, np.zeros(D), _covariance(D))
+        self._points()
+
+
+class Resizeable(_ModelBenchmark):
+    params = [DIMENSIONS]
+    param_names = ['D']
+
+    def setup(self, D):
+        gaussian_models, _ = _import_models()
+        self.model = gaussian_models.ResizeablePrior(
+            BOUNDS, np.zeros(D), _covariance(D))
+        self._points()
+
+
+class StochasticMixture(_ModelBenchmark):
+    params = [DIMENSIONS, COMPONENTS, ['scan', 'cumulative']]
+    param_names = ['D', 'K', 'selection']
+    timeout = 300
+
+    def setup(self, D, K, selection):
+        gaussian_models, mixtures = _import_models()
+        rng = np.random.default_rng(0)
+        covariance = _covariance(D)
+        models = [gaussian_models.GaussianPeakedPrior(
+            BOUNDS, rng.normal(size=D), covariance) for _ in range(K)]
+        self.model = mixtures.StochasticMixtureModel(models,
+                                                     selection=selection)
+        self._points()
@@ -0,0 +1,22 @@
+"""Start-up cost of `import supernest` and of the framework, which every
+MPI rank and pool worker pays. Each is timed in a fresh interpreter.
+
+Run with `asv run`, or `asv dev -b imports` for a quick look.
+"""
+
+
+def timeraw_import_supernest():
+    return 'import supernest'
+
+
+def timeraw_import_framework():
+    return 'import supernest.framework'
+
+
+def timeraw_first_proposal():
+    return """
+    import numpy as np
+    import supernest as sn
+    sn.gaussian_proposal((-1, 1), np.zeros(2), np.eye(2)).prior(
+        np.full(2, 0.5))
+    """
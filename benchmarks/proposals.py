@@ -0,0 +1,122 @@
+"""Per-call and per-batch latency of the proposals, as the
+dimensionality D and the number of superimposed components K grow.
+
+`peakmem_` benchmarks report the peak resident memory of the process;
+`track_*_allocations` report the peak bytes allocated by one batch
+call, as measured by `tracemalloc`.
+
+Run with `asv run`, or `asv dev -b proposals` for a quick look.
+"""
+import tracemalloc
+
+import numpy as np
+import supernest as sn
+
+BOUNDS = (-10, 10)
+BATCH = 1000
+DIMENSIONS = [2, 10, 100, 500]
+COMPONENTS = [2, 10, 100]
+QUANTILES = ['exact', 'tabulated']
+
+
+def _gaussian_loglike(theta):
+    return -theta @ theta / 2, []
+
+
+def _gaussian_loglike_batch(thetas):
+    return -(thetas * thetas).sum(axis=-1) / 2, np.empty((len(thetas), 0))
+
+
+LOGLIKE = sn.proposals.Likelihood(_gaussian_loglike,
+                                  _gaussian_loglike_batch)
+
+
+def _peak_allocation(func, *args):
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _covmat(nDims, rng):
+    factor = rng.normal(size=(nDims, nDims)) / np.sqrt(nDims)
+    return factor @ factor.T + np.eye(nDims)
+
+
+class _ProposalBenchmark:
+    """Shared timings. Subclasses build `self.proposal` in `setup`."""
+
+    def _points(self, nDims):
+        rng = np.random.default_rng(0)
+        self.cube = rng.uniform(size=nDims)
+        self.cubes = rng.uniform(size=(BATCH, nDims))
+        self.theta = self.proposal.prior(self.cube)
+        self.thetas = self.proposal.prior.batch(self.cubes)
+
+    def time_prior(self, *params):
+        self.proposal.prior(self.cube)
+
+    def time_prior_batch(self, *params):
+        self.proposal.prior.batch(self.cubes)
+
+    def time_likelihood(self, *params):
+        self.proposal.likelihood(self.theta)
+
+    def time_likelihood_batch(self, *params):
+        self.proposal.likelihood.batch(self.thetas)
+
+    def peakmem_prior_batch(self, *params):
+        self.proposal.prior.batch(self.cubes)
+
+    def track_prior_batch_allocations(self, *params):
+        return _peak_allocation(self.proposal.prior.batch, self.cubes)
+
+    track_prior_batch_allocations.unit = 'bytes'
+
+    def track_likelihood_batch_allocations(self, *params):
+        return _peak_allocation(self.proposal.likelihood.batch, self.thetas)
+
+    track_likelihood_batch_allocations.unit = 'bytes'
+
+
+class GaussianProposal(_ProposalBenchmark):
+    params = [DIMENSIONS, QUANTILES]
+    param_names = ['D', 'quantile']
+
+    def setup(self, D, quantile):
+        rng = np.random.default_rng(0)
+        self.proposal = sn.gaussian_proposal(BOUNDS, rng.normal(size=D),
+                                             _covmat(D, rng), LOGLIKE,
+                                             quantile=quantile)
+        self._points(D)
+
+
+class TruncatedGaussianProposal(_ProposalBenchmark):
+    params = [DIMENSIONS, QUANTILES]
+    param_names = ['D', 'quantile']
+
+    def setup(self, D, quantile):
+        rng = np.random.default_rng(0)
+        self.proposal = sn.truncated_gaussian_proposal(
+            BOUNDS, rng.normal(size=D), np.diag(rng.uniform(0.5, 2, D)),
+            LOGLIKE, quantile=quantile)
+        self._points(D)
+
+
+class Superposition(_ProposalBenchmark):
+    params = [DIMENSIONS, COMPONENTS]
+    param_names = ['D', 'K']
+    timeout = 300
+
+    def setup(self, D, K):
+        rng = np.random.default_rng(0)
+        # One covariance for all the components keeps the setup cheap at
+        # large D; the components differ in their means.
+        covmat = _covmat(D, rng)
+        proposals = [sn.gaussian_proposal(BOUNDS, rng.normal(size=D),
+                                          covmat, LOGLIKE)
+                     for _ in range(K)]
+        self.proposal = sn.superimpose(proposals, nDims=D)
+        self._points(self.proposal.nDims)
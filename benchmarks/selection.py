@@ -0,0 +1,37 @@
+"""Cost of picking a component in `superimpose` as K grows.
+
+Run with `asv run`, or `asv dev -b selection` for a quick look.
+"""
+import numpy as np
+import supernest as sn
+
+
+class ComponentSelection:
+    params = ([2, 10, 100, 1000], ['scan', 'cumulative'])
+    param_names = ['K', 'selection']
+
+    def setup(self, K, selection):
+        nDims = 2
+        proposals = [sn.gaussian_proposal((-10, 10), np.zeros(nDims) + i / K,
+                                          np.eye(nDims))
+                     for i in range(K)]
+        self.proposal = sn.superimpose(proposals, nDims=nDims,
+                                       selection=selection)
+        rng = np.random.default_rng(0)
+        self.cube = rng.uniform(size=self.proposal.nDims)
+        self.cubes = rng.uniform(size=(1000, self.proposal.nDims))
+        self.choice = self.cubes[:, nDims:-1]
+        self.rand = sn.utils.hash_to_uniform(self.cubes[:, :nDims])
+
+    def time_prior(self, K, selection):
+        self.proposal.prior(self.cube)
+
+    def time_prior_batch(self, K, selection):
+        self.proposal.prior.batch(self.cubes)
+
+    def time_choice_batch(self, K, selection):
+        if selection == 'scan':
+            sn.utils.first_exceeded(sn.utils.choice_probabilities(self.choice),
+                                    self.rand)
+        else:
+            sn.utils.cumulative_choice(self.choice, self.rand)
@@ -1,9 +1,10 @@
-import anesthetic
 import argparse
-import sys
-from itertools import takewhile, filterfalse
+import glob
+import os
+from itertools import islice, takewhile, filterfalse
 import numpy as np
 from pprint import pformat
+from supernest.moments import WeightedMoments, shrink
 
 known_derived = {
     "As",
@@ -22,19 +23,28 @@ known_primary = {"ns", "logA", "theta_MC_100", "ombh2", "omch2", "tau"}
 
 
 def main(**ka):
-    if ka["nested"]:
-        sa = anesthetic.NestedSamples(root=ka["nested"])
-    elif ka["mcmc"]:
-        sa = anesthetic.MCMCSamples(root=ka["mcmc"])
-    else:
+    root = ka["nested"] or ka["mcmc"]
+    if not root:
         print("Provide input.")
+        return
 
     removed_pars = (
         known_derived.union(ambiguous)
-        .union(ka.pop("removed_params", {}))
-        .difference(ka.pop("kept_params", {}))
+        .union(ka.pop("remove") or ())
+        .difference(ka.pop("keep") or ())
     )
-    cp, m, cv = params(sa, removed_pars)
+    if ka["stream"]:
+        cp, m, cv = stream_params(root, removed_pars, ka["chunk_size"])
+    else:
+        import anesthetic
+
+        if ka["nested"]:
+            sa = anesthetic.NestedSamples(root=root)
+        else:
+            sa = anesthetic.MCMCSamples(root=root)
+        cp, m, cv = params(sa, removed_pars)
+    if ka["shrinkage"]:
+        cv = shrink(cv, ka["shrinkage"])
 
     if ka["cobaya"]:
         print(f"covmat_params: {cp}")
@@ -43,11 +53,11 @@ def main(**ka):
     elif ka["supercosmo"]:
         raise NotImplementedError()
     elif ka["numpy"]:
-        print(np.array(m.values()))
-        np.savetxt(
-            "means.npy", np.array([v for v in m.values()])
-        )  # To whomever designed Python dictionaries. Please stop.
-        np.savetxt("covmat.npy", cv)
+        means = np.array(list(m.values()))
+        print(means)
+        np.save("means.npy", means)
+        np.save("covmat.npy", cv)
+        np.savez("covmat.npz", params=np.array(cp), mean=means, covmat=cv)
     else:
         for p, e in zip(cp, np.linalg.eigvals(cv)):
             print(f"{p}: {e}")
@@ -62,11 +72,79 @@ def params(samples, removed_params):
         )
     ]
     mean = {x: samples[x].mean() for x in covmat_params}
-    cov = samples.cov()
-    covmat = np.array([[cov[x][y] for x in covmat_params] for y in covmat_params])
+    covmat = samples.cov().loc[covmat_params, covmat_params].to_numpy()
     return covmat_params, mean, covmat
 
 
+def chain_files(root):
+    """The getdist-format chains of `root`: `root.txt` (as written by
+    PolyChord), `root_1.txt`, ... or `root.1.txt`, ... (as written by
+    cobaya), or the same with `.npy` in place of `.txt`."""
+    for ext in (".npy", ".txt"):
+        files = sorted(
+            glob.glob(root + ext)
+            + glob.glob(f"{root}_[0-9]*{ext}")
+            + glob.glob(f"{root}.[0-9]*{ext}")
+        )
+        if files:
+            return files
+    raise FileNotFoundError(f"No chains found for `{root}`.")
+
+
+def param_names(root, chain):
+    """Names of the parameter columns, from `root.paramnames`, or from
+    the header line of a cobaya chain. Derived parameters are marked
+    by getdist with a trailing `*`, which is dropped."""
+    if os.path.exists(root + ".paramnames"):
+        with open(root + ".paramnames") as f:
+            return [line.split()[0].rstrip("*") for line in f if line.strip()]
+    with open(chain) as f:
+        header = f.readline()
+    if not header.startswith("#"):
+        raise FileNotFoundError(f"No `{root}.paramnames`, and no header in {chain}")
+    return header[1:].split()[2:]
+
+
+def read_chunks(chain, chunk_size):
+    """Yield (N, 2 + nParams) blocks of at most `chunk_size` rows of a
+    chain. A `.npy` chain is memory-mapped, a text chain is parsed
+    `chunk_size` lines at a time, so neither is loaded whole."""
+    if chain.endswith(".npy"):
+        data = np.load(chain, mmap_mode="r")
+        for start in range(0, len(data), chunk_size):
+            yield np.asarray(data[start : start + chunk_size])
+        return
+    with open(chain) as f:
+        lines = (line for line in f if line.strip() and not line.startswith("#"))
+        chunk = list(islice(lines, chunk_size))
+        while chunk:
+            yield np.loadtxt(chunk, ndmin=2)
+            chunk = list(islice(lines, chunk_size))
+
+
+def stream_params(root, removed_params, chunk_size):
+    """Like `params`, but reads the weighted chains of `root` in chunks
+    of `chunk_size` rows, and accumulates the moments as it goes,
+    instead of loading the samples with anesthetic. The columns are
+    the weight, -log L (or -log posterior), then the parameters."""
+    files = chain_files(root)
+    names = param_names(root, files[0])
+    covmat_params = [
+        x
+        for x in filterfalse(
+            lambda y: y in removed_params,
+            takewhile(lambda s: not s.startswith("chi2_"), names),
+        )
+    ]
+    columns = 2 + np.array([names.index(x) for x in covmat_params], dtype=int)
+    moments = WeightedMoments(len(covmat_params))
+    for chain in files:
+        for chunk in read_chunks(chain, chunk_size):
+            moments.update(chunk[:, columns], chunk[:, 0])
+    mean = dict(zip(covmat_params, moments.mean.tolist()))
+    return covmat_params, mean, moments.covariance
+
+
 def parse_arguments():
     d = (
         "Extract the covariance matrices as well as means in a"
@@ -93,6 +171,23 @@ def parse_arguments():
     out_kind.add_argument(
         "-N", "--numpy", action="store_true", help="Output in numpy format"
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="read the weighted chains in chunks, rather than with anesthetic.",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100000,
+        help="the number of rows read at a time with `--stream`.",
+    )
+    parser.add_argument(
+        "--shrinkage",
+        type=float,
+        default=0,
+        help="shrink the correlations by this fraction, in [0, 1].",
+    )
     parser.add_argument(
         "-k",
         "--keep",
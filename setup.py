@@ -23,7 +23,8 @@ setuptools.setup(
     long_description=LONG_DESCRIPTION,
     long_description_content_type='text/markdown',
     url='https://gitlab.com/a-p-petrosyan/sspr',
-    install_requires=['anesthetic', 'numpy', 'matplotlib'],
+    install_requires=['anesthetic', 'numpy', 'scipy', 'matplotlib'],
+    extras_require={'numba': ['numba']},
     tests_require=['pytest', 'hypothesis[numpy]'],
     packages=setuptools.find_packages(),
     license='LGPLv3',
@@ -14,4 +14,7 @@ waiting until the full release.
 from .core import superimpose
 from .proposals import gaussian_proposal
 from .proposals import truncated_gaussian_proposal
+from .proposals import correlated_truncated_gaussian_proposal
+from .proposals import gaussian_mixture_proposal
+from .proposals import AdaptiveProposal
 from .proposals.types import Proposal
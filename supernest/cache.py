@@ -0,0 +1,414 @@
+r"""Memoisation of expensive likelihoods.
+
+Nested samplers evaluate bit-for-bit identical parameter vectors more
+often than one might expect: after a resume, across repeated benchmark
+runs, and whenever a point is re-proposed. `CachedLikelihood` keeps the
+most recently used results in memory, keyed by the raw bytes of theta,
+so that these repeats cost a dictionary lookup.
+
+Caching is opt-in. Wrap the likelihood (or the proposal's corrected
+likelihood) with `cached`, and keep an eye on `stats`.
+
+For results that should outlive the process, e.g. benchmark sweeps and
+PolyChord restarts, `LikelihoodStore` keeps every evaluation in a local
+SQLite file, keyed by a fingerprint of the model and the bytes of theta.
+Wrap the likelihood with `stored` to consult it before evaluating.
+"""
+import functools
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from types import FunctionType, ModuleType
+
+import numpy as np
+
+from supernest.proposals.types import (Likelihood, CorrectedLikelihood,
+                                       as_likelihood_batch)
+
+
+def theta_key(theta):
+    """Bytes identifying a parameter vector exactly."""
+    return np.ascontiguousarray(theta, dtype='<f8').tobytes()
+
+
+class CachedLikelihood(Likelihood):
+    r"""A likelihood whose results are kept in a bounded LRU cache.
+
+    Parameters
+    ----------
+    log_like_callable: callable
+        The likelihood to wrap. It must return `(logL, derived)`.
+
+    max_entries: int, optional
+        Largest number of results to keep. Defaults to 100000.
+
+    max_bytes: int, optional
+        Largest (approximate) memory footprint of the cache. The least
+        recently used results are evicted once either limit is
+        exceeded.
+    The derived parameters are always returned as a float64 array,
+    whether they come from the cache or from the wrapped function.
+    """
+
+    def __init__(self, log_like_callable, max_entries=100000,
+                 max_bytes=None):
+        """Create."""
+        super().__init__(log_like_callable)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def __call__(self, theta):
+        """Look up theta, and evaluate the wrapped function on a miss."""
+        key = theta_key(theta)
+        try:
+            logl, phi = self._entries[key]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return logl, phi.copy()
+        logl, phi = self.loglikelihood(theta)
+        phi = np.array(phi, dtype=np.float64)
+        self._store(key, logl, phi)
+        return logl, phi.copy()
+
+    def batch(self, thetas):
+        """Look up an (N, nDims) array, evaluating the misses together."""
+        thetas = np.atleast_2d(thetas)
+        keys = [theta_key(t) for t in thetas]
+        logl = np.empty(len(thetas))
+        found, missing = {}, []
+        for i, key in enumerate(keys):
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                found[i] = self._entries[key]
+            else:
+                missing.append(i)
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        phi = None
+        if missing:
+            new_logl, new_phi = as_likelihood_batch(self.loglikelihood)(
+                thetas[missing])
+            phi = np.empty((len(thetas), new_phi.shape[1]))
+            logl[missing], phi[missing] = new_logl, new_phi
+            for i, ll, ph in zip(missing, new_logl, new_phi):
+                self._store(keys[i], ll, ph)
+        for i, (ll, ph) in found.items():
+            if phi is None:
+                phi = np.empty((len(thetas), len(ph)))
+            logl[i], phi[i] = ll, ph
+        return logl, phi if phi is not None else np.empty((0, 0))
+
+    def _store(self, key, logl, phi):
+        phi = np.array(phi, dtype=np.float64)
+        if key in self._entries:
+            return
+        self._entries[key] = (logl, phi)
+        self.nbytes += _entry_size(key, phi)
+        while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.nbytes > self.max_bytes):
+            old_key, (_, old_phi) = self._entries.popitem(last=False)
+            self.nbytes -= _entry_size(old_key, old_phi)
+            self.evictions += 1
+
+    @property
+    def stats(self):
+        """Hit, miss and eviction counters, and the current size."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries), 'nbytes': self.nbytes}
+
+    def clear(self):
+        """Drop every cached result, and reset the counters."""
+        self._entries.clear()
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def __repr__(self):
+        """Representation."""
+        return f"Cached likelihood wrapping {repr(self.loglikelihood)}"
+
+
+def _entry_size(key, phi):
+    # Key, result and derived parameters, plus dictionary overhead.
+    return len(key) + phi.nbytes + 8 + 100
+
+
+def cached(likelihood, **kwargs):
+    r"""Wrap a likelihood in a `CachedLikelihood`.
+
+    For a `CorrectedLikelihood` only the original, expensive,
+    likelihood is cached, and the cheap correction is still applied on
+    top, so a cache can be shared between proposals that correct the
+    same likelihood.
+
+    Parameters
+    ----------
+    likelihood: callable
+        A `Likelihood`, `CorrectedLikelihood` or any callable
+        returning `(logL, derived)`.
+
+    **kwargs:
+        Passed on to `CachedLikelihood`.
+    """
+    if isinstance(likelihood, CorrectedLikelihood):
+        return CorrectedLikelihood(cached(likelihood.original, **kwargs),
+                                   likelihood.correction)
+    return CachedLikelihood(likelihood, **kwargs)
+
+
+def fingerprint(*objects):
+    r"""A hex digest identifying the contents of `objects`.
+
+    Arrays contribute their dtype, shape and bytes, containers their
+    elements, functions their qualified name (and, for bound methods,
+    the object they are bound to), partials their function and
+    arguments, and other objects their class and public attributes, or
+    their `repr` if they have none. An object with a string attribute
+    `fingerprint`, e.g. a `StoredLikelihood`, contributes that instead.
+    The `settings` attribute of framework models is skipped, since the
+    sampler settings do not change the likelihood.
+
+    Raises
+    ------
+    ValueError
+        If any of `objects` is, or contains, a lambda, a closure or a
+        function defined inside another. Those are only known by
+        name, which two different functions, e.g. two closures made by
+        one factory over different data, can share. Fingerprint the
+        data they close over instead, or give the key explicitly.
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        _update_digest(digest, obj, set())
+    return digest.hexdigest()
+
+
+def _update_digest(digest, obj, seen):
+    if isinstance(obj, np.ndarray):
+        digest.update(f'{obj.dtype.str}{obj.shape}'.encode())
+        digest.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f'{type(obj).__name__}{len(obj)}'.encode())
+        for item in obj:
+            _update_digest(digest, item, seen)
+    elif isinstance(obj, dict):
+        digest.update(f'dict{len(obj)}'.encode())
+        for key in sorted(obj, key=repr):
+            digest.update(repr(key).encode())
+            _update_digest(digest, obj[key], seen)
+    elif isinstance(getattr(obj, 'fingerprint', None), str):
+        digest.update(f'fingerprint{obj.fingerprint}'.encode())
+    elif isinstance(obj, functools.partial):
+        digest.update(b'partial')
+        _update_digest(digest, (obj.func, obj.args, obj.keywords), seen)
+    elif callable(obj) and hasattr(obj, '__qualname__'):
+        if isinstance(obj, FunctionType) and (
+                obj.__closure__ or '<' in obj.__qualname__):
+            raise ValueError(f'Cannot fingerprint {obj.__qualname__}: '
+                             'lambdas, closures and local functions are '
+                             'only known by name. Pass an explicit '
+                             'fingerprint.')
+        digest.update(f'{obj.__module__}.{obj.__qualname__}'.encode())
+        bound_to = getattr(obj, '__self__', None)
+        if bound_to is not None and not isinstance(bound_to, ModuleType):
+            _update_digest(digest, bound_to, seen)
+    elif hasattr(obj, '__dict__'):
+        if id(obj) in seen:
+            return
+        seen.add(id(obj))
+        digest.update(type(obj).__qualname__.encode())
+        public = {k: v for k, v in vars(obj).items()
+                  if not k.startswith('_') and k != 'settings'}
+        _update_digest(digest, public, seen)
+    else:
+        digest.update(repr(obj).encode())
+
+
+class LikelihoodStore:
+    r"""An append-only store of likelihood evaluations in SQLite.
+
+    Every process (or thread) gets its own connection to the file,
+    which is in write-ahead-log mode, so that parallel runs can read
+    and append concurrently. A result, once stored, is never
+    overwritten. The store can be pickled, and reconnects lazily on
+    the other side.
+
+    Parameters
+    ----------
+    path: str
+        Location of the SQLite file. Created if it doesn't exist.
+
+    timeout: float
+        Seconds to wait for a lock held by another writer.
+    """
+
+    def __init__(self, path, timeout=60.0):
+        """Open."""
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS evaluations ('
+                'fingerprint TEXT NOT NULL, theta BLOB NOT NULL, '
+                'logl REAL, derived BLOB NOT NULL, '
+                'PRIMARY KEY (fingerprint, theta)) WITHOUT ROWID')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def lookup(self, fingerprint, keys):
+        """Map those `keys` that are in the store to `(logL, derived)`."""
+        found = {}
+        connection = self._connection()
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = connection.execute(
+                'SELECT theta, logl, derived FROM evaluations '
+                'WHERE fingerprint = ? AND theta IN '
+                f'({", ".join("?" * len(chunk))})', [fingerprint, *chunk])
+            for key, logl, derived in rows:
+                found[key] = (np.nan if logl is None else logl,
+                              np.frombuffer(derived, dtype='<f8').copy())
+        return found
+
+    def insert(self, fingerprint, items):
+        """Append `(key, logL, derived)` items, keeping existing results."""
+        with self._connection() as connection:
+            connection.executemany(
+                'INSERT OR IGNORE INTO evaluations VALUES (?, ?, ?, ?)',
+                [(fingerprint, key, float(logl),
+                  np.ascontiguousarray(phi, dtype='<f8').tobytes())
+                 for key, logl, phi in items])
+
+    def __len__(self):
+        """Number of stored evaluations."""
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM evaluations').fetchone()[0]
+
+    def __getstate__(self):
+        """Pickle without the connections."""
+        return {'path': self.path, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        """Unpickle, to reconnect on first use."""
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def __repr__(self):
+        """Representation."""
+        return f'LikelihoodStore({self.path!r})'
+
+
+class StoredLikelihood(Likelihood):
+    r"""A likelihood that consults a `LikelihoodStore` before evaluating.
+
+    Parameters
+    ----------
+    log_like_callable: callable
+        The likelihood to wrap. It must return `(logL, derived)`.
+
+    store: LikelihoodStore
+
+    fingerprint: str
+        Identifies the likelihood within the store. Results stored
+        under a different fingerprint are never returned. See
+        `fingerprint`.
+
+    As with `CachedLikelihood`, the derived parameters are always
+    returned as a float64 array.
+    """
+
+    def __init__(self, log_like_callable, store, fingerprint):
+        """Create."""
+        super().__init__(log_like_callable)
+        self.store = store
+        self.fingerprint = fingerprint
+        self.hits = self.misses = 0
+
+    def __call__(self, theta):
+        """Look up theta, and evaluate and store it on a miss."""
+        key = theta_key(theta)
+        found = self.store.lookup(self.fingerprint, [key])
+        if key in found:
+            self.hits += 1
+            return found[key]
+        self.misses += 1
+        logl, phi = self.loglikelihood(theta)
+        phi = np.array(phi, dtype=np.float64)
+        self.store.insert(self.fingerprint, [(key, logl, phi)])
+        return logl, phi
+
+    def batch(self, thetas):
+        """Look up an (N, nDims) array, evaluating the misses together."""
+        thetas = np.atleast_2d(thetas)
+        keys = [theta_key(t) for t in thetas]
+        found = self.store.lookup(self.fingerprint, keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        self.hits += len(thetas) - len(missing)
+        self.misses += len(missing)
+        logl = np.empty(len(thetas))
+        phi = None
+        if missing:
+            new_logl, new_phi = as_likelihood_batch(self.loglikelihood)(
+                thetas[missing])
+            phi = np.empty((len(thetas), new_phi.shape[1]))
+            logl[missing], phi[missing] = new_logl, new_phi
+            self.store.insert(self.fingerprint,
+                              [(keys[i], ll, ph) for i, ll, ph
+                               in zip(missing, new_logl, new_phi)])
+        for i, key in enumerate(keys):
+            if key in found:
+                ll, ph = found[key]
+                if phi is None:
+                    phi = np.empty((len(thetas), len(ph)))
+                logl[i], phi[i] = ll, ph
+        return logl, phi if phi is not None else np.empty((0, 0))
+
+    @property
+    def stats(self):
+        """Hit and miss counters."""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def __repr__(self):
+        """Representation."""
+        return f"Likelihood wrapping {repr(self.loglikelihood)} " + \
+            f"stored in {self.store}"
+
+
+def stored(likelihood, store, key=None):
+    r"""Wrap a likelihood in a `StoredLikelihood`.
+
+    As with `cached`, only the original of a `CorrectedLikelihood` is
+    stored, and the correction is applied on top. `store` may be a
+    `LikelihoodStore` or a path to one.
+
+    `key` is the fingerprint of the likelihood within the store. By
+    default it is `fingerprint(likelihood)`, which raises `ValueError`
+    for lambdas and closures: give those a `key` computed from the
+    data that they close over.
+    """
+    if not isinstance(store, LikelihoodStore):
+        store = LikelihoodStore(store)
+    if isinstance(likelihood, CorrectedLikelihood):
+        return CorrectedLikelihood(
+            stored(likelihood.original, store, key),
+            likelihood.correction)
+    if key is None:
+        key = fingerprint(likelihood)
+    return StoredLikelihood(likelihood, store, key)
@@ -9,15 +9,15 @@ superpositional mixture.  This is done via a functional interface for
 ease and portability.
 
 """
-import random
 import numpy as np
 import warnings
 import supernest.proposals as prop
+import supernest.utils as utils
 
 debug = False
 
 
-def superimpose(models: list, nDims: int = None):
+def superimpose(models: list, nDims: int = None, selection: str = 'scan'):
     r"""Superimpose functions for use in nested sampling packages.
 
     Parameters
@@ -49,6 +49,15 @@ def superimpose(models: list, nDims: int = None):
     the nDims that you would pass to PolyChord.Settings, and the
     run_polychord function.
 
+    selection='scan': str
+    How the component is picked from the choice parameters. 'scan'
+    compares a uniform deviate against every normalised choice
+    parameter in turn, and is O(K) per point. 'cumulative' treats the
+    choice parameters as weights, with whatever is left of unit
+    weight given to the last component, and locates the deviate among
+    their cumulative sums by bisection, in O(log K) per point.  Prefer
+    it when superimposing many proposals.
+
 
     Returns
     -------
@@ -56,42 +65,134 @@ def superimpose(models: list, nDims: int = None):
     returns a tuple of functions: the superposition of the prior
     quantiles and the likelihoods (in that order).
 
+    The prior also has a `batch` method, which accepts an (N, nDims +
+    len(models)) array of hypercube points and returns the (N, ...)
+    array of parameters in one call. The rows that picked the same
+    component are passed to that component's quantile together, so
+    components with a vectorised `batch` of their own are never
+    called point by point.
+
+    Both accept an optional `out` array of the shape of their output,
+    e.g. the sampler's own, into which the parameters, the choice
+    probabilities and the index are written directly, and which is
+    returned. It must not overlap the hypercube points.
+
+    Likewise, the likelihood has a `batch` method that accepts an (N,
+    nDims + len(models)) array of parameters. The rows are split by
+    the component index, each component's likelihood is called once
+    on its whole sub-batch, and the log-likelihoods and derived
+    parameters are returned in input order, as an (N,) and an (N,
+    nDerived) array respectively.
+
     """
+    if selection not in SELECTIONS:
+        raise ValueError(f'Unknown selection: {selection}. ' +
+                         'Expected \'scan\' or \'cumulative\'.')
     proposals = [prop.Proposal(*m) for m in models]
     priors = [p.prior for p in proposals]
     likes = [p.likelihood for p in proposals]
+    return prop.Proposal(
+        SuperimposedPrior(priors, selection),
+        SuperimposedLikelihood(likes),
+        nDims if nDims is None else nDims + len(models)
+    )
+
+
+SELECTIONS = ('scan', 'cumulative')
+
 
-    def prior_quantile(cube):
-        physical_params = cube[:-len(models)]
-        choice_params = cube[-len(models):-1]
-        index = 0
-        norm = choice_params.sum()
-        norm = 1 if norm == 0 or len(choice_params) == 1 else norm
-        probs = choice_params / norm
-        h = hash(tuple(physical_params))
-        random.seed(h)
-        rand = random.random()
-        for p in probs:
-            if rand > p:
-                break
-            index += 1
-
-        theta = priors[index](physical_params)
-        ret = np.array(np.concatenate([theta, probs, [index]]))
-        return ret
-
-    def likelihood(theta):
+class SuperimposedPrior(prop.Prior):
+    """The prior quantile of `superimpose`.
+
+    A class, rather than a closure, so that it can be pickled along
+    with the priors that it superimposes.
+    """
+
+    def __init__(self, priors, selection='scan'):
+        """Create."""
+        self.priors = priors
+        self.batch_priors = [prop.as_batch(p) for p in priors]
+        self.selection = selection
+
+    def choose(self, choice_params, probs, rand):
+        """Index of the component picked by the deviate `rand`."""
+        if self.selection == 'cumulative':
+            return utils.cumulative_choice(choice_params, rand)
+        return utils.first_exceeded(probs, rand)
+
+    def prior(self, cube, out=None):
+        """Prior quantile of one point."""
+        n = len(self.priors)
+        physical_params = cube[:-n]
+        choice_params = cube[-n:-1]
+        if out is None:
+            out = np.empty(len(cube))
+        probs = utils.choice_probabilities(choice_params, out=out[-n:-1])
+        rand = utils.hash_to_uniform(physical_params)
+        index = int(self.choose(choice_params, probs, rand))
+
+        out[:-n] = self.priors[index](physical_params)
+        out[-1] = index
+        return out
+
+    def _evaluate_batch(self, cubes, out=None):
+        n = len(self.priors)
+        cubes = np.atleast_2d(cubes)
+        physical_params = cubes[:, :-n]
+        choice_params = cubes[:, -n:-1]
+        if out is None:
+            out = np.empty(cubes.shape)
+        probs = utils.choice_probabilities(choice_params, out=out[:, -n:-1])
+        rand = utils.hash_to_uniform(physical_params)
+        indices = self.choose(choice_params, probs, rand)
+
+        out[:, -1] = indices
+        for index in np.unique(indices):
+            rows = indices == index
+            out[rows, :-n] = self.batch_priors[index](physical_params[rows])
+        return out
+
+    def __repr__(self):
+        """Representation."""
+        return 'Superposition of\n' + '\n'.join(repr(p)
+                                                 for p in self.priors)
+
+
+class SuperimposedLikelihood(prop.Likelihood):
+    """The likelihood of `superimpose`, which dispatches each point to
+    the likelihood of the component whose index is its last
+    parameter."""
+
+    def __init__(self, likes):
+        """Create."""
+        self.likes = likes
+        self.batch_likes = [prop.as_likelihood_batch(ll) for ll in likes]
+
+    def loglikelihood(self, theta):
+        """Log-likelihood of one point."""
+        n = len(self.likes)
         try:
-            physical_params = theta[:-len(models)]
+            physical_params = theta[:-n]
         except SystemError:
-            warnings.warn(f'theta = {theta} {theta[:-len(models)]}')
-            physical_params = theta[:-len(models)]
+            warnings.warn(f'theta = {theta} {theta[:-n]}')
+            physical_params = theta[:-n]
         index = int(theta[-1:].item())
-        ret = likes[index](physical_params)
-        return ret
-
-    return prop.Proposal(
-        prior_quantile,
-        likelihood,
-        nDims if nDims is None else nDims + len(models)
-    )
+        return self.likes[index](physical_params)
+
+    def _evaluate_batch(self, thetas):
+        thetas = np.atleast_2d(thetas)
+        physical_params = thetas[:, :-len(self.likes)]
+        indices = thetas[:, -1].astype(int)
+        logl, phi = np.empty(len(thetas)), np.empty((len(thetas), 0))
+        for n, index in enumerate(np.unique(indices)):
+            rows = indices == index
+            ll, ph = self.batch_likes[index](physical_params[rows])
+            if n == 0:
+                phi = np.empty((len(thetas), ph.shape[1]))
+            logl[rows], phi[rows] = ll, ph
+        return logl, phi
+
+    def __repr__(self):
+        """Representation."""
+        return 'Superposition of\n' + '\n'.join(repr(ll)
+                                                 for ll in self.likes)
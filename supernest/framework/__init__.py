@@ -18,4 +18,4 @@ If you need to write custom code, the functions in the same module
 provide a good example of how to subclass the Model, and therefore
 adapt the interface to your workflow.
 """
-from .polychord import Model
+from .polychord import Model, Settings
@@ -0,0 +1,69 @@
+"""This model runs a `supernest.proposals.AdaptiveProposal` in stages.
+Each stage is a complete nested sampling run, during which the
+proposal learns from the dead points, and between stages the proposal
+is rebuilt. A badly centred initial guess therefore costs only the
+first stage. See `supernest.proposals.adaptive` for why the proposal
+is never changed during a run, and what that means for the evidence.
+
+"""
+from .polychord import Model
+from ..proposals.types import as_batch, as_likelihood_batch
+
+
+class AdaptiveModel(Model):
+    """A model whose prior and likelihood are those of the current
+    proposal of `adaptive`. Pass `num_derived` if the likelihood that
+    it corrects has derived parameters.
+
+    """
+    default_file_root = 'AdaptiveModel'
+
+    def __str__(self):
+        return f'Adaptive model\n{self.adaptive}'
+
+    def __repr__(self):
+        return self.__str__().replace('\n', ' ')
+
+    def __init__(self, adaptive, num_derived=0, file_root=default_file_root,
+                 **kwargs):
+        self.adaptive = adaptive
+        self.nDims = adaptive.nDims
+        self.nDerived = num_derived
+        self.stages = []
+        super().__init__(self.dimensionality, self.num_derived, file_root,
+                         **kwargs)
+
+    def log_likelihood(self, theta):
+        return self.adaptive.likelihood(theta)
+
+    def prior_quantile(self, hypercube):
+        return self.adaptive.prior(hypercube)
+
+    def log_likelihood_batch(self, thetas):
+        return as_likelihood_batch(self.adaptive.likelihood)(thetas)
+
+    def prior_quantile_batch(self, hypercubes):
+        return as_batch(self.adaptive.prior)(hypercubes)
+
+    @property
+    def num_derived(self):
+        return self.nDerived
+
+    def nested_sample(self, backend='polychord', stages=2, file_root=None,
+                      **kwargs):
+        """Run `stages` complete runs, rebuilding the proposal between
+        them. The output of every stage is kept in `self.stages`, in
+        order, and that of the last stage is returned. The stages are
+        written under `{file_root}_{stage}`.
+
+        """
+        file_root = self.settings.file_root if file_root is None \
+            else file_root
+        self.stages = []
+        for stage in range(stages):
+            if stage:
+                self.adaptive.rebuild()
+            self.stages.append(super().nested_sample(
+                backend, dumper=self.adaptive,
+                file_root=f'{file_root}_{stage}', **kwargs))
+        return self.stages[-1]
@@ -0,0 +1,360 @@
+"""This module contains the sampler backends of the framework. Each
+backend knows how to run a `Model` with one nested sampler, and
+returns the same `(output, samples)` pair as `Model.nested_sample`,
+so that the same model can be run under each sampler and the
+throughput compared on identical problems.
+
+Select the backend per call, either by name
+
+    model.nested_sample(backend='ultranest', live_points=400)
+
+or by passing a configured instance
+
+    model.nested_sample(backend=DynestyBackend(pool=pool, queue_size=8))
+
+The samplers, and anesthetic, are only imported when a backend is run,
+so that importing the framework, e.g. in every MPI rank or pool
+worker, stays cheap.
+"""
+import os
+import typing
+
+import numpy as np
+
+from .. import instrument
+
+
+class SamplerOutput(typing.NamedTuple):
+    """The summary of a run. The names follow PolyChord's output, so
+    that code reading `output.logZ` works with any backend. The
+    sampler's own result object is kept in `raw`.
+
+    """
+    logZ: float
+    logZerr: float
+    nlike: int
+    ndead: int
+    nlive: int
+    raw: object = None
+
+
+class Backend:
+    """The base class of the sampler backends. Subclasses implement
+    `run`, which accepts the keyword arguments of
+    `Model.setup_settings`. Those that set `dumps` also accept a
+    `dumper`, which is called as PolyChord's dumper is.
+
+    """
+    name = None
+    dumps = False
+
+    def run(self, model, file_root=None, live_points=175, resume=True,
+            verbosity=0, seed=None):
+        """Run `model` and return `(output, samples)`."""
+        raise NotImplementedError()
+
+    @property
+    def fingerprint(self):
+        """Identifies the backend, and the options that change its
+        results, for `supernest.cache.fingerprint`. The pool, if any,
+        does not change them."""
+        from ..cache import fingerprint
+        return fingerprint(type(self).__qualname__,
+                           {k: v for k, v in vars(self).items()
+                            if k != 'pool'})
+
+    @staticmethod
+    def _file_root(model, file_root):
+        return model.settings.file_root if file_root is None else file_root
+
+
+class PolyChordBackend(Backend):
+    """Runs `pypolychord`. This is the default backend."""
+    name = 'polychord'
+    dumps = True
+
+    def run(self, model, dumper=None, **kwargs):
+        from anesthetic import NestedSamples
+        # noinspection PyUnresolvedReferences,PyUnresolvedReferences
+        from pypolychord import run_polychord
+        _settings = model.setup_settings(**kwargs).to_polychord()
+        callbacks = [PriorQuantile(model)]
+        if dumper is not None:
+            callbacks.append(dumper)
+        output = run_polychord(LogLikelihoodWithDerived(model),
+                               model.dimensionality, model.num_derived,
+                               _settings, *callbacks)
+        try:
+            samples = NestedSamples(
+                root=f'./chains/{_settings.file_root}')
+        except ValueError as e:
+            print(e)
+            samples = None
+        return output, samples
+
+
+class DynestyBackend(Backend):
+    """Runs `dynesty`'s static nested sampler. Likelihood and prior
+    evaluations can be farmed out to a `pool` (anything with a `map`),
+    `queue_size` points at a time. The run is checkpointed to
+    `./chains/{file_root}.dynesty`, and resumed from there.
+
+    Derived parameters are not supported by dynesty, and are dropped.
+
+    """
+    name = 'dynesty'
+
+    def __init__(self, pool=None, queue_size=None, **run_kwargs):
+        self.pool = pool
+        self.queue_size = queue_size
+        self.run_kwargs = run_kwargs
+
+    def run(self, model, file_root=None, live_points=175, resume=True,
+            verbosity=0, seed=None):
+        import dynesty
+        from anesthetic import NestedSamples
+        checkpoint = f'./chains/{self._file_root(model, file_root)}.dynesty'
+        os.makedirs('./chains', exist_ok=True)
+        if resume and os.path.exists(checkpoint):
+            sampler = dynesty.NestedSampler.restore(checkpoint, pool=self.pool)
+            sampler.run_nested(resume=True, print_progress=verbosity > 0,
+                               checkpoint_file=checkpoint, **self.run_kwargs)
+        else:
+            sampler = dynesty.NestedSampler(
+                LogLikelihood(model), PriorQuantile(model),
+                model.dimensionality, nlive=live_points, pool=self.pool,
+                queue_size=self.queue_size, rstate=np.random.default_rng(seed))
+            sampler.run_nested(print_progress=verbosity > 0,
+                               checkpoint_file=checkpoint, **self.run_kwargs)
+        results = sampler.results
+        output = SamplerOutput(logZ=results.logz[-1],
+                               logZerr=results.logzerr[-1],
+                               nlike=int(results.ncall.sum()),
+                               ndead=int(results.niter),
+                               nlive=live_points, raw=results)
+        try:
+            samples = NestedSamples(data=results.samples, logL=results.logl,
+                                    logL_birth=live_points)
+        except ValueError as e:
+            print(e)
+            samples = None
+        return output, samples
+
+
+class UltraNestBackend(Backend):
+    """Runs `ultranest`'s reactive nested sampler. By default the
+    sampler is `vectorized`, i.e. it calls the model's
+    `prior_quantile_batch` and `log_likelihood_batch` on up to
+    `ndraw_max` points at a time. Under MPI, UltraNest distributes
+    the work over the ranks by itself. The run is logged in, and
+    resumed from, `./chains/{file_root}`. UltraNest draws from NumPy's
+    global random state, which is what a `seed` seeds.
+
+    Derived parameters are dropped.
+
+    """
+    name = 'ultranest'
+
+    def __init__(self, vectorized=True, ndraw_max=1000, **run_kwargs):
+        self.vectorized = vectorized
+        self.ndraw_max = ndraw_max
+        self.run_kwargs = run_kwargs
+
+    def run(self, model, file_root=None, live_points=175, resume=True,
+            verbosity=0, seed=None):
+        import ultranest
+        from anesthetic.read.ultranest import read_ultranest
+        if seed is not None:
+            np.random.seed(seed)
+        log_dir = f'./chains/{self._file_root(model, file_root)}'
+        if self.vectorized:
+            loglike, transform = LogLikelihoodBatch(model), \
+                PriorQuantileBatch(model)
+        else:
+            loglike, transform = LogLikelihood(model), PriorQuantile(model)
+        sampler = ultranest.ReactiveNestedSampler(
+            [f'p{i}' for i in range(model.dimensionality)], loglike,
+            transform, log_dir=log_dir,
+            resume='resume' if resume else 'overwrite',
+            vectorized=self.vectorized, ndraw_max=self.ndraw_max)
+        results = sampler.run(min_num_live_points=live_points,
+                              show_status=verbosity > 0, viz_callback=False,
+                              **self.run_kwargs)
+        output = SamplerOutput(logZ=results['logz'],
+                               logZerr=results['logzerr'],
+                               nlike=int(results['ncall']),
+                               ndead=int(results['niter']),
+                               nlive=live_points, raw=results)
+        try:
+            samples = read_ultranest(log_dir)
+        except (ValueError, OSError) as e:
+            print(e)
+            samples = None
+        return output, samples
+
+
+class ReferenceBackend(Backend):
+    """Runs `supernest.sampler`, the small NumPy nested sampler that
+    ships with supernest. It needs no compiled sampler, and calls the
+    model's `prior_quantile_batch` and `log_likelihood_batch` on whole
+    batches of points, so it is useful for benchmarking proposals
+    offline. It is not suited to production runs. Nothing is written
+    to disk, so `file_root` and `resume` are ignored. The keyword
+    arguments are passed on to `nested_sample`, e.g. `method='slice'`
+    to compare models by their likelihood calls under slice sampling
+    alone.
+
+    """
+    name = 'reference'
+    dumps = True
+
+    def __init__(self, **run_kwargs):
+        self.run_kwargs = run_kwargs
+
+    def run(self, model, file_root=None, live_points=175, resume=True,
+            verbosity=0, dumper=None, seed=None):
+        from supernest.proposals import Likelihood, Prior
+        from supernest.sampler import nested_sample
+        run_kwargs = dict(self.run_kwargs)
+        if seed is not None:
+            run_kwargs['seed'] = seed
+        result = nested_sample(
+            Prior(PriorQuantile(model), PriorQuantileBatch(model)),
+            Likelihood(LogLikelihoodWithDerived(model),
+                       LogLikelihoodBatchWithDerived(model)),
+            model.dimensionality, nlive=live_points, dumper=dumper,
+            **run_kwargs)
+        output = SamplerOutput(logZ=result.logZ, logZerr=result.logZerr,
+                               nlike=result.nlike, ndead=result.ndead,
+                               nlive=result.nlive, raw=result)
+        try:
+            samples = result.nested_samples()
+        except ValueError as e:
+            print(e)
+            samples = None
+        return output, samples
+
+
+class ModelCallback:
+    """A callable bound to a model. Unlike a lambda or a closure, it
+    can be pickled and sent to a process pool. When
+    `supernest.instrument` is enabled, the calls are timed under the
+    name of the model's method. The model's log-likelihood counts as
+    user code.
+
+    """
+    method = None
+    user = False
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, arg):
+        function = getattr(self.model, self.method)
+        if instrument.enabled:
+            return instrument.timed(
+                f'{type(self.model).__name__}.{self.method}', function, arg,
+                user=self.user)
+        return function(arg)
+
+
+class LogLikelihoodWithDerived(ModelCallback):
+    """The log-likelihood of `model` and its derived parameters."""
+    method = 'log_likelihood'
+    user = True
+
+
+class LogLikelihood(ModelCallback):
+    """The log-likelihood of `model`, without the derived parameters."""
+    method = 'log_likelihood'
+    user = True
+
+    def __call__(self, theta):
+        return super().__call__(theta)[0]
+
+
+class LogLikelihoodBatch(ModelCallback):
+    """The vectorised counterpart of `LogLikelihood`."""
+    method = 'log_likelihood_batch'
+    user = True
+
+    def __call__(self, thetas):
+        return super().__call__(thetas)[0]
+
+
+class LogLikelihoodBatchWithDerived(ModelCallback):
+    """The vectorised counterpart of `LogLikelihoodWithDerived`."""
+    method = 'log_likelihood_batch'
+    user = True
+
+
+class PriorQuantile(ModelCallback):
+    """The prior quantile of `model`."""
+    method = 'prior_quantile'
+
+
+class PriorQuantileBatch(ModelCallback):
+    """The vectorised counterpart of `PriorQuantile`."""
+    method = 'prior_quantile_batch'
+
+
+backends = {b.name: b for b in
+            [PolyChordBackend, DynestyBackend, UltraNestBackend,
+             ReferenceBackend]}
+
+
+def spawn_seeds(seed, runs):
+    """Independent seeds for `runs` runs, spawned from `seed`. The
+    seed of run `i` does not depend on `runs`, so that more runs can
+    be added later."""
+    return [int(s.generate_state(1)[0] % 2**31)
+            for s in np.random.SeedSequence(seed).spawn(runs)]
+
+
+def merge_runs(results):
+    """Combine the `(output, samples)` pairs of independent runs of
+    the same model into one.
+
+    The evidence is the inverse-variance weighted mean of the runs'
+    `logZ`, with the corresponding error, and the counts are summed,
+    so that `nlive` is that of the equivalent single run. The
+    `(output, samples)` of the runs are kept, in order, in `raw`. The
+    samples are merged with
+    anesthetic's `merge_nested_samples`, as one run with the live
+    points of all of them, unless some run has none.
+
+    """
+    outputs = [output for output, _ in results]
+    logZ = np.array([output.logZ for output in outputs], dtype=float)
+    logZerr = np.array([output.logZerr for output in outputs], dtype=float)
+    if np.all(logZerr > 0):
+        weights = 1 / logZerr ** 2
+        error = 1 / np.sqrt(weights.sum())
+    else:
+        weights = np.ones(len(outputs))
+        error = logZerr.max(initial=0) / np.sqrt(len(outputs))
+    output = SamplerOutput(logZ=float(weights @ logZ / weights.sum()),
+                           logZerr=float(error),
+                           nlike=sum(int(o.nlike) for o in outputs),
+                           ndead=sum(int(o.ndead) for o in outputs),
+                           nlive=sum(int(o.nlive) for o in outputs),
+                           raw=list(results))
+    runs = [samples for _, samples in results]
+    if not runs or any(samples is None for samples in runs):
+        return output, None
+    from anesthetic.samples import merge_nested_samples
+    return output, merge_nested_samples(runs)
+
+
+def get_backend(backend):
+    """Return the backend instance named by `backend`, or `backend`
+    itself if it already is one.
+
+    """
+    if isinstance(backend, Backend):
+        return backend
+    try:
+        return backends[backend]()
+    except KeyError:
+        raise ValueError(f'Unknown backend {backend}. '
+                         f'Expected one of {list(backends)}.') from None
@@ -0,0 +1,81 @@
+"""This class wraps any model, and memoises its log-likelihood. This
+is useful for expensive likelihoods that get evaluated at the same
+points repeatedly, e.g. after a resume, or in the benchmarks that
+rerun the same model many times over. The prior is passed through
+unchanged.
+
+Pass a `store` to keep the evaluations on disk as well, so that they
+survive across processes and runs.
+
+"""
+from .polychord import Model
+from ..cache import CachedLikelihood, StoredLikelihood, LikelihoodStore
+from ..cache import fingerprint as _fingerprint
+from ..proposals.types import Likelihood
+
+
+class CachedModel(Model):
+    """A caching model decorator. Pass it any model and it will return a
+    model with the same prior and likelihood, but whose
+    log-likelihood evaluations are kept in a bounded LRU cache. See
+    `supernest.cache.CachedLikelihood` for the meaning of
+    `max_entries` and `max_bytes`.
+
+    If `store` (a `supernest.cache.LikelihoodStore` or a path to one)
+    is given, evaluations missing from memory are looked up on disk,
+    under `fingerprint`, before the base model is evaluated. By
+    default the fingerprint is computed from the base model's
+    parameters, by `supernest.cache.fingerprint`, which raises
+    `ValueError` if any of them is a lambda or a closure.
+
+    The batch methods are passed through too: the rows of a batch are
+    looked up one by one, and the misses are evaluated together, by the
+    base model's `log_likelihood_batch`.
+
+    """
+    default_file_root = 'CachedModel'
+
+    def __str__(self):
+        return f'{self.model.__str__()}\nCached: {self.cache.stats}'
+
+    def __repr__(self):
+        return f'{self.model.__repr__()} Cached'
+
+    def __init__(self, base_model, file_root=default_file_root,
+                 max_entries=100000, max_bytes=None, store=None,
+                 fingerprint=None, **kwargs):
+        self.model = base_model
+        log_likelihood = Likelihood(base_model.log_likelihood,
+                                    base_model.log_likelihood_batch)
+        if store is not None:
+            if not isinstance(store, LikelihoodStore):
+                store = LikelihoodStore(store)
+            if fingerprint is None:
+                fingerprint = _fingerprint(base_model)
+            log_likelihood = StoredLikelihood(log_likelihood, store,
+                                              fingerprint)
+        self.cache = CachedLikelihood(log_likelihood,
+                                      max_entries=max_entries,
+                                      max_bytes=max_bytes)
+        super().__init__(base_model.dimensionality,
+                         base_model.num_derived, file_root=file_root, **kwargs)
+
+    def log_likelihood(self, theta):
+        return self.cache(theta)
+
+    def log_likelihood_batch(self, thetas):
+        return self.cache.batch(thetas)
+
+    def prior_quantile(self, *args):
+        return self.model.prior_quantile(*args)
+
+    def prior_quantile_batch(self, hypercubes):
+        return self.model.prior_quantile_batch(hypercubes)
+
+    @property
+    def dimensionality(self):
+        return self.model.dimensionality
+
+    @property
+    def num_derived(self):
+        return self.model.num_derived
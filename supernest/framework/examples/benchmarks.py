@@ -12,10 +12,9 @@ from supernest.framework.gaussian_models import (PowerPosteriorPrior,
                                                   BoxUniformPrior)
 from supernest.framework.mixtures import StochasticMixtureModel
 from supernest.framework.offset_model import OffsetModel
+from supernest.framework.sweep import Sweep
 
 from misc.data_series import Series
-from misc.parallelism import parmap
-from misc.ui import progressbar as tqdm
 
 rc('font', **{'family': 'serif', 'serif': ['Times']})
 rc('text', usetex=True)
@@ -37,28 +36,16 @@ coincidingSeries = {
 }
 
 
-def count_log_like_calls(model, repeats, **kwargs):
-    fr = kwargs.pop('file_root')
-    outs = parmap(lambda r: model.nested_sample(
-        **kwargs, file_root=(fr + '{}'.format(r))), range(repeats))
-    result = [out[0].nlike for out in outs]
-    print(result)
-    return result
-
-
 def bench(repeats, n_like, series):
-    rv = {}
-    config = {'resume': False}
-    for k in tqdm(series):
-        print('Running {}'.format(k))
-        log_like_calls = [count_log_like_calls(series[k].model,
-                                               repeats,
-                                               **config,
-                                               live_points=nl,
-                                               file_root='{}{}'.format(k, nl))
-                          for nl in n_like]
-        rv[k] = log_like_calls
-    return rv
+    sweep = Sweep({k: series[k].model for k in series},
+                  settings={'live_points': n_like}, repeats=repeats,
+                  path='benchmarks.sqlite', root='benchmarks')
+    table = sweep.run()
+    print(table.to_string())
+    return {k: [list(table.nlike[(table.model == k)
+                                 & (table.live_points == nl)])
+                for nl in n_like]
+            for k in series}
 
 
 live_points = [10, 30, 40, 50, 55, 60, 65, 70]
@@ -7,7 +7,6 @@ from supernest.framework.gaussian_models import (
     PowerPosteriorPrior, BoxUniformPrior, GaussianPeakedPrior, ResizeablePrior)
 from supernest.framework.mixtures import StochasticMixtureModel
 from misc.data_series import Series
-from misc.parallelism import parmap
 from misc.ui import progressbar as tqdm
 from offset_model import OffsetModel
 
@@ -40,10 +39,8 @@ def generate_offset(series, factor=3):
 
 
 def execute(model, repeats, **kwargs):
-    fr = kwargs.pop('file_root')
-    outs = parmap(lambda r: model.nested_sample(
-        **kwargs, file_root=(fr + '{}'.format(r))), range(repeats))
-    return outs
+    merged, _ = model.nested_sample_many(repeats, **kwargs)
+    return merged.raw
 
 
 def bench(repeats, n_like, series):
@@ -6,13 +6,12 @@ in arrays of a different size than nDims.
 """
 from abc import ABC
 
-from numpy import pi, array, log, concatenate, diag, sqrt, nextafter
-from numpy.linalg import slogdet, multi_dot, inv, pinv
-from scipy.special import erf, erfinv
-from functools import lru_cache
+from numpy import (array, log, concatenate, column_stack, diag, empty,
+                   maximum, nextafter)
 
 from .polychord import Model
-from pypolychord.priors import UniformPrior
+from ..proposals.factorisation import GaussianFactorisation
+from ..proposals.power_gaussian import PowerGaussian
 
 
 class ParameterCovarianceModel(Model, ABC):
@@ -24,6 +23,9 @@ class ParameterCovarianceModel(Model, ABC):
     sublassing, you should worry about the correct dimensionality, and
     produce a prior quantile that correponds to the model you want.
     """
+    # The number of values of beta, if the prior draws one. See
+    # `supernest.proposals.PowerGaussian`.
+    beta_levels = None
 
     def __str__(self):
         return f'Gaussian posterior with \nmu = {self.mu}\ncov = {self.cov}'
@@ -49,12 +51,14 @@ class ParameterCovarianceModel(Model, ABC):
         if rows != cols or rows != self.nDims:
             raise ValueError('Dimensions of cov and mean are incompatible: mean – {}, cov ({}, {}) '.format(
                 self.nDims, rows, cols))
-        try:
-            self._invCov = inv(self.cov)
-        except:
-            print(
-                "Singular matrix, reverting to Penrose-Moore inverse, Singular Value Decomposition. ")
-            self._invCov = pinv(self.cov)
+        # Warns and regularises if the covariance is ill-conditioned.
+        # The Cholesky factor and the normalisation are computed once,
+        # here, so the log-likelihood is a single triangular solve.
+        self._factorisation = GaussianFactorisation(self.mu, self.cov)
+        # The error functions of the bounds, memoised per beta.
+        self._power_gaussian = PowerGaussian(self.mu, diag(self.cov),
+                                             self.a, self.b,
+                                             levels=self.beta_levels)
         super().__init__(self.dimensionality, self.num_derived, file_root, **kwargs)
 
     def log_likelihood(self, theta):
@@ -75,16 +79,31 @@ class ParameterCovarianceModel(Model, ABC):
             of the derived parameters. 
 
         """
-        delta = theta - self.mu
-        ll = - slogdet(2 * pi * self.cov)[1] / 2
-        ll -= multi_dot([delta, self._invCov, delta]) / 2
-        return ll, []
+        return self._factorisation.log_pdf(theta), []
+
+    def log_likelihood_batch(self, thetas):
+        """The Gaussian log-likelihood of an (N, self.nDims) array of
+        points, with one triangular solve for all of them.
+
+        Parameters
+        ----------
+        thetas : array((N, self.nDims), dtype=numpy.float64)
+            Physical parameters' values, one point per row.
+
+        Returns
+        -------
+        logL, [derived..] : (array(N, numpy.float64), array((N, self.num_derived), numpy.float64))
+
+        """
+        return self._factorisation.log_pdf(thetas), \
+            empty((len(thetas), self.num_derived))
 
 
 class PowerPosteriorPrior(ParameterCovarianceModel):
     default_file_root = 'PowerPosteriorModel'
     # Smallest representable +ve float64
     beta_min, beta_max = (nextafter(0, 1), 1)
+    beta_levels = 256
 
     def log_likelihood(self, theta):
         """A Ln(likelihood) of the theta given the model. With a uniform
@@ -110,11 +129,56 @@ class PowerPosteriorPrior(ParameterCovarianceModel):
         log_l += log_likelihood_correction(self, beta, t)
         return log_l, phi
 
+    def log_likelihood_batch(self, thetas):
+        """The vectorised counterpart of `log_likelihood`: the Gaussian
+        log-likelihood of each row, corrected for the power posterior
+        prior at the row's beta.
+
+        Parameters
+        ----------
+        thetas : array((N, self.dimensionality), dtype=numpy.float64)
+            Physical parameters' values, one point per row.
+
+        Returns
+        -------
+        logL, [derived..] : (array(N, numpy.float64), array((N, self.num_derived), numpy.float64))
+
+            The first element holds the log-likelihoods, the second the
+            derived parameters, one row per point.
+
+        """
+        t = thetas[:, :self.nDims]
+        beta = thetas[:, -1]
+        log_l, phi = super().log_likelihood_batch(t)
+        log_l += log_likelihood_correction(self, beta, t)
+        return log_l, phi
+
     def prior_quantile(self, cube):
-        beta = self.beta_min + (self.beta_max - self.beta_min) * cube[-1]
+        beta = self._power_gaussian.beta(cube[-1], self.beta_min,
+                                         self.beta_max)
         theta = power_gaussian_quantile(self, cube[:self.nDims], beta)
         return concatenate([theta, [beta]])
 
+    def prior_quantile_batch(self, hypercubes):
+        """The vectorised counterpart of `prior_quantile`.
+
+        Parameters
+        ----------
+        hypercubes: array((N, self.dimensionality), dtype=numpy.float64)
+            Points in the unit hypercube, one per row.
+
+        Returns
+        -------
+        thetas: array((N, self.dimensionality), dtype=numpy.float64)
+            The physical parameters, and beta in the last column.
+
+        """
+        beta = self._power_gaussian.beta(hypercubes[:, -1], self.beta_min,
+                                         self.beta_max)
+        theta = power_gaussian_quantile(self, hypercubes[:, :self.nDims],
+                                        beta)
+        return column_stack([theta, beta])
+
     @property
     def dimensionality(self):
         """Dimesnionality of the power posterior model is nDims + 1. 
@@ -122,21 +186,14 @@ class PowerPosteriorPrior(ParameterCovarianceModel):
         return self.nDims + 1
 
 
-def _erf_term(d, b, g):
-    @lru_cache(maxsize=2)
-    def helper(t_delta, t_beta, t_sigma):
-        hd, hg = array(t_delta), array(t_sigma)
-        return erf(hd * sqrt(t_beta / 2) / hg)
-
-    return helper(tuple(d), b, tuple(g))
+def power_gaussian_quantile(m, cube, beta=1):
+    return m._power_gaussian.quantile(cube, beta)
 
 
-def power_gaussian_quantile(m, cube, beta=1):
-    sigma = diag(m.cov)
-    da = _erf_term(m.a - m.mu, beta, sigma)
-    db = _erf_term(m.b - m.mu, beta, sigma)
-    ret = erfinv((1 - cube) * da + cube * db)
-    return m.mu + sqrt(2 / beta) * sigma * ret
+def uniform_quantile(a, b, cube):
+    """The quantile of the uniform distribution on [a, b], as
+    `pypolychord.priors.UniformPrior`, but without importing PolyChord."""
+    return a + (b - a) * cube
 
 
 def log_box(m):
@@ -148,19 +205,8 @@ def log_box(m):
 
 def log_likelihood_correction(model, beta, theta):
     ll = 0
-
-    def ln_z(m, t, b):
-        sigma = diag(m.cov)
-        ret = - b * (t - m.mu) ** 2 / 2 / sigma ** 2
-        ret -= log(pi * sigma ** 2 / 2 / b) / 2
-        db = _erf_term(m.b - m.mu, b, sigma)
-        da = _erf_term(m.a - m.mu, b, sigma)
-        ret -= log(db - da)
-        return ret
-
     ll -= log_box(model)
-    ll -= ln_z(model, theta, beta).sum()
-
+    ll -= model._power_gaussian.log_pdf(theta, beta)
     return ll
 
 
@@ -194,6 +240,27 @@ class GaussianPeakedPrior(ParameterCovarianceModel):
         log_l += log_likelihood_correction(self, beta=1, theta=theta)
         return log_l, phi
 
+    def log_likelihood_batch(self, thetas):
+        """The vectorised counterpart of `log_likelihood`: the Gaussian
+        log-likelihood of each row, corrected for the Gaussian prior.
+
+        Parameters
+        ----------
+        thetas : array((N, self.dimensionality), dtype=numpy.float64)
+            Physical parameters' values, one point per row.
+
+        Returns
+        -------
+        logL, [derived..] : (array(N, numpy.float64), array((N, self.num_derived), numpy.float64))
+
+            The first element holds the log-likelihoods, the second the
+            derived parameters, one row per point.
+
+        """
+        log_l, phi = super().log_likelihood_batch(thetas)
+        log_l += log_likelihood_correction(self, beta=1, theta=thetas)
+        return log_l, phi
+
     def prior_quantile(self, cube):
         """Inverse Cumulative distribution function of the prior. Aka the
         quantile. If the prior has PDF \\pi, then this is (CDF (\\pi))^-1.
@@ -238,7 +305,7 @@ class BoxUniformPrior(ParameterCovarianceModel):
         theta: array(self.dimensionality, dtype=numpy.float64)
             Physical parameters. 
         """
-        return UniformPrior(self.a, self.b)(hypercube)
+        return uniform_quantile(self.a, self.b, hypercube)
 
 
 class ResizeablePrior(ParameterCovarianceModel):
@@ -273,6 +340,30 @@ class ResizeablePrior(ParameterCovarianceModel):
         log_l -= log_box(self)
         return log_l, phi
 
+    def log_likelihood_batch(self, thetas):
+        """The vectorised counterpart of `log_likelihood`: the Gaussian
+        log-likelihood of each row, rescaled by the row's beta.
+
+        Parameters
+        ----------
+        thetas : array((N, self.dimensionality), dtype=numpy.float64)
+            Physical parameters' values, one point per row.
+
+        Returns
+        -------
+        logL, [derived..] : (array(N, numpy.float64), array((N, self.num_derived), numpy.float64))
+
+            The first element holds the log-likelihoods, the second the
+            derived parameters, one row per point.
+
+        """
+        t = thetas[:, :self.nDims]
+        beta = maximum(thetas[:, -1], self.beta_min)
+        log_l, phi = super().log_likelihood_batch(t / beta[:, None])
+        log_l += 2 * self.nDims * (log(beta))
+        log_l -= log_box(self)
+        return log_l, phi
+
     def prior_quantile(self, hypercube):
         """Inverse Cumulative distribution function of the prior. Aka the
         quantile. If the prior has PDF \\pi, then this is (CDF (\\pi))^-1.
@@ -292,7 +383,8 @@ class ResizeablePrior(ParameterCovarianceModel):
         beta = hypercube[-1:].item()
         # PolyChord refers to Quantile functions as priors.
         # This is not incorrect, but can be confusing.
-        uniform = UniformPrior(self.a * beta, self.b * beta)(hypercube[:-1])
+        uniform = uniform_quantile(self.a * beta, self.b * beta,
+                                   hypercube[:-1])
         return concatenate([uniform, [beta]])
 
     @property
@@ -9,11 +9,10 @@ stochastic mixture.
 """
 
 from abc import ABC
-from random import random, seed
-
-from numpy import concatenate
+from numpy import empty, unique
 
 from .polychord import Model
+from ..utils import hash_to_uniform, first_exceeded, cumulative_choice
 
 
 def _are_all_elements_identical(lst):
@@ -77,10 +76,22 @@ class StochasticMixtureModel(AbstractMixtureModel):
     all of the dimensionality management and reserve it for the
     framework proper.
 
+    The `selection` is either 'scan' or 'cumulative', as in
+    `super_nest.superimpose`. Use the latter for mixtures of many
+    models.
+
+    As there, the prior quantiles accept an `out` array, into which
+    the parameters are written instead of a new array.
+
     """
     default_file_root = 'StochasticMixture'
 
-    def __init__(self, models, settings=None, file_root=default_file_root):
+    def __init__(self, models, settings=None, file_root=default_file_root,
+                 selection='scan'):
+        if selection not in ('scan', 'cumulative'):
+            raise ValueError(f'Unknown selection: {selection}. ' +
+                             'Expected \'scan\' or \'cumulative\'.')
+        self.selection = selection
         super().__init__(models, file_root=file_root, settings=settings)
 
     @property
@@ -102,20 +113,54 @@ class StochasticMixtureModel(AbstractMixtureModel):
         log_l, phi = _current_model.log_likelihood(t[:_nDims])
         return log_l, phi
 
-    def prior_quantile(self, hypercube):
+    def prior_quantile(self, hypercube, out=None):
         __doc__ = super().__doc__ 
         t, b, _ = self._unpack(hypercube)
-        norm = b.sum() if b.sum() != 0 else 1
-        ps = b / norm
-        index = 0
-        h = hash(tuple(t))
-        seed(h)
-        r = random()
-        for p in ps:
-            if r > p:
-                break
-            index += 1
+        r = hash_to_uniform(t)
+        if self.selection == 'cumulative':
+            index = int(cumulative_choice(b, r))
+        else:
+            norm = b.sum() if b.sum() != 0 else 1
+            index = int(first_exceeded(b / norm, r))
         _nDims = self.models[index].dimensionality
-        cube, cube_ = t[:_nDims], t[_nDims:]
-        theta = self.models[index].prior_quantile(cube)
-        return concatenate([theta, cube_, b, [index]])
+        if out is None:
+            out = empty(len(hypercube))
+        out[_nDims:-1] = hypercube[_nDims:-1]
+        out[:_nDims] = self.models[index].prior_quantile(t[:_nDims])
+        out[-1] = index
+        return out
+
+    def log_likelihood_batch(self, thetas):
+        __doc__ = super().__doc__
+        indices = thetas[:, -1].astype(int)
+        log_l = empty(len(thetas))
+        phi = empty((len(thetas), self.num_derived))
+        for index in unique(indices):
+            rows = indices == index
+            _current_model = self.models[index]
+            _nDims = _current_model.dimensionality
+            log_l[rows], phi[rows] = _current_model.log_likelihood_batch(
+                thetas[rows, :_nDims])
+        return log_l, phi
+
+    def prior_quantile_batch(self, hypercubes, out=None):
+        __doc__ = super().__doc__
+        t, b = hypercubes[:, :self.nDims], hypercubes[:, self.nDims:-1]
+        r = hash_to_uniform(t)
+        if self.selection == 'cumulative':
+            indices = cumulative_choice(b, r)
+        else:
+            norm = b.sum(axis=1, keepdims=True)
+            norm[norm == 0] = 1
+            indices = first_exceeded(b / norm, r)
+        if out is None:
+            out = hypercubes.copy()
+        else:
+            out[...] = hypercubes
+        out[:, -1] = indices
+        for index in unique(indices):
+            rows = indices == index
+            _nDims = self.models[index].dimensionality
+            out[rows, :_nDims] = self.models[index].prior_quantile_batch(
+                t[rows, :_nDims])
+        return out
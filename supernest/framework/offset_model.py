@@ -39,6 +39,12 @@ class OffsetModel(Model):
     def prior_quantile(self, *args):
         return self.model.prior_quantile(*args)
 
+    def log_likelihood_batch(self, thetas):
+        return self.model.log_likelihood_batch(thetas - self.offset)
+
+    def prior_quantile_batch(self, hypercubes):
+        return self.model.prior_quantile_batch(hypercubes)
+
     @property
     def dimensionality(self):
         return self.model.dimensionality
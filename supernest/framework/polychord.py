@@ -15,16 +15,50 @@ uniform.
 
 The file itself is structured as a tutorial (more-less).
 """
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
+from itertools import repeat
 
-from anesthetic import NestedSamples
 from numpy import zeros
 
-# As of now PolyChord is not `pip install pypolychord` -able
-# noinspection PyUnresolvedReferences,PyUnresolvedReferences
-from pypolychord import run_polychord
-# noinspection PyUnresolvedReferences,PyUnresolvedReferences
-from pypolychord.settings import PolyChordSettings
+from .backends import get_backend, merge_runs, spawn_seeds
+from ..proposals.types import as_batch, as_likelihood_batch
+
+
+class Settings:
+    """The settings of a run, independent of the sampler, so that a
+    model can be built and run without PolyChord. The names are those
+    of `pypolychord.settings.PolyChordSettings`, and any other
+    attribute that is set, e.g. `precision_criterion`, is passed on to
+    PolyChord by `to_polychord`. A `seed` of None means fresh entropy.
+
+    """
+
+    def __init__(self, nDims, nDerived, file_root='', nlive=175, feedback=0,
+                 read_resume=True, seed=None):
+        self.nDims = nDims
+        self.nDerived = nDerived
+        self.file_root = file_root
+        self.nlive = nlive
+        self.feedback = feedback
+        self.read_resume = read_resume
+        self.seed = seed
+
+    def to_polychord(self):
+        """The equivalent `PolyChordSettings`. Only call this where
+        PolyChord is installed."""
+        # As of now PolyChord is not `pip install pypolychord` -able
+        # noinspection PyUnresolvedReferences,PyUnresolvedReferences
+        from pypolychord.settings import PolyChordSettings
+        settings = PolyChordSettings(self.nDims, self.nDerived)
+        for name, value in vars(self).items():
+            if name not in ('nDims', 'nDerived') and value is not None:
+                setattr(settings, name, value)
+        return settings
+
+    def __repr__(self):
+        return 'Settings({})'.format(', '.join(
+            f'{name}={value!r}' for name, value in vars(self).items()))
 
 
 class Model:
@@ -44,8 +78,8 @@ class Model:
     default_file_root = 'blankModel'
 
     def __init__(self, dimensionality, number_derived, file_root='', **kwargs):
-        self.settings = PolyChordSettings(dimensionality, number_derived)
-        self.settings.file_root = file_root
+        self.settings = Settings(dimensionality, number_derived,
+                                 file_root=file_root)
 
     def log_likelihood(self, theta):
         """A Ln(likelihood) of the theta given the model. With a uniform
@@ -85,6 +119,31 @@ class Model:
         """
         raise NotImplementedError()
 
+    def log_likelihood_batch(self, thetas):
+        """The log-likelihood of an array of points. Used by the
+        vectorised samplers. You only need to override this if your
+        likelihood can do better than evaluating row by row.
+
+        Parameters
+        ----------
+        thetas : array((N, self.dimensionality), dtype=numpy.float64)
+            Physical parameters' values, one point per row.
+
+        Returns
+        -------
+        logL: array(N, numpy.float64), [derived..] : array((N, num_derived), numpy.float64)
+
+        """
+        return as_likelihood_batch(self.log_likelihood)(thetas)
+
+    def prior_quantile_batch(self, hypercubes):
+        """The prior quantile of an array of points, one per row. Used by
+        the vectorised samplers. Override it if your quantile can be
+        vectorised.
+
+        """
+        return as_batch(self.prior_quantile)(hypercubes)
+
     @property
     def dimensionality(self):
         """This is the length of the physical parameter vector to be used. You
@@ -129,9 +188,9 @@ class Model:
                 f'Prior has the wrong dimensions: expect {_nDims}'
                 f'vs actual {self.dimensionality}')
 
-    def nested_sample(self, **kwargs):
+    def nested_sample(self, backend='polychord', dumper=None, **kwargs):
         """A safer and more configurable way of running the `PyPolyChord`
-        nested sampler.
+        nested sampler, or any other sampler in `backends`.
 
         This will raise errors if you passed in inconsistent
         dimesnions.
@@ -139,27 +198,87 @@ class Model:
         Parameters
         ----------
 
+        backend: str or backends.Backend
+        The sampler to use: 'polychord' (the default), 'dynesty',
+        'ultranest', 'reference', or a configured backend instance.
+
+        dumper: callable
+        Called with `(live, dead, logweights, logZ, logZerr)` as the
+        run progresses, e.g. a `supernest.proposals.AdaptiveProposal`.
+        Only the 'polychord' and 'reference' backends support it.
+
         **kwargs: dict
-        Options that pypolychord.settings.PolyChordSettings object would accept.
+        Options that `setup_settings` would accept.
 
         """
         self.test_log_like()
         self.test_quantile()
-        _settings = self.setup_settings(**kwargs)
-        output = run_polychord(self.log_likelihood, self.dimensionality,
-                               self.num_derived, _settings, self.prior_quantile)
-        try:
-            samples = NestedSamples(
-                root=f'./chains/{_settings.file_root}')
-        except ValueError as e:
-            print(e)
-            samples = None
-        return output, samples
+        backend = get_backend(backend)
+        if dumper is None:
+            return backend.run(self, **kwargs)
+        if not backend.dumps:
+            raise ValueError(f'The {backend.name} backend does not '
+                             'support dumpers.')
+        return backend.run(self, dumper=dumper, **kwargs)
+
+    def nested_sample_many(self, runs, backend='polychord', processes=None,
+                           seed=None, file_root=None, **kwargs):
+        """Run `runs` independent nested samplers in a process pool, and
+        merge them. On a multi-core node, this takes the wall time of one
+        run, and gives the precision of a run with `runs` times as many
+        live points.
+
+        Parameters
+        ----------
+
+        runs: int
+        The number of runs.
+
+        backend: str or backends.Backend
+        As for `nested_sample`.
+
+        processes: int
+        The size of the pool. Defaults to the number of CPUs. With 1,
+        the runs are done one after another in this process.
+
+        seed: int
+        The seed from which those of the runs are spawned, so the
+        ensemble is reproducible. Fresh entropy is used by default.
+
+        file_root: str
+        Run `i` is written under `{file_root}_{i}`, so that no two
+        runs share their files.
+
+        **kwargs: dict
+        Options that `setup_settings` would accept.
+
+        Returns
+        -------
+        (output, samples): the merged output, whose `raw` is the list
+        of the `(output, samples)` of the runs, and the merged samples. See
+        `backends.merge_runs`.
+
+        """
+        file_root = self.settings.file_root if file_root is None \
+            else file_root
+        seeds = spawn_seeds(seed, runs)
+        jobs = [dict(kwargs, file_root=f'{file_root}_{i}', seed=s)
+                for i, s in enumerate(seeds)]
+        if processes == 1:
+            results = [self.nested_sample(backend, **job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(processes) as pool:
+                results = list(pool.map(_nested_sample, repeat(self),
+                                        repeat(backend), jobs))
+        return merge_runs(results)
 
     # noinspection SpellCheckingInspection
     def setup_settings(self, file_root=None,
-                       live_points=175, resume=True, verbosity=0):
-        """This is a helper function that sets PolyChord up with sane defaults.
+                       live_points=175, resume=True, verbosity=0, seed=None):
+        """This is a helper function that sets the run up with sane
+        defaults. It returns a copy of `self.settings`, a `Settings`,
+        which the backends read, and `PolyChordBackend` converts to
+        `PolyChordSettings`.
         """
         _settings = deepcopy(self.settings)
         _settings.feedback = verbosity
@@ -167,4 +286,11 @@ class Model:
             _settings.file_root = file_root
         _settings.read_resume = resume
         _settings.nlive = live_points
+        if seed is not None:
+            _settings.seed = seed
         return _settings
+
+
+def _nested_sample(model, backend, kwargs):
+    # A module-level function, so that the pool can pickle it.
+    return model.nested_sample(backend, **kwargs)
@@ -0,0 +1,212 @@
+"""This module runs a grid of nested sampling runs: every model, with
+every combination of settings, repeated with different seeds. It
+replaces the nested loops of the benchmark examples.
+
+Each (model, settings, seed) cell is keyed by a content hash, i.e.
+a `supernest.cache.fingerprint` of the model's name and parameters, the
+settings, the seed and the backend with its options, and its results are
+kept in a small SQLite table under that key. Running a sweep again only runs
+the cells that are not in the table, so an interrupted sweep picks
+up where it stopped, and changing a model's parameters reruns just
+that model. The cells write their chains to `{root}_{key}`, so their
+files never clash either.
+
+A sweep can be described in Python,
+
+    Sweep({'uniform': BoxUniformPrior(bounds, mu, cov)},
+          settings={'live_points': [10, 30]}, repeats=5).run()
+
+or in a JSON file, in which the models are given by class and
+arguments, and run with `python -m supernest.framework.sweep
+sweep.json`:
+
+    {"models": {"uniform": {
+         "class": "supernest.framework.gaussian_models.BoxUniformPrior",
+         "args": [[-6e8, 6e8], [1, 2, 3], [[1, 0, 0], [0, 1, 0], [0, 0, 1]]]}},
+     "settings": {"live_points": [10, 30]},
+     "repeats": 5,
+     "path": "sweep.sqlite"}
+
+"""
+import argparse
+import importlib
+import json
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+
+import numpy as np
+
+from .backends import get_backend, spawn_seeds
+from ..cache import fingerprint
+
+COLUMNS = ('logZ', 'logZerr', 'nlike', 'ndead', 'D', 'wall_time')
+
+
+class Sweep:
+    """A grid of runs, and the table of their results.
+
+    Parameters
+    ----------
+
+    models: dict
+    Maps names to models, or to specifications of the form `{'class':
+    'module.Class', 'args': [...], 'kwargs': {...}}`. Lists in the
+    arguments are passed as numpy arrays.
+
+    settings: dict
+    Maps the options of `Model.setup_settings` to lists of values.
+    Every combination is run.
+
+    repeats: int
+    The number of runs of every combination, each with its own seed.
+
+    seed: int
+    The seed from which those of the repeats are spawned.
+
+    backend: str or backends.Backend
+    As for `Model.nested_sample`.
+
+    path: str
+    The SQLite file with the results. Created if it doesn't exist.
+
+    root: str
+    The prefix of the file roots of the cells.
+
+    """
+
+    def __init__(self, models, settings=None, repeats=1, seed=0,
+                 backend='polychord', path='sweep.sqlite', root='sweep'):
+        self.models = {name: _build(model) for name, model in models.items()}
+        self.settings = {} if settings is None else settings
+        self.seeds = spawn_seeds(seed, repeats)
+        self.backend = get_backend(backend)
+        self.path = str(path)
+        self.root = root
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, model TEXT NOT NULL, '
+                'settings TEXT NOT NULL, seed INTEGER NOT NULL, '
+                'logZ REAL, logZerr REAL, nlike INTEGER, ndead INTEGER, '
+                'D REAL, wall_time REAL)')
+
+    @classmethod
+    def from_config(cls, config):
+        """Create from a dict of the constructor's arguments, or from
+        the path of a JSON file with one."""
+        if not isinstance(config, dict):
+            with open(config) as f:
+                config = json.load(f)
+        return cls(**config)
+
+    def _connection(self):
+        return sqlite3.connect(self.path)
+
+    def cells(self):
+        """Every `(key, name, settings, seed)` of the grid."""
+        names = sorted(self.settings)
+        grid = [dict(zip(names, values)) for values in
+                product(*(self.settings[name] for name in names))]
+        return [(fingerprint(name, self.models[name], settings, seed,
+                             self.backend)[:16],
+                 name, settings, seed)
+                for name in self.models for settings in grid
+                for seed in self.seeds]
+
+    def pending(self):
+        """The cells that have no results yet."""
+        with self._connection() as connection:
+            done = {key for key, in connection.execute(
+                'SELECT key FROM results')}
+        return [cell for cell in self.cells() if cell[0] not in done]
+
+    def run(self, processes=None):
+        """Run the pending cells in a pool of `processes` processes
+        (by default, one per CPU, and with 1, in this process). The
+        results of each cell are stored as soon as it finishes.
+
+        Returns
+        -------
+        The table of results, see `results`.
+
+        """
+        jobs = [(key, name, settings, seed,
+                 (self.models[name], self.backend,
+                  dict(settings, file_root=f'{self.root}_{key}', seed=seed)))
+                for key, name, settings, seed in self.pending()]
+        if processes == 1:
+            for *cell, job in jobs:
+                self._store(*cell, _run_cell(*job))
+        elif jobs:
+            with ProcessPoolExecutor(processes) as pool:
+                futures = {pool.submit(_run_cell, *job): cell
+                           for *cell, job in jobs}
+                for future in as_completed(futures):
+                    self._store(*futures[future], future.result())
+        return self.results()
+
+    def _store(self, key, name, settings, seed, row):
+        with self._connection() as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO results VALUES '
+                f'(?, ?, ?, ?, {", ".join("?" * len(COLUMNS))})',
+                (key, name, json.dumps(settings, sort_keys=True), seed,
+                 *(row[column] for column in COLUMNS)))
+
+    def results(self):
+        """A `pandas.DataFrame` of the results of the cells of this
+        sweep that have run, with a column for each setting."""
+        import pandas as pd
+        with self._connection() as connection:
+            table = pd.read_sql_query('SELECT * FROM results', connection)
+        table = table[table.key.isin([cell[0] for cell in self.cells()])]
+        settings = pd.DataFrame([json.loads(s) for s in table.settings],
+                                index=table.index)
+        return pd.concat([table.drop(columns='settings'), settings],
+                         axis=1).reset_index(drop=True)
+
+    def __repr__(self):
+        return (f'Sweep({list(self.models)}, settings={self.settings}, '
+                f'repeats={len(self.seeds)}, path={self.path!r})')
+
+
+def _build(model):
+    if not isinstance(model, dict):
+        return model
+    module, _, name = model['class'].rpartition('.')
+    cls = getattr(importlib.import_module(module), name)
+    return cls(*(_array(arg) for arg in model.get('args', ())),
+               **{k: _array(v) for k, v in model.get('kwargs', {}).items()})
+
+
+def _array(arg):
+    return np.asarray(arg) if isinstance(arg, list) else arg
+
+
+def _run_cell(model, backend, kwargs):
+    # A module-level function, so that the pool can pickle it.
+    start = time.perf_counter()
+    output, samples = model.nested_sample(backend, **kwargs)
+    wall_time = time.perf_counter() - start
+    return {'logZ': float(output.logZ), 'logZerr': float(output.logZerr),
+            'nlike': int(output.nlike), 'ndead': int(output.ndead),
+            'D': np.nan if samples is None else float(samples.D_KL()),
+            'wall_time': wall_time}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run the pending cells of a sweep, and print the '
+                    'results.')
+    parser.add_argument('config', help='JSON file describing the sweep.')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='Size of the process pool.')
+    args = parser.parse_args()
+    sweep = Sweep.from_config(args.config)
+    print(sweep.run(args.processes).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+r"""Opt-in call counting and timing of supernest's wrappers.
+
+When a superimposed run is slow, the time may go to the user's
+likelihood, to supernest's correction and dispatch, or to the prior
+transform. With instrumentation enabled, every call through a `Prior`,
+`Likelihood` or `CorrectedLikelihood` (and through the framework's
+sampler backends) is timed, and the times are aggregated per wrapped
+callable.
+
+    from supernest import instrument
+
+    with instrument.instrumented():
+        run_polychord(proposal.likelihood, ...)
+    print(instrument.report())
+
+Each region records its number of calls, its total time, and its
+`own` time, i.e. the total minus the time spent in instrumented
+regions nested inside it. The original likelihood of a
+`CorrectedLikelihood` is timed as a region of its own, marked as user
+code, and so is a framework model's `log_likelihood`. `summary` then
+splits the time between the user's likelihood and supernest's
+overhead.
+
+Latency percentiles come from a histogram with eight logarithmic bins
+per factor of two, so they are accurate to about 9%, and the memory
+used does not grow with the number of calls.
+
+Instrumentation is off by default. The wrappers then check a single
+module attribute per call.
+"""
+import math
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+
+enabled = False
+
+_BINS_PER_OCTAVE = 8
+_lock = threading.Lock()
+_local = threading.local()
+_stats = {}
+_totals = {'total': 0.0, 'user': 0.0}
+
+
+class CallStats:
+    """Aggregated timings of one instrumented region.
+
+    Times are in seconds.
+    """
+
+    def __init__(self, name, user=False):
+        """Create."""
+        self.name = name
+        self.user = user
+        self.count = 0
+        self.total = 0.0
+        self.own = 0.0
+        self._histogram = Counter()
+
+    def add(self, elapsed, nested):
+        """Record one call that took `elapsed`, of which `nested` was
+        spent in nested regions."""
+        self.count += 1
+        self.total += elapsed
+        self.own += elapsed - nested
+        self._histogram[_bin(elapsed)] += 1
+
+    @property
+    def mean(self):
+        """Mean latency."""
+        return self.total / self.count if self.count else math.nan
+
+    def percentile(self, q):
+        """Latency below which `q` percent of the calls fall."""
+        if not self.count:
+            return math.nan
+        rank, seen = q / 100 * self.count, 0
+        for index in sorted(self._histogram):
+            seen += self._histogram[index]
+            if seen >= rank:
+                break
+        return 2 ** ((index + 0.5) / _BINS_PER_OCTAVE)
+
+    def __repr__(self):
+        """Represent."""
+        return (f'CallStats({self.name!r}, count={self.count}, '
+                f'total={self.total:.3g}, own={self.own:.3g})')
+
+
+def _bin(elapsed):
+    return math.floor(math.log2(max(elapsed, 1e-9)) * _BINS_PER_OCTAVE)
+
+
+def label(kind, func):
+    """Name of the region timing `func` wrapped by `kind`."""
+    name = getattr(func, '__qualname__', None) or type(func).__name__
+    return f'{kind}({name})'
+
+
+def timed(name, func, *args, user=False):
+    """Call `func(*args)`, and record the time taken under `name`.
+
+    Regions marked as `user` code count towards the user's share in
+    `summary`.
+    """
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        frames = _local.frames = []
+        _local.user_depth = 0
+    frames.append(0.0)
+    _local.user_depth += user
+    start = perf_counter()
+    try:
+        return func(*args)
+    finally:
+        elapsed = perf_counter() - start
+        nested = frames.pop()
+        _local.user_depth -= user
+        if frames:
+            frames[-1] += elapsed
+        with _lock:
+            stats = _stats.get(name)
+            if stats is None:
+                stats = _stats[name] = CallStats(name, user)
+            stats.add(elapsed, nested)
+            if not frames:
+                _totals['total'] += elapsed
+            if user and not _local.user_depth:
+                _totals['user'] += elapsed
+
+
+def enable():
+    """Start timing calls."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Stop timing calls. The statistics are kept."""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Discard the statistics."""
+    with _lock:
+        _stats.clear()
+        _totals.update(total=0.0, user=0.0)
+
+
+@contextmanager
+def instrumented(clear=True):
+    """Enable instrumentation inside a `with` block.
+
+    Parameters
+    ----------
+    clear: bool
+        Discard previous statistics on entry.
+    """
+    global enabled
+    previous = enabled
+    if clear:
+        reset()
+    enabled = True
+    try:
+        yield
+    finally:
+        enabled = previous
+
+
+def stats():
+    """Mapping from region names to their `CallStats`."""
+    with _lock:
+        return dict(_stats)
+
+
+def summary():
+    """Split the instrumented time between user code and supernest.
+
+    Returns
+    -------
+    dict
+        `total` is the time spent in outermost instrumented calls,
+        `user` the part of it spent in user likelihoods, and
+        `overhead` the rest: prior transforms, corrections and
+        dispatch.
+    """
+    with _lock:
+        total, user = _totals['total'], _totals['user']
+    return {'total': total, 'user': user, 'overhead': total - user,
+            'user_fraction': user / total if total else math.nan}
+
+
+def report():
+    """A table of the statistics, sorted by own time."""
+    header = (f'{"region":<60} {"calls":>10} {"total/s":>10} '
+              f'{"own/s":>10} {"mean/us":>10} {"p50/us":>10} '
+              f'{"p90/us":>10} {"p99/us":>10}')
+    lines = [header, '-' * len(header)]
+    for s in sorted(stats().values(), key=lambda s: -s.own):
+        name = s.name + (' [user]' if s.user else '')
+        lines.append(f'{name[:60]:<60} {s.count:>10} {s.total:>10.4g} '
+                     f'{s.own:>10.4g} {s.mean * 1e6:>10.4g} '
+                     f'{s.percentile(50) * 1e6:>10.4g} '
+                     f'{s.percentile(90) * 1e6:>10.4g} '
+                     f'{s.percentile(99) * 1e6:>10.4g}')
+    totals = summary()
+    lines.append(f'user: {totals["user"]:.4g} s, supernest: '
+                 f'{totals["overhead"]:.4g} s, of {totals["total"]:.4g} s')
+    return '\n'.join(lines)
@@ -0,0 +1,84 @@
+r"""Numerical kernels of the Gaussian proposals, with swappable backends.
+
+The quantiles and densities of the Gaussian, truncated Gaussian and
+power posterior proposals are small array expressions. At a few tens
+of dimensions their cost is dominated by temporary arrays and ufunc
+dispatch rather than arithmetic. If Numba is installed, the kernels are
+compiled into single loops (`numba_backend`); otherwise the NumPy
+expressions (`numpy_backend`) are used. The two give the same results
+to rounding.
+
+The callers look the kernels up on `backend` at call time, so the
+backend can be switched at any point:
+
+    from supernest import kernels
+    kernels.use('numpy')
+
+The initial choice can be forced with the `SUPERNEST_KERNELS`
+environment variable.
+
+Independently of the backend, a proposal can have its quantile
+evaluated by the faster, but approximate, tables of `tabulated`, by
+passing `quantile='tabulated'`. See `quantile_kernels`.
+"""
+import importlib.util
+import os
+import warnings
+
+from . import numpy_backend
+from ..utils import lazy_import
+
+# Numba is only imported, and the kernels compiled, when they are first
+# called.
+if importlib.util.find_spec('numba') is None:
+    numba_backend = None
+else:
+    numba_backend = lazy_import(f'{__name__}.numba_backend')
+
+backends = {'numpy': numpy_backend}
+if numba_backend is not None:
+    backends['numba'] = numba_backend
+
+backend = numpy_backend
+
+
+def use(name):
+    """Select the backend called `name`, and return it."""
+    global backend
+    try:
+        backend = backends[name]
+    except KeyError:
+        raise ValueError(f'Unknown or unavailable kernel backend {name}. '
+                         f'Expected one of {list(backends)}.') from None
+    return backend
+
+
+def quantile_kernels(quantile):
+    """The kernels that evaluate the quantiles of a proposal: those of
+    the current backend for `quantile='exact'`, or those of `tabulated`
+    for `quantile='tabulated'`. The latter need Numba. Without it, a
+    warning is issued and the exact kernels are used.
+
+    """
+    if quantile == 'exact':
+        return backend
+    if quantile == 'tabulated':
+        try:
+            from . import tabulated
+        except ImportError:
+            warnings.warn('The tabulated quantiles need Numba, '
+                          f'using the exact {backend.name} kernels.')
+            return backend
+        return tabulated
+    raise ValueError(f'Unknown quantile: {quantile}. '
+                     'Expected \'exact\' or \'tabulated\'.')
+
+
+_requested = os.environ.get('SUPERNEST_KERNELS')
+if _requested is None:
+    use('numba' if 'numba' in backends else 'numpy')
+elif _requested in backends:
+    use(_requested)
+else:
+    warnings.warn(f'SUPERNEST_KERNELS={_requested} is unavailable, '
+                  f'using {backend.name}.')
@@ -0,0 +1,228 @@
+r"""Numba-compiled implementations of the numerical kernels.
+
+Each kernel is a single loop over the points and the dimensions, so
+that no temporaries are allocated besides the output, and there is
+one dispatch per call rather than one per ufunc. The signatures and
+results are those of `numpy_backend`.
+
+Numba cannot call `scipy.special`, so the normal quantile is computed
+here, with Wichura's rational approximation AS241, which is accurate
+to about 1e-16 relative to the result over the whole range. The inverse error function is derived from it, and so is accurate in
+absolute rather than relative terms near 0.
+
+Importing this module raises `ImportError` if Numba is not installed.
+The functions are compiled on first use, and the compiled code is
+cached on disk.
+"""
+import math
+
+import numba
+import numpy as np
+
+name = 'numba'
+
+RT2 = math.sqrt(2)
+
+# Wichura's algorithm AS241 (PPND16).
+_A = (3.3871328727963666080e0, 1.3314166789178437745e+2,
+      1.9715909503065514427e+3, 1.3731693765509461125e+4,
+      4.5921953931549871457e+4, 6.7265770927008700853e+4,
+      3.3430575583588128105e+4, 2.5090809287301226727e+3)
+_B = (1.0, 4.2313330701600911252e+1, 6.8718700749205790830e+2,
+      5.3941960214247511077e+3, 2.1213794301586595867e+4,
+      3.9307895800092710610e+4, 2.8729085735721942674e+4,
+      5.2264952788528545610e+3)
+_C = (1.42343711074968357734e0, 4.63033784615654529590e0,
+      5.76949722146069140550e0, 3.64784832476320460504e0,
+      1.27045825245236838258e0, 2.41780725177450611770e-1,
+      2.27238449892691845833e-2, 7.74545014278341407640e-4)
+_D = (1.0, 2.05319162663775882187e0, 1.67638483018380384940e0,
+      6.89767334985100004550e-1, 1.48103976427480074590e-1,
+      1.51986665636164571966e-2, 5.47593808499534494600e-4,
+      1.05075007164441684324e-9)
+_E = (6.65790464350110377720e0, 5.46378491116411436990e0,
+      1.78482653991729133580e0, 2.96560571828504891230e-1,
+      2.65321895265761230930e-2, 1.24266094738807843860e-3,
+      2.71155556874348757815e-5, 2.01033439929228813265e-7)
+_F = (1.0, 5.99832206555887937690e-1, 1.36929880922735805310e-1,
+      1.48753612908506148525e-2, 7.86869131145613259100e-4,
+      1.84631831751005468180e-5, 1.42151175831644588870e-7,
+      2.04426310338993978564e-15)
+
+
+@numba.njit(cache=True)
+def _ratio(num, den, r):
+    n, d = num[7], den[7]
+    for k in range(6, -1, -1):
+        n = n * r + num[k]
+        d = d * r + den[k]
+    return n / d
+
+
+@numba.njit(cache=True)
+def ndtri(p):
+    """Quantile of the standard normal distribution."""
+    q = p - 0.5
+    if abs(q) <= 0.425:
+        return q * _ratio(_A, _B, 0.180625 - q * q)
+    if not 0 < p < 1:
+        if p == 0:
+            return -math.inf
+        if p == 1:
+            return math.inf
+        return math.nan
+    r = math.sqrt(-math.log(p if q < 0 else 1 - p))
+    if r <= 5:
+        x = _ratio(_C, _D, r - 1.6)
+    else:
+        x = _ratio(_E, _F, r - 5)
+    return -x if q < 0 else x
+
+
+@numba.njit(cache=True)
+def erfinv(y):
+    """Inverse error function."""
+    return ndtri((y + 1) / 2) / RT2
+
+
+@numba.njit(cache=True)
+def _gaussian_quantile(cubes, mean, chol, out):
+    n, d = cubes.shape
+    z = np.empty(d)
+    for i in range(n):
+        for j in range(d):
+            z[j] = ndtri(cubes[i, j])
+        for j in range(d):
+            acc = mean[j]
+            for k in range(j + 1):
+                acc += chol[j, k] * z[k]
+            out[i, j] = acc
+    return out
+
+
+@numba.njit(cache=True)
+def _gaussian_log_pdf(thetas, mean, chol, log_norm, out):
+    n, d = thetas.shape
+    z = np.empty(d)
+    for i in range(n):
+        acc = 0.0
+        for j in range(d):
+            r = thetas[i, j] - mean[j]
+            for k in range(j):
+                r -= chol[j, k] * z[k]
+            z[j] = r / chol[j, j]
+            acc += z[j] * z[j]
+        out[i] = -acc / 2 - log_norm
+    return out
+
+
+@numba.njit(cache=True)
+def _truncated_quantile(cubes, mean, stdev, da, db, out):
+    n, d = cubes.shape
+    for i in range(n):
+        for j in range(d):
+            u = cubes[i, j]
+            y = (1 - u) * da[j] + u * db[j]
+            out[i, j] = mean[j] + stdev[j] * ndtri((y + 1) / 2)
+    return out
+
+
+@numba.njit(cache=True)
+def _diagonal_log_pdf(thetas, mean, half_precision, log_norm, out):
+    n, d = thetas.shape
+    for i in range(n):
+        acc = 0.0
+        for j in range(d):
+            delta = thetas[i, j] - mean[j]
+            acc += half_precision[j] * delta * delta
+        out[i] = -acc - log_norm
+    return out
+
+
+@numba.njit(cache=True)
+def _power_gaussian_quantile(cubes, mean, sigma, a, b, beta, out):
+    n, d = cubes.shape
+    for i in range(n):
+        scale = math.sqrt(beta[i] / 2)
+        for j in range(d):
+            root = scale / sigma[j]
+            da = math.erf((a[j] - mean[j]) * root)
+            db = math.erf((b[j] - mean[j]) * root)
+            u = cubes[i, j]
+            out[i, j] = mean[j] + sigma[j] / scale * erfinv(
+                (1 - u) * da + u * db)
+    return out
+
+
+@numba.njit(cache=True)
+def _power_gaussian_log_pdf(thetas, mean, sigma, a, b, beta, out):
+    n, d = thetas.shape
+    for i in range(n):
+        scale = math.sqrt(beta[i] / 2)
+        acc = 0.0
+        for j in range(d):
+            root = scale / sigma[j]
+            da = math.erf((a[j] - mean[j]) * root)
+            db = math.erf((b[j] - mean[j]) * root)
+            delta = (thetas[i, j] - mean[j]) * root
+            acc -= delta * delta
+            acc -= math.log(math.pi * sigma[j] ** 2 / 2 / beta[i]) / 2
+            acc -= math.log(db - da)
+        out[i] = acc
+    return out
+
+
+def _call(kernel, points, *args, per_point=False):
+    points = np.asarray(points, dtype=np.float64)
+    single = points.ndim == 1
+    if single:
+        points = points[None]
+    out = np.empty(len(points) if per_point else points.shape)
+    out = kernel(points, *args, out)
+    return out[0] if single else out
+
+
+def _vector(x, d):
+    # Parameters are used as they are, unless they are scalars.
+    return x if np.ndim(x) else np.full(d, x, dtype=np.float64)
+
+
+def gaussian_quantile(cube, mean, chol):
+    """Compiled `numpy_backend.gaussian_quantile`."""
+    return _call(_gaussian_quantile, cube, mean, chol)
+
+
+def gaussian_log_pdf(theta, mean, chol, log_norm):
+    """Compiled `numpy_backend.gaussian_log_pdf`."""
+    return _call(_gaussian_log_pdf, theta, mean, chol, float(log_norm),
+                 per_point=True)
+
+
+def truncated_quantile(cube, mean, stdev, da, db):
+    """Compiled `numpy_backend.truncated_quantile`."""
+    d = np.shape(cube)[-1]
+    return _call(_truncated_quantile, cube, _vector(mean, d),
+                 _vector(stdev, d), _vector(da, d), _vector(db, d))
+
+
+def diagonal_log_pdf(theta, mean, half_precision, log_norm):
+    """Compiled `numpy_backend.diagonal_log_pdf`."""
+    d = np.shape(theta)[-1]
+    return _call(_diagonal_log_pdf, theta, _vector(mean, d),
+                 _vector(half_precision, d), float(log_norm), per_point=True)
+
+
+def power_gaussian_quantile(cube, mean, sigma, a, b, beta):
+    """Compiled `numpy_backend.power_gaussian_quantile`."""
+    n, d = np.shape(np.atleast_2d(cube))
+    return _call(_power_gaussian_quantile, cube, _vector(mean, d),
+                 _vector(sigma, d), _vector(a, d), _vector(b, d),
+                 _vector(beta, n))
+
+
+def power_gaussian_log_pdf(theta, mean, sigma, a, b, beta):
+    """Compiled `numpy_backend.power_gaussian_log_pdf`."""
+    n, d = np.shape(np.atleast_2d(theta))
+    return _call(_power_gaussian_log_pdf, theta, _vector(mean, d),
+                 _vector(sigma, d), _vector(a, d), _vector(b, d),
+                 _vector(beta, n), per_point=True)
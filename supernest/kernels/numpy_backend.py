@@ -0,0 +1,77 @@
+r"""NumPy implementations of the numerical kernels.
+
+These are the reference implementations: the compiled kernels in
+`numba_backend` are tested against them. Every kernel accepts either a
+single point, or an (N, D) array of points.
+"""
+import numpy as np
+
+from ..utils import lazy_import
+
+la = lazy_import('scipy.linalg')
+sp = lazy_import('scipy.special')
+
+name = 'numpy'
+
+RT2 = np.sqrt(2)
+
+
+def gaussian_quantile(cube, mean, chol):
+    """Quantile of the normal distribution with Cholesky factor `chol`."""
+    z = RT2 * sp.erfinv(2 * np.asarray(cube) - 1)
+    return mean + z @ chol.T
+
+
+def gaussian_log_pdf(theta, mean, chol, log_norm):
+    """Log-density of the normal distribution with Cholesky factor
+    `chol` and normalisation `log_norm`."""
+    delta = np.asarray(theta) - mean
+    z = la.solve_triangular(chol, delta.T, lower=True, check_finite=False).T
+    return -(z * z).sum(axis=-1) / 2 - log_norm
+
+
+def truncated_quantile(cube, mean, stdev, da, db):
+    """Quantile of an uncorrelated truncated normal distribution.
+
+    `da` and `db` are the error functions of the standardised lower
+    and upper bounds divided by sqrt(2).
+    """
+    cube = np.asarray(cube)
+    return mean + stdev * RT2 * sp.erfinv((1 - cube) * da + cube * db)
+
+
+def diagonal_log_pdf(theta, mean, half_precision, log_norm):
+    """Log-density of an uncorrelated normal distribution, summed over
+    the last axis. `half_precision` is the coefficient of the squared
+    deviation from the mean."""
+    delta = np.asarray(theta) - mean
+    return -(half_precision * delta * delta).sum(axis=-1) - log_norm
+
+
+def _beta_column(beta):
+    beta = np.asarray(beta, dtype=np.float64)
+    return beta[:, None] if beta.ndim else beta
+
+
+def power_gaussian_quantile(cube, mean, sigma, a, b, beta):
+    """Quantile of an uncorrelated normal distribution with scale
+    `sigma / sqrt(beta)`, truncated to [a, b]. For a batch, `beta` may
+    hold one value per point."""
+    beta = _beta_column(beta)
+    root = np.sqrt(beta / 2) / sigma
+    da, db = sp.erf((a - mean) * root), sp.erf((b - mean) * root)
+    cube = np.asarray(cube)
+    return mean + np.sqrt(2 / beta) * sigma * sp.erfinv(
+        (1 - cube) * da + cube * db)
+
+
+def power_gaussian_log_pdf(theta, mean, sigma, a, b, beta):
+    """Log-density of the distribution of `power_gaussian_quantile`,
+    summed over the last axis."""
+    beta = _beta_column(beta)
+    root = np.sqrt(beta / 2) / sigma
+    da, db = sp.erf((a - mean) * root), sp.erf((b - mean) * root)
+    ret = -beta * (np.asarray(theta) - mean) ** 2 / 2 / sigma ** 2
+    ret -= np.log(np.pi * sigma ** 2 / 2 / beta) / 2
+    ret -= np.log(db - da)
+    return ret.sum(axis=-1)
@@ -0,0 +1,165 @@
+r"""Tabulated quantile kernels.
+
+The quantiles of the Gaussian proposals spend most of their time in
+the normal quantile, i.e. in `erfinv`. Here it is replaced by a lookup
+in precomputed tables of cubic polynomials, which is about twice as
+fast as the compiled rational approximation of `numba_backend`, and
+three times as fast as `scipy.special.ndtri`.
+
+The quantile `ndtri(p)` of the standard normal distribution is
+tabulated for `p` in [0.02, 0.5], on a uniform grid of 4096 cells, and
+for `p` below 0.02 on a uniform grid of 2048 cells in `w = sqrt(-2 log
+p)`, in which the tail is smooth, down to the smallest subnormal. The
+rest follows by symmetry. Each cell holds the cubic Hermite
+interpolant of the exact values and slopes at its ends. The absolute
+error of `ndtri` is below `MAX_ERROR` = 5e-11 over the whole of (0, 1),
+and that of `erfinv` is smaller by sqrt(2). This is far below the
+resolution that nested sampling needs, but it is not exact, so the
+tables are opt-in, per proposal, with `quantile='tabulated'`.
+
+The densities are unaffected: they never call `erfinv`, and are
+evaluated by the exact kernels.
+
+Importing this module raises `ImportError` if Numba is not installed.
+Evaluated with NumPy, the tables would be no faster than SciPy.
+"""
+import math
+
+import numba
+import numpy as np
+import scipy.special as sp
+
+from .numba_backend import _call, _vector
+from ..utils import ndtri_exp
+
+name = 'tabulated'
+
+MAX_ERROR = 5e-11
+
+RT2 = math.sqrt(2)
+RT2PI = math.sqrt(2 * math.pi)
+
+
+def _cubic_coefficients(x, slope, h):
+    """Coefficients of the Hermite cubic of each cell, in powers of the
+    fractional position in the cell, lowest first."""
+    f0, f1, d0, d1 = x[:-1], x[1:], slope[:-1] * h, slope[1:] * h
+    return np.ascontiguousarray(np.stack(
+        [f0, d0, 3 * (f1 - f0) - 2 * d0 - d1, 2 * (f0 - f1) + d0 + d1],
+        axis=1))
+
+
+_P0, _CENTRAL_CELLS = 0.02, 4096
+_p = np.linspace(_P0, 0.5, _CENTRAL_CELLS + 1)
+_x = sp.ndtri(_p)
+_CENTRAL = _cubic_coefficients(_x, RT2PI * np.exp(_x ** 2 / 2),
+                               (0.5 - _P0) / _CENTRAL_CELLS)
+_CENTRAL_SCALE = _CENTRAL_CELLS / (0.5 - _P0)
+
+_W0, _W1, _TAIL_CELLS = math.sqrt(-2 * math.log(_P0)), 40.0, 2048
+
+
+def _tail_table():
+    """The cubics of the tail, in `w = sqrt(-2 log p)`. The nodes reach
+    p = exp(-800), so they are found with `utils.ndtri_exp`, which does
+    not need SciPy 1.9."""
+    w = np.linspace(_W0, _W1, _TAIL_CELLS + 1)
+    x = ndtri_exp(-w ** 2 / 2)
+    return _cubic_coefficients(x, -RT2PI * w * np.exp((x ** 2 - w ** 2) / 2),
+                               (_W1 - _W0) / _TAIL_CELLS)
+
+
+_TAIL = _tail_table()
+_TAIL_SCALE = _TAIL_CELLS / (_W1 - _W0)
+del _p, _x
+
+
+@numba.njit(cache=True)
+def _interpolate(table, s):
+    i = min(int(s), table.shape[0] - 1)
+    t = s - i
+    return ((table[i, 3] * t + table[i, 2]) * t + table[i, 1]) * t \
+        + table[i, 0]
+
+
+@numba.njit(cache=True)
+def ndtri(p):
+    """Quantile of the standard normal distribution."""
+    q = p if p <= 0.5 else 1 - p
+    if q >= _P0:
+        x = _interpolate(_CENTRAL, (q - _P0) * _CENTRAL_SCALE)
+    elif q > 0:
+        x = _interpolate(_TAIL,
+                         (math.sqrt(-2 * math.log(q)) - _W0) * _TAIL_SCALE)
+    elif q == 0:
+        x = -math.inf
+    else:
+        return math.nan
+    return x if p <= 0.5 else -x
+
+
+@numba.njit(cache=True)
+def erfinv(y):
+    """Inverse error function."""
+    return ndtri((y + 1) / 2) / RT2
+
+
+@numba.njit(cache=True)
+def _gaussian_quantile(cubes, mean, chol, out):
+    n, d = cubes.shape
+    z = np.empty(d)
+    for i in range(n):
+        for j in range(d):
+            z[j] = ndtri(cubes[i, j])
+        for j in range(d):
+            acc = mean[j]
+            for k in range(j + 1):
+                acc += chol[j, k] * z[k]
+            out[i, j] = acc
+    return out
+
+
+@numba.njit(cache=True)
+def _truncated_quantile(cubes, mean, stdev, da, db, out):
+    n, d = cubes.shape
+    for i in range(n):
+        for j in range(d):
+            u = cubes[i, j]
+            y = (1 - u) * da[j] + u * db[j]
+            out[i, j] = mean[j] + stdev[j] * ndtri((y + 1) / 2)
+    return out
+
+
+@numba.njit(cache=True)
+def _power_gaussian_quantile(cubes, mean, sigma, a, b, beta, out):
+    n, d = cubes.shape
+    for i in range(n):
+        scale = math.sqrt(beta[i] / 2)
+        for j in range(d):
+            root = scale / sigma[j]
+            da = math.erf((a[j] - mean[j]) * root)
+            db = math.erf((b[j] - mean[j]) * root)
+            u = cubes[i, j]
+            out[i, j] = mean[j] + sigma[j] / scale * erfinv(
+                (1 - u) * da + u * db)
+    return out
+
+
+def gaussian_quantile(cube, mean, chol):
+    """Tabulated `numpy_backend.gaussian_quantile`."""
+    return _call(_gaussian_quantile, cube, mean, chol)
+
+
+def truncated_quantile(cube, mean, stdev, da, db):
+    """Tabulated `numpy_backend.truncated_quantile`."""
+    d = np.shape(cube)[-1]
+    return _call(_truncated_quantile, cube, _vector(mean, d),
+                 _vector(stdev, d), _vector(da, d), _vector(db, d))
+
+
+def power_gaussian_quantile(cube, mean, sigma, a, b, beta):
+    """Tabulated `numpy_backend.power_gaussian_quantile`."""
+    n, d = np.shape(np.atleast_2d(cube))
+    return _call(_power_gaussian_quantile, cube, _vector(mean, d),
+                 _vector(sigma, d), _vector(a, d), _vector(b, d),
+                 _vector(beta, n))
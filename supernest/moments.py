@@ -0,0 +1,195 @@
+r"""Streaming weighted means and covariances.
+
+Proposals are usually built from the mean and covariance of an
+earlier run. For long chains there is no need to hold the samples in
+memory: `WeightedMoments` takes them in chunks, and merges each
+chunk's mean and scatter matrix into the running ones (Welford's
+update, in the pairwise form of Chan, Golub and LeVeque), which is
+numerically stable even when the mean is large compared to the
+spread.
+
+`CholeskyMoments` keeps the Cholesky factor of the scatter matrix
+instead, and updates it by rank-k updates, so that a Gaussian proposal
+can be rebuilt from it without refactorising the covariance.
+"""
+import numpy as np
+
+
+class WeightedMoments:
+    r"""Running weighted mean and covariance.
+
+    The weights are reliability weights, as in `np.cov(aweights=...)`
+    and in anesthetic, so that `covariance` agrees with both. They can
+    also be given as log-weights, e.g. the log posterior weights of
+    dead points, whose range overflows `np.exp`: the accumulated
+    weights are then relative to `exp(log_scale)`, and rescaled
+    whenever a larger log-weight arrives.
+
+    Parameters
+    ----------
+    nDims: int, optional
+        Number of parameters. Inferred from the first chunk otherwise.
+    """
+
+    def __init__(self, nDims=None):
+        """Create."""
+        self.nDims = nDims
+        self.count = 0
+        self.weight = 0.0
+        self.weight_squared = 0.0
+        self.log_scale = 0.0
+        self.mean = None if nDims is None else np.zeros(nDims)
+        self._clear_scatter(nDims)
+
+    def _clear_scatter(self, nDims):
+        self.scatter = None if nDims is None else np.zeros((nDims, nDims))
+
+    def update(self, samples, weights=None, log_weights=None):
+        """Add an (N, nDims) chunk of samples, with N optional weights
+        or log-weights."""
+        samples = np.atleast_2d(np.asarray(samples, dtype=np.float64))
+        if self.mean is None:
+            self.__init__(samples.shape[1])
+        elif samples.shape[1] != self.nDims:
+            raise ValueError(f'Expected {self.nDims} parameters, '
+                             f'got {samples.shape[1]}.')
+        if log_weights is not None:
+            weights = self._relative_weights(log_weights)
+        weights = np.ones(len(samples)) if weights is None \
+            else np.asarray(weights, dtype=np.float64)
+        if len(weights) != len(samples):
+            raise ValueError(f'Got {len(samples)} samples, '
+                             f'but {len(weights)} weights.')
+        total = weights.sum()
+        if total <= 0:
+            return self
+        mean = weights @ samples / total
+        rows = (samples - mean) * np.sqrt(weights)[:, None]
+        self._merge(len(samples), total, (weights**2).sum(), mean, rows)
+        return self
+
+    def merge(self, other):
+        """Add the samples accumulated by another `WeightedMoments`.
+        Both must use the same `log_scale`."""
+        if other.weight > 0:
+            if self.mean is None:
+                self.__init__(other.nDims)
+            self._merge(other.count, other.weight, other.weight_squared,
+                        other.mean, other._scatter_rows())
+        return self
+
+    def _relative_weights(self, log_weights):
+        log_weights = np.asarray(log_weights, dtype=np.float64)
+        top = log_weights.max(initial=-np.inf)
+        if self.weight == 0 and np.isfinite(top):
+            self.log_scale = top
+        elif top > self.log_scale:
+            self._rescale(np.exp(self.log_scale - top))
+            self.log_scale = top
+        return np.exp(log_weights - self.log_scale)
+
+    def _rescale(self, factor):
+        self.weight *= factor
+        self.weight_squared *= factor**2
+        self.scatter *= factor
+
+    def _scatter_rows(self):
+        """Rows `R` with `R.T @ R == scatter`."""
+        eigvals, eigvecs = np.linalg.eigh(self.scatter)
+        return np.sqrt(np.maximum(eigvals, 0))[:, None] * eigvecs.T
+
+    def _add_scatter(self, rows):
+        self.scatter += rows.T @ rows
+
+    def _merge(self, count, weight, weight_squared, mean, rows):
+        total = self.weight + weight
+        delta = mean - self.mean
+        self._add_scatter(np.vstack(
+            [rows, np.sqrt(self.weight * weight / total) * delta]))
+        self.mean += delta * weight / total
+        self.weight = total
+        self.weight_squared += weight_squared
+        self.count += count
+
+    @property
+    def effective_samples(self):
+        """Kish's effective sample size."""
+        return self.weight**2 / self.weight_squared
+
+    @property
+    def covariance(self):
+        """Unbiased weighted covariance."""
+        return self.scatter / (self.weight - self.weight_squared / self.weight)
+
+    def __repr__(self):
+        """Representation."""
+        return (f'WeightedMoments(nDims={self.nDims}, count={self.count}, '
+                f'effective_samples={self.effective_samples:.1f})')
+
+
+class CholeskyMoments(WeightedMoments):
+    r"""Running weighted mean and Cholesky factor of the covariance.
+
+    Instead of the scatter matrix, the lower Cholesky factor of it is
+    kept, and each chunk of k samples is folded in by a rank-(k + 1)
+    update. No covariance is ever formed or refactorised, so the
+    factor stays accurate even when the covariance is
+    ill-conditioned, and `covariance_cholesky` is ready to be used by
+    a `GaussianFactorisation`.
+    """
+
+    def _clear_scatter(self, nDims):
+        self.cholesky = None if nDims is None else np.zeros((nDims, nDims))
+
+    @property
+    def scatter(self):
+        """Weighted scatter matrix."""
+        return self.cholesky @ self.cholesky.T
+
+    def _rescale(self, factor):
+        self.weight *= factor
+        self.weight_squared *= factor**2
+        self.cholesky *= np.sqrt(factor)
+
+    def _scatter_rows(self):
+        return self.cholesky.T
+
+    def _add_scatter(self, rows):
+        self.cholesky = cholupdate(self.cholesky, rows)
+
+    @property
+    def covariance_cholesky(self):
+        """Lower Cholesky factor of `covariance`."""
+        return self.cholesky / np.sqrt(
+            self.weight - self.weight_squared / self.weight)
+
+
+def cholupdate(chol, rows):
+    r"""Rank-k update of a lower Cholesky factor.
+
+    Returns the lower triangular `L` with non-negative diagonal such
+    that `L @ L.T == chol @ chol.T + rows.T @ rows`, where `rows` is
+    (k, D). It is the triangular factor of the QR decomposition of
+    `chol.T` stacked on `rows`, which costs O((D + k) D^2), and unlike
+    refactorising the sum, never squares the condition number.
+    """
+    r = np.linalg.qr(np.vstack([chol.T, np.atleast_2d(rows)]), mode='r')
+    signs = np.where(np.diag(r) < 0, -1.0, 1.0)
+    return (signs[:, None] * r).T
+
+
+def shrink(covmat, intensity):
+    r"""Shrink a covariance towards its diagonal.
+
+    Returns `(1 - intensity) * covmat + intensity * diag(covmat)`.
+    The variances are kept, and the correlations scaled by `1 -
+    intensity`, which bounds the condition number of the correlation
+    matrix by `(2 - intensity) / intensity` or so. Use it when a
+    high-dimensional covariance estimated from few effective samples
+    is ill-conditioned.
+    """
+    if not 0 <= intensity <= 1:
+        raise ValueError(f'Shrinkage intensity must be in [0, 1], '
+                         f'got {intensity}.')
+    covmat = np.asarray(covmat, dtype=np.float64)
+    return (1 - intensity) * covmat + intensity * np.diag(np.diag(covmat))
@@ -1,3 +1,9 @@
-from .types import Prior, Likelihood, Proposal
+from .types import (Prior, Likelihood, Correction, Proposal, as_batch,
+                    as_likelihood_batch)
+from .factorisation import GaussianFactorisation
+from .power_gaussian import PowerGaussian
 from .gaussian import gaussian_proposal
-from .truncated_gaussian import truncated_gaussian_proposal
+from .truncated_gaussian import (truncated_gaussian_proposal,
+                                 correlated_truncated_gaussian_proposal)
+from .gaussian_mixture import gaussian_mixture_proposal
+from .adaptive import AdaptiveProposal
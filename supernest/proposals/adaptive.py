@@ -0,0 +1,134 @@
+r"""A Gaussian proposal that is refined from the dead points of a run.
+
+A proposal built from a badly centred guess still gives the right
+evidence, but little speed-up. `AdaptiveProposal` is a PolyChord
+dumper: pass it as `dumper` to `run_polychord`, to
+`supernest.sampler.nested_sample` or to `Model.nested_sample`, and it
+accumulates the weighted mean and the Cholesky factor of the
+covariance of the dead points, as they arrive. `rebuild` then
+replaces the proposal by one centred on what was learned.
+
+Evidence bookkeeping
+--------------------
+The proposal must only be rebuilt between runs, never during one.
+The live points of a run in progress were drawn from the old
+proposal, and the volume compression that nested sampling infers
+from them is only valid for that prior. So each run uses one fixed
+proposal, and since every proposal repartitions the same product of
+prior and likelihood, each run is a complete, unbiased estimate of
+the same evidence. Report the last run's evidence, or combine the
+runs' by inverse-variance weighting; runs that disagree by much more
+than their errors are a sign that a proposal is too narrow.
+
+The dead points' posterior weights are unaffected by the
+repartitioning, so the moments that are learned are those of the
+original posterior, whichever proposal the run used. Runs can keep
+adding to the same moments.
+"""
+import warnings
+import numpy as np
+from supernest.moments import CholeskyMoments
+from supernest.proposals.factorisation import GaussianFactorisation
+from supernest.proposals.gaussian import gaussian_proposal
+
+
+class AdaptiveProposal:
+    r"""A `gaussian_proposal` refined from the dead points of runs.
+
+    Parameters
+    ----------
+    bounds: array-like
+        The (min, max) of the original uniform prior.
+
+    mean: array-like
+        The initial guess of the posterior mean.
+
+    covmat: array-like
+        The initial guess of the posterior covariance.
+
+    loglike: callable (optional)
+        The loglikelihood function of the original model to be corrected.
+
+    min_effective_samples: float (optional)
+        `rebuild` keeps the current proposal until the dead points
+        amount to this many effective samples. Defaults to ten per
+        dimension.
+
+    The first nDims parameters of the dead points are taken to be the
+    physical ones, so the proposal can be superimposed with others.
+    """
+
+    def __init__(self, bounds, mean, covmat, loglike=None,
+                 min_effective_samples=None, logzero=-1e30):
+        """Create."""
+        self.bounds = bounds
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.covmat = np.asarray(covmat, dtype=np.float64)
+        self.loglike = loglike
+        self.logzero = logzero
+        self.min_effective_samples = 10 * len(self.mean) \
+            if min_effective_samples is None else min_effective_samples
+        self.moments = CholeskyMoments(len(self.mean))
+        self.proposal = gaussian_proposal(bounds, self.mean, self.covmat,
+                                          loglike, logzero)
+        self._seen = 0
+
+    def __call__(self, live, dead, logweights, logZ=None, logZerr=None):
+        """Add the dead points that were not seen yet.
+
+        PolyChord passes all the dead points of the run on every
+        call, so only the rows past the previous call are new. Fewer
+        rows than before means that a new run has started.
+        """
+        if len(dead) < self._seen:
+            self._seen = 0
+        if len(dead) > self._seen:
+            self.moments.update(dead[self._seen:, :len(self.mean)],
+                                log_weights=logweights[self._seen:])
+        self._seen = len(dead)
+
+    def rebuild(self):
+        """Rebuild the proposal from the moments of the dead points.
+
+        Only call this between runs. The learned Cholesky factor is
+        used as is, so the covariance is not refactorised. If the dead
+        points are still too few, the proposal is kept, with a
+        warning.
+
+        Returns
+        -------
+        proposal: Proposal (tuple(prior, loglike))
+        """
+        if self.moments.weight == 0 or \
+                self.moments.effective_samples < self.min_effective_samples:
+            warnings.warn('Too few dead points to rebuild the proposal: '
+                          f'{self.moments!r}')
+            return self.proposal
+        self.mean = self.moments.mean.copy()
+        cholesky = self.moments.covariance_cholesky
+        self.covmat = cholesky @ cholesky.T
+        factorisation = GaussianFactorisation(self.mean, self.covmat,
+                                              cholesky)
+        self.proposal = gaussian_proposal(self.bounds, self.mean, self.covmat,
+                                          self.loglike, self.logzero,
+                                          factorisation)
+        return self.proposal
+
+    @property
+    def prior(self):
+        """Prior quantile of the current proposal."""
+        return self.proposal.prior
+
+    @property
+    def likelihood(self):
+        """Corrected likelihood of the current proposal."""
+        return self.proposal.likelihood
+
+    @property
+    def nDims(self):
+        """Dimensionality of the current proposal."""
+        return self.proposal.nDims
+
+    def __repr__(self):
+        """Representation."""
+        return f'AdaptiveProposal({self.moments!r})\n{self.proposal.prior!r}'
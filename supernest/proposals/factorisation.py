@@ -0,0 +1,121 @@
+r"""Precomputed factorisations of multivariate normal distributions.
+
+Every Gaussian proposal needs the Cholesky factor of its covariance
+for the quantile, and the log-determinant and the inverse for the
+correction. These are O(D^3) to compute, but never change, so they are
+computed once here and shared between the prior and the likelihood.
+"""
+import warnings
+import numpy as np
+from supernest import kernels
+from supernest.utils import lazy_import
+
+la = lazy_import('scipy.linalg')
+
+
+# The smallest eigenvalue of a covariance, relative to the largest,
+# below which it is regularised. A singular covariance would otherwise
+# be factorised with a pivot of the order of the rounding error, and
+# its density would reach magnitudes of 1e15 off its support.
+RCOND = 1e-8
+
+
+def regularised_cholesky(covmat: np.ndarray, rcond: float = RCOND):
+    r"""Lower Cholesky factor of `covmat`, repaired if need be.
+
+    If `covmat` is not positive definite, or is so badly conditioned
+    that its smallest eigenvalue is below `rcond` times its largest,
+    it is replaced by the nearest symmetric matrix whose eigenvalues
+    are no smaller than that floor, and a warning is issued. This
+    covers singular, positive semi-definite covariances, for which
+    `np.linalg.cholesky` may well succeed.
+
+    Parameters
+    ----------
+    covmat: array-like
+        A square covariance matrix.
+
+    rcond: float (optional)
+        The relative floor of the eigenvalues. The regularised
+        covariance has a condition number of at most `1 / rcond`.
+
+    Returns
+    -------
+    chol: np.ndarray
+        A lower triangular matrix `L` such that `L @ L.T` is
+        (approximately) `covmat`.
+    """
+    covmat = np.asarray(covmat, dtype=np.float64)
+    sym = (covmat + covmat.T) / 2
+    eigvals, eigvecs = np.linalg.eigh(sym)
+    top = np.abs(eigvals).max(initial=0)
+    floor = rcond * (top if top > 0 else 1)
+    if eigvals.min(initial=np.inf) >= floor:
+        try:
+            return np.linalg.cholesky(covmat)
+        except np.linalg.LinAlgError:
+            pass
+    warnings.warn('Covariance matrix is not positive definite, '
+                  f'or is singular, clipping its eigenvalues at {floor:.3g}.')
+    eigvals = np.maximum(eigvals, floor)
+    return np.linalg.cholesky((eigvecs * eigvals) @ eigvecs.T)
+
+
+class GaussianFactorisation:
+    r"""A multivariate normal distribution with its factorisation.
+
+    Holds the Cholesky factor, the log-determinant of the covariance
+    and the normalisation of the log-density, so that the quantile and
+    the density are a matrix product and a triangular solve
+    respectively.
+
+    All methods accept either a single point, or an (N, D) array of
+    points.
+    """
+
+    def __init__(self, mean: np.ndarray, covmat: np.ndarray,
+                 cholesky: np.ndarray = None, rcond: float = RCOND):
+        """Factorise, unless the Cholesky factor is given. See
+        `regularised_cholesky` for `rcond`."""
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.covmat = np.asarray(covmat, dtype=np.float64)
+        self.cholesky = regularised_cholesky(self.covmat, rcond) \
+            if cholesky is None \
+            else np.asarray(cholesky, dtype=np.float64)
+        self.logdet = 2 * np.log(np.diag(self.cholesky)).sum()
+        self.log_norm = np.log(2 * np.pi) * len(self.mean) / 2 \
+            + self.logdet / 2
+
+    @property
+    def nDims(self):
+        """Dimensionality of the distribution."""
+        return len(self.mean)
+
+    def colour(self, z: np.ndarray):
+        """Map standard normal deviates `z` to the distribution."""
+        return self.mean + z @ self.cholesky.T
+
+    def whiten(self, theta: np.ndarray):
+        """Map points of the distribution to standard normal deviates."""
+        delta = np.asarray(theta) - self.mean
+        return la.solve_triangular(self.cholesky, delta.T, lower=True,
+                                   check_finite=False).T
+
+    def mahalanobis(self, theta: np.ndarray):
+        """Squared Mahalanobis distance of `theta` from the mean."""
+        z = self.whiten(theta)
+        return (z * z).sum(axis=-1)
+
+    def log_pdf(self, theta: np.ndarray):
+        """Log-density of the distribution at `theta`."""
+        return kernels.backend.gaussian_log_pdf(theta, self.mean,
+                                                self.cholesky, self.log_norm)
+
+    def inverse(self):
+        """Inverse of the covariance matrix."""
+        return la.cho_solve((self.cholesky, True), np.eye(self.nDims),
+                            check_finite=False)
+
+    def __repr__(self):
+        """Representation."""
+        return f'GaussianFactorisation(mean={self.mean}, logdet={self.logdet})'
@@ -1,9 +1,10 @@
 import numpy as np
-import scipy.special as sp
 import supernest.utils as utils
-from supernest.proposals.types import (Prior, Proposal,
-                                       Likelihood, CorrectedLikelihood)
-from functools import lru_cache
+from supernest import kernels
+from supernest.proposals.types import (Prior, Proposal, Correction,
+                                       CorrectedLikelihood)
+from supernest.proposals.factorisation import GaussianFactorisation
+from supernest.proposals.power_gaussian import PowerGaussian
 
 macheps = np.nextafter(0, 1)
 
@@ -11,18 +12,30 @@ macheps = np.nextafter(0, 1)
 class GaussianPrior(Prior):
     """Class wrapping correlated multivariate normal distribution."""
 
-    def __init__(self, mean, covmat, logzero=-1e30):
+    def __init__(self, mean, covmat, logzero=-1e30, factorisation=None,
+                 quantile='exact'):
         """Create."""
         self.mean = mean
         self.covmat = covmat
         self.logzero = logzero
+        self.factorisation = GaussianFactorisation(mean, covmat) \
+            if factorisation is None else factorisation
+        self.quantile = quantile
 
     def prior(self, cube: np.ndarray):
         """Prior quantile implementation."""
-        theta = np.sqrt(2) * sp.erfinv(2 * cube - 1)
-        theta = self.mean + np.linalg.cholesky(self.covmat) @ theta
+        f = self.factorisation
+        theta = kernels.quantile_kernels(self.quantile).gaussian_quantile(
+            cube, f.mean, f.cholesky)
         return utils.guard_against_inf_nan(cube, theta, self.logzero, 1e30)
 
+    def batch(self, cubes: np.ndarray):
+        """Prior quantile of an (N, nDims) array of hypercube points."""
+        f = self.factorisation
+        theta = kernels.quantile_kernels(self.quantile).gaussian_quantile(
+            cubes, f.mean, f.cholesky)
+        return utils.guard_against_inf_nan(cubes, theta, self.logzero, 1e30)
+
     def __repr__(self):
         """Representation."""
         return f"""Gaussian
@@ -40,7 +53,9 @@ def gaussian_proposal(bounds: np.ndarray,
                       mean: np.ndarray,
                       covmat: np.ndarray,
                       loglike: callable = None,
-                      logzero: np.float64 = -1e30):
+                      logzero: np.float64 = -1e30,
+                      factorisation: GaussianFactorisation = None,
+                      quantile: str = 'exact'):
     r"""Produce a Gaussian proposal.
 
     Given a uniform prior defined by bounds, produces the corrected
@@ -61,32 +76,44 @@ def gaussian_proposal(bounds: np.ndarray,
     loglike: callable (optional)
         The loglikelihood function of the original model to be corrected.
 
+    factorisation: GaussianFactorisation (optional)
+        A factorisation of `mean` and `covmat` that is already at
+        hand, e.g. one kept up to date by an adaptive proposal.
+
+    quantile: str (optional)
+        'exact' (the default), or 'tabulated' for the faster quantile
+        of `supernest.kernels.tabulated`, whose absolute error is
+        below 5e-11 times the scale of the proposal.
+
     Returns
     -------
     proposal: Proposal (tuple(prior, loglike))
+
+    The covariance is factorised once, here, and the factorisation is
+    shared between the prior and the correction. If `covmat` is not
+    positive definite, its eigenvalues are clipped with a warning.
     """
     covmat, a, b = utils.process_stdev(covmat, mean, bounds)
     log_box = np.log(b - a).sum() if utils.eitheriter(
         (a, b)) else len(mean) * np.log(b - a)
     log_box = -log_box
-    invCov = np.linalg.inv(covmat)
-
-    def correction(theta):
-        ll, phi = (0, []) if loglike is None else loglike(theta)
-        corr = -((theta - mean) @ invCov @ (theta - mean)) / 2.0
-        corr -= np.log(
-            2 * np.pi) * len(mean) / 2 + np.linalg.slogdet(covmat)[1] / 2
+    if factorisation is None:
+        factorisation = GaussianFactorisation(mean, covmat)
 
-        return (ll - corr + log_box), phi
-
-    return Proposal(GaussianPrior(mean, covmat),
-                    Likelihood(correction) if loglike is None
+    correction = Correction(log_box, factorisation.log_pdf)
+    return Proposal(GaussianPrior(mean, covmat, logzero, factorisation,
+                                  quantile),
+                    correction if loglike is None
                     else CorrectedLikelihood(loglike, correction),
                     nDims=len(mean))
 
 
 class PowerPosteriorPrior(Prior):
-    """Implementation of Chen, Ferroz and Hobson's posterior repartitioning."""
+    """Implementation of Chen, Ferroz and Hobson's posterior repartitioning.
+
+    `beta` takes one of `beta_levels` values (256 by default, None for
+    a continuum), see `PowerGaussian`.
+    """
 
     def __init__(self, mean, covmat, **kwargs):
         """Construct."""
@@ -97,29 +124,30 @@ class PowerPosteriorPrior(Prior):
         self.beta_max = kwargs.get('beta_max', 1)
         self.beta_min = kwargs.get('beta_min', macheps)
         self.bounds = kwargs.get('bounds')
+        self.power_gaussian = PowerGaussian(
+            mean, np.diag(covmat), *self.bounds,
+            levels=kwargs.get('beta_levels', 256))
 
     def power_gaussian_quantile(self, cube, beta=1):
         """Power Gaussian Quantile evaluation."""
-        sigma = np.diag(self.covmat)
-        da = _erf_term(self.bounds[0] - self.mean, beta, sigma)
-        db = _erf_term(self.bounds[1] - self.mean, beta, sigma)
-        ret = np.erfinv((1 - cube) * da + cube * db)
-        return self.mean + np.sqrt(2/beta) * sigma * ret
+        return self.power_gaussian.quantile(cube, beta)
 
-    def prior_quantile(self, cube):
+    def prior(self, cube):
         """Calculate the prior quantile function."""
-        beta = self.beta_min + (self.beta_max - self.beta_min) * cube[-1]
+        beta = self.power_gaussian.beta(cube[-1], self.beta_min,
+                                        self.beta_max)
         theta = self.power_gaussian_quantile(cube=cube[:self.nDims], beta=beta)
         return np.concatenate([theta, [beta]])
 
+    prior_quantile = prior
 
-def _erf_term(d, b, g):
-    @lru_cache(maxsize=256)
-    def helper(t_delta, t_beta, t_sigma):
-        hd, hg = np.array(t_delta), np.array(t_sigma)
-        return np.erf(hd * np.sqrt(t_beta/2) / hg)
-
-    return helper(tuple(d), b, tuple(g))
+    def batch(self, cubes):
+        """Prior quantile of an (N, nDims + 1) array of hypercube points."""
+        beta = self.power_gaussian.beta(cubes[:, -1], self.beta_min,
+                                        self.beta_max)
+        theta = self.power_gaussian_quantile(cube=cubes[:, :self.nDims],
+                                             beta=beta)
+        return np.column_stack([theta, beta])
 
 
 def power_posterior_proposal(bounds: np.ndarray,
@@ -129,6 +157,7 @@ def power_posterior_proposal(bounds: np.ndarray,
                              loglike: callable = None,
                              logzero: np.float64 = -1e30):
     """Produce the power posterior proposal."""
-    prior = PowerPosteriorPrior(mean, covmat, logzero, nDims, bounds=bounds)
+    prior = PowerPosteriorPrior(mean, covmat, logzero=logzero, nDims=nDims,
+                                bounds=bounds)
 
     return Proposal(prior, loglike, nDims=len(mean)+1)
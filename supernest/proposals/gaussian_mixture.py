@@ -0,0 +1,193 @@
+r"""A proposal made of a weighted mixture of correlated Gaussians.
+
+A multimodal or curved posterior is poorly matched by one Gaussian,
+and superimposing one `gaussian_proposal` per mode costs an extra
+hypercube dimension per component. Here a single extra coordinate
+picks the component, and the correction is the log-density of the
+whole mixture, so the evidence is unchanged whichever component a
+point came from.
+"""
+import numpy as np
+import supernest.utils as utils
+from supernest import kernels
+from supernest.proposals.types import (Prior, Proposal, Correction,
+                                       CorrectedLikelihood,
+                                       as_likelihood_batch)
+from supernest.proposals.factorisation import GaussianFactorisation
+
+sp = utils.lazy_import('scipy.special')
+
+
+class GaussianMixturePrior(Prior):
+    """Quantile of a mixture of correlated multivariate normals.
+
+    The first nDims coordinates of the hypercube are mapped through
+    the quantile of the component picked by the last coordinate. The
+    index of the component is returned as the last parameter.
+    """
+
+    def __init__(self, weights, factorisations, logzero=-1e30):
+        """Create."""
+        self.weights = weights
+        self.factorisations = factorisations
+        self.logzero = logzero
+        self._edges = np.cumsum(weights)[:-1]
+        self.density = MixtureLogDensity(weights, factorisations)
+
+    def choose(self, u):
+        """Index of the component picked by the coordinate `u`."""
+        return np.searchsorted(self._edges, u, side='right')
+
+    def prior(self, cube: np.ndarray):
+        """Prior quantile implementation."""
+        index = int(self.choose(cube[-1]))
+        f = self.factorisations[index]
+        theta = kernels.backend.gaussian_quantile(cube[:-1], f.mean,
+                                                  f.cholesky)
+        theta = utils.guard_against_inf_nan(cube[:-1], theta, self.logzero,
+                                            1e30)
+        return np.concatenate([theta, [index]])
+
+    def batch(self, cubes: np.ndarray):
+        """Prior quantile of an (N, nDims + 1) array of hypercube points."""
+        indices = self.choose(cubes[:, -1])
+        ret = np.empty(cubes.shape)
+        ret[:, -1] = indices
+        for index in np.unique(indices):
+            rows = np.flatnonzero(indices == index)
+            f = self.factorisations[index]
+            ret[rows, :-1] = kernels.backend.gaussian_quantile(
+                cubes[rows, :-1], f.mean, f.cholesky)
+        utils.guard_against_inf_nan(cubes[:, :-1], ret[:, :-1], self.logzero,
+                                    1e30)
+        return ret
+
+    def log_pdf(self, theta: np.ndarray):
+        """Log-density of the mixture at the physical parameters of
+        `theta`, or of each row of an array, i.e. ignoring the last
+        parameter, which is the component index."""
+        return self.density(theta[..., :-1])
+
+    def __repr__(self):
+        """Representation."""
+        return f"""Gaussian mixture
+----------------
+weights:
+========
+{self.weights}
+
+means:
+======
+{np.array([f.mean for f in self.factorisations])}"""
+
+
+class MixtureLogDensity:
+    """Log-density of a mixture of normals, evaluated by log-sum-exp."""
+
+    def __init__(self, weights, factorisations):
+        """Create."""
+        self.log_weights = np.log(weights)
+        self.factorisations = factorisations
+
+    def __call__(self, theta):
+        """Log-density at one point, or at each row of an array."""
+        terms = [kernels.backend.gaussian_log_pdf(theta, f.mean, f.cholesky,
+                                                  f.log_norm)
+                 for f in self.factorisations]
+        return sp.logsumexp(np.array(terms).T + self.log_weights, axis=-1)
+
+
+class PhysicalLikelihood:
+    """Likelihood of the physical parameters, i.e. of all parameters
+    but the last, which is the component index."""
+
+    def __init__(self, likelihood):
+        """Create."""
+        self.likelihood = likelihood
+
+    def __call__(self, theta):
+        """Call wrapped function."""
+        return self.likelihood(theta[:-1])
+
+    def batch(self, thetas):
+        """Call wrapped function on an (N, nDims + 1) array of points."""
+        return as_likelihood_batch(self.likelihood)(thetas[:, :-1])
+
+    def __repr__(self):
+        """Representation."""
+        return repr(self.likelihood)
+
+
+def gaussian_mixture_proposal(bounds: np.ndarray,
+                              weights: np.ndarray,
+                              means: np.ndarray,
+                              covs: np.ndarray,
+                              loglike: callable = None,
+                              logzero: np.float64 = -1e30):
+    r"""Produce a Gaussian mixture proposal.
+
+    Given a uniform prior defined by bounds, produces the corrected
+    loglikelihood and prior.
+
+    Parameters
+    ----------
+    bounds: array-like
+        A tuple-like or array-like that contains the (min, max) of the
+        original uniform prior.
+
+    weights: array-like
+        The K non-negative weights of the components. They are
+        normalised.
+
+    means: array-like
+        A (K, nDims) array of the means of the components.
+
+    covs: array-like
+        A (K, nDims, nDims) array of the covariances of the components,
+        or a single (nDims, nDims) covariance shared by all.
+
+    loglike: callable (optional)
+        The loglikelihood function of the original model to be corrected.
+
+    Returns
+    -------
+    proposal: Proposal (tuple(prior, loglike))
+
+    The prior takes nDims + 1 hypercube coordinates. The last one
+    picks the component, and the index of the component is returned
+    as the last parameter. The likelihood ignores that parameter, and
+    its correction is the log-density of the whole mixture, computed
+    by log-sum-exp, so that the proposal can be used on its own or
+    superimposed with others of nDims + 1 parameters.
+
+    Each covariance is factorised once, here. Both the prior and the
+    likelihood have a `batch` method.
+    """
+    means = np.atleast_2d(np.asarray(means, dtype=np.float64))
+    K, D = means.shape
+    covs = np.asarray(covs, dtype=np.float64)
+    if covs.ndim == 2:
+        covs = np.broadcast_to(covs, (K, D, D))
+    weights = np.asarray(weights, dtype=np.float64)
+    if len(weights) != K or len(covs) != K:
+        raise ValueError('Mixture weights, means and covariances are of '
+                         f'incompatible lengths: len(weights)={len(weights)}'
+                         f', len(means)={K}, len(covs)={len(covs)}')
+    if np.any(weights < 0) or not weights.sum() > 0:
+        raise ValueError(f'Mixture weights must be non-negative, '
+                         f'and not all zero: weights={weights}')
+    weights = weights / weights.sum()
+    for mean, covmat in zip(means, covs):
+        _, a, b = utils.process_stdev(covmat, mean, bounds)
+    log_box = np.log(b - a).sum() if utils.eitheriter(
+        (a, b)) else D * np.log(b - a)
+    log_box = -log_box
+    factorisations = [GaussianFactorisation(mean, covmat)
+                      for mean, covmat in zip(means, covs)]
+    prior = GaussianMixturePrior(weights, factorisations, logzero)
+    correction = Correction(log_box, prior.log_pdf)
+    return Proposal(prior,
+                    correction if loglike is None
+                    else CorrectedLikelihood(PhysicalLikelihood(loglike),
+                                             correction),
+                    nDims=D + 1)
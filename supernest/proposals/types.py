@@ -6,55 +6,218 @@ are the prior and the likelihood.
 """
 import typing
 import numpy as np
-import scipy.special as sp
 import supernest.utils as utils
 import warnings
+from supernest import instrument
+
+
+def as_batch(func):
+    r"""Return a callable that evaluates `func` on an (N, D) array.
+
+    If `func` provides its own vectorised `batch` method, that is
+    used. Otherwise `func` is applied row by row, so that any plain
+    quantile can take part in batched evaluation.
+    """
+    batch = getattr(func, 'batch', None)
+    if batch is not None:
+        return batch
+
+    def row_by_row(arr):
+        return np.array([func(row) for row in arr])
+
+    return row_by_row
+
+
+def as_likelihood_batch(func):
+    r"""Return a callable that evaluates `func` on an (N, D) array.
+
+    The callable returns a tuple of the (N,) array of log-likelihoods
+    and the (N, nDerived) array of derived parameters. As with
+    `as_batch`, a `batch` method of `func` is preferred, and
+    otherwise `func` is called row by row.
+    """
+    batch = getattr(func, 'batch', None)
+    if batch is not None:
+        return batch
+
+    def row_by_row(arr):
+        return _stack_likelihoods([func(row) for row in arr])
+
+    return row_by_row
+
+
+def _stack_likelihoods(results):
+    logl = np.array([r[0] for r in results], dtype=np.float64)
+    if not results:
+        return logl, np.empty((0, 0))
+    phi = np.array([r[1] for r in results], dtype=np.float64)
+    return logl, phi.reshape(len(results), -1)
 
 
 class Prior:
     """Class wrapping prior quantile."""
 
-    def __init__(self, prior_callable):
+    def __init__(self, prior_callable, batch_callable=None):
         """Create."""
         self.prior = prior_callable
-
-    def __call__(self, cube):
-        """Call wrapped prior quantile."""
-        return self.prior(cube)
+        self._batch = batch_callable
+
+    def __call__(self, cube, out=None):
+        """Call wrapped prior quantile.
+
+        If an `out` array is given, it is passed on to the wrapped
+        callable, which must then accept it as its second argument, and
+        write the parameters into it.
+        """
+        if instrument.enabled:
+            return instrument.timed(instrument.label('Prior', self.prior),
+                                    self.prior, cube,
+                                    *(() if out is None else (out,)))
+        if out is None:
+            return self.prior(cube)
+        return self.prior(cube, out)
+
+    def batch(self, cubes, out=None):
+        """Call wrapped prior quantile on an (N, nDims) array of points.
+
+        An (N, ...) `out` array is passed on to the batch callable, as
+        for a single point. Without a batch callable, the rows are
+        written into `out` one by one.
+        """
+        if instrument.enabled:
+            return instrument.timed(
+                instrument.label('Prior.batch', self.prior),
+                self._evaluate_batch, cubes, out)
+        return self._evaluate_batch(cubes, out)
+
+    def _evaluate_batch(self, cubes, out=None):
+        if self._batch is not None:
+            if out is None:
+                return self._batch(cubes)
+            return self._batch(cubes, out)
+        if out is None:
+            return np.array([self.prior(c) for c in cubes])
+        for i, c in enumerate(cubes):
+            out[i] = self.prior(c)
+        return out
 
 
 class Likelihood:
     """Class for representing likelihood."""
 
-    def __init__(self, log_like_callable):
+    def __init__(self, log_like_callable, batch_callable=None):
         """Create."""
         self.loglikelihood = log_like_callable
+        self._batch = batch_callable
 
     def __call__(self, theta):
         """Call wrapped function."""
+        if instrument.enabled:
+            return instrument.timed(
+                instrument.label('Likelihood', self.loglikelihood),
+                self.loglikelihood, theta)
         return self.loglikelihood(theta)
 
+    def batch(self, thetas):
+        """Call wrapped function on an (N, nDims) array of points.
+
+        Returns the (N,) array of log-likelihoods and the (N,
+        nDerived) array of derived parameters.
+        """
+        if instrument.enabled:
+            return instrument.timed(
+                instrument.label('Likelihood.batch', self.loglikelihood),
+                self._evaluate_batch, thetas)
+        return self._evaluate_batch(thetas)
+
+    def _evaluate_batch(self, thetas):
+        if self._batch is not None:
+            return self._batch(thetas)
+        return _stack_likelihoods([self.loglikelihood(t) for t in thetas])
+
     def __repr__(self):
         """Representation."""
         return f"Likelihood wrapping {repr(self.loglikelihood)}"
 
 
+class Correction(Likelihood):
+    """The correction of a proposal: the log-density of the uniform
+    prior, `log_box`, less that of the proposal, `log_pdf`.
+
+    A class, rather than a closure, so that proposals can be pickled,
+    e.g. to be sent to a process pool. `log_pdf` is usually a method
+    of the proposal's prior, so the two share their state, and pickle
+    it once.
+    """
+
+    def __init__(self, log_box, log_pdf):
+        """Create."""
+        self.log_box = log_box
+        self.log_pdf = log_pdf
+
+    def loglikelihood(self, theta):
+        """Correction at one point, with no derived parameters."""
+        return (self.log_box - self.log_pdf(theta)), []
+
+    def _evaluate_batch(self, thetas):
+        return (self.log_box - self.log_pdf(thetas)), \
+            np.empty((len(thetas), 0))
+
+    def __repr__(self):
+        """Representation."""
+        return f"Correction by {self.log_pdf!r}"
+
+
 class CorrectedLikelihood:
-    """Class representing a likelihood with a correction."""
+    """Class representing a likelihood with a correction.
+
+    The original log-likelihood is evaluated first, and the
+    correction, itself a `Likelihood`, is added on top. The derived
+    parameters are those of the original.
+    """
 
-    def __init__(self, original, corrected):
+    def __init__(self, original, correction):
         """Create."""
         self.original = original
-        self.corrected = corrected
+        self.correction = correction
 
     def __call__(self, theta):
         """Call."""
-        return self.corrected(theta)
+        if instrument.enabled:
+            return instrument.timed(
+                instrument.label('CorrectedLikelihood', self.original),
+                self._timed_call, theta)
+        ll, phi = self.original(theta)
+        corr, _ = self.correction(theta)
+        return ll + corr, phi
+
+    def batch(self, thetas):
+        """Call on an (N, nDims) array of points."""
+        if instrument.enabled:
+            return instrument.timed(
+                instrument.label('CorrectedLikelihood.batch', self.original),
+                self._timed_batch, thetas)
+        ll, phi = as_likelihood_batch(self.original)(thetas)
+        corr, _ = as_likelihood_batch(self.correction)(thetas)
+        return ll + corr, phi
+
+    def _timed_call(self, theta):
+        ll, phi = instrument.timed(instrument.label('original', self.original),
+                                   self.original, theta, user=True)
+        corr, _ = self.correction(theta)
+        return ll + corr, phi
+
+    def _timed_batch(self, thetas):
+        ll, phi = instrument.timed(
+            instrument.label('original.batch', self.original),
+            as_likelihood_batch(self.original), thetas, user=True)
+        corr, _ = as_likelihood_batch(self.correction)(thetas)
+        return ll + corr, phi
 
     def __repr__(self):
         """Represent."""
         return f"""Likelihood wrapping
-    {self.corrected}
+    {self.correction}
 which is based on
     {self.original}"""
 
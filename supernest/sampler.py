@@ -0,0 +1,387 @@
+r"""A small, self-contained nested sampler.
+
+This is not meant to compete with PolyChord, MultiNest, dynesty or
+UltraNest. It exists so that the speed-ups of supernest's proposals
+can be measured, and tested, on any machine with NumPy and nothing
+else: no compiled sampler, no MPI.
+
+The constrained prior is sampled by rejection from the bounding
+ellipsoid of the live points in the unit hypercube, enlarged by a
+constant factor (Mukherjee, Parkinson & Liddle 2006), for as long as
+that is cheaper than slice sampling, and by slice sampling, as in
+PolyChord, from then on. The hypercube of a superposition is the
+reason: the choice parameters and the hash of `superimpose` scatter
+the constrained prior of each component across it, and the component
+of a poor proposal may keep its likelihood rising towards the edges of
+the hypercube, neither of which a single ellipsoid can follow. New
+points are drawn, transformed by the prior and evaluated by the
+likelihood in batches, so a prior or likelihood with a `batch` method
+(e.g. those produced by `superimpose` and `gaussian_proposal`) is
+called once per batch rather than once per point.
+
+Points of equal log-likelihood, e.g. on a plateau, are ordered by
+random labels drawn with the points, so that the contour still
+shrinks by one point per death and a flat likelihood terminates.
+
+Compare proposals by their number of dead points, or by their
+likelihood calls with the same `method`: rejection is far cheaper per
+point than slice sampling when it works, so 'auto' may use either.
+Use a real sampler for production runs.
+"""
+import typing
+
+import numpy as np
+from scipy.special import logsumexp
+
+from supernest.proposals.types import as_batch, as_likelihood_batch
+
+METHODS = ('auto', 'ellipsoid', 'slice')
+# The likelihood calls per slice step, roughly. 'auto' gives up
+# rejection sampling once it costs more than the slice steps would.
+SLICE_COST = 6
+
+
+class NestedSamplingResult(typing.NamedTuple):
+    r"""The result of `nested_sample`.
+
+    The summary statistics are named as in PolyChord's output object.
+    The dead points, followed by the final live points, are kept in
+    order of increasing log-likelihood.
+    """
+
+    logZ: float
+    logZerr: float
+    nlike: int
+    ndead: int
+    nlive: int
+    samples: np.ndarray
+    derived: np.ndarray
+    logL: np.ndarray
+    logL_birth: np.ndarray
+    logw: np.ndarray
+
+    @property
+    def weights(self):
+        """Posterior weights of the samples, normalised to unit sum."""
+        return np.exp(self.logw - self.logZ)
+
+    def nested_samples(self, columns=None):
+        """The samples as an `anesthetic.NestedSamples` object."""
+        from anesthetic import NestedSamples
+        return NestedSamples(data=self.samples, columns=columns,
+                             logL=self.logL, logL_birth=self.logL_birth)
+
+
+def nested_sample(prior, likelihood, nDims, nlive=500, nbatch=None,
+                  precision_criterion=1e-3, enlargement=1.2,
+                  max_ndead=None, seed=None, dumper=None, max_draws=10**6,
+                  method='auto', repeats=None):
+    r"""Run nested sampling with batched ellipsoidal rejection or slice
+    sampling.
+
+    Parameters
+    ----------
+    prior: callable
+        Prior quantile, mapping the unit hypercube to the parameters.
+        If it has a `batch` method, that is used.
+
+    likelihood: callable
+        Returns `(logL, derived)`. If it has a `batch` method, that is
+        used.
+
+    nDims: int
+        Dimensionality of the hypercube.
+
+    nlive: int
+        Number of live points.
+
+    nbatch: int, optional
+        Number of points replaced per iteration. Defaults to nlive/10.
+        Larger batches mean fewer, larger calls to the prior and
+        likelihood.
+
+    precision_criterion: float
+        Stop when the evidence in the live points is less than this
+        fraction of the accumulated evidence.
+
+    enlargement: float
+        Factor by which the radius of the bounding ellipsoid is
+        enlarged.
+
+    max_ndead: int, optional
+        Stop after this many dead points regardless.
+
+    seed: int or np.random.Generator, optional
+
+    max_draws: int, optional
+        Give up if this many draws find no replacements for a batch of
+        dead points.
+
+    method: str
+        How the constrained prior is sampled: 'ellipsoid', by
+        rejection from the bounding ellipsoid, 'slice', by slice
+        sampling, or 'auto', by rejection until that costs more than
+        `SLICE_COST` draws per slice step, and by slice sampling from
+        then on.
+
+    repeats: int, optional
+        Number of slice steps per new point. Defaults to 2 nDims.
+
+    dumper: callable, optional
+        Called after every `nlive` dead points, with the same arguments
+        as PolyChord's dumper: `dumper(live, dead, logweights, logZ,
+        logZerr)`. The rows of `live` and `dead` are the parameters,
+        the derived parameters, the birth and the death contours, and
+        `logweights` are the log posterior weights of the dead points,
+        unnormalised.
+
+    Returns
+    -------
+    result: NestedSamplingResult
+
+    Raises
+    ------
+    RuntimeError
+        If `max_draws` is exhausted, e.g. because the likelihood is
+        NaN, or because, with `method='ellipsoid'`, the bounding
+        ellipsoid has all but missed the constrained prior.
+    """
+    if method not in METHODS:
+        raise ValueError(f'Unknown method: {method}. Expected one of '
+                         f'{METHODS}.')
+    rng = np.random.default_rng(seed)
+    prior, likelihood = as_batch(prior), as_likelihood_batch(likelihood)
+    repeats = 2 * nDims if repeats is None else repeats
+    nbatch = max(1, nlive // 10) if nbatch is None else nbatch
+    if not 0 < nbatch < nlive:
+        raise ValueError(f'Need 0 < nbatch < nlive, got nbatch={nbatch} '
+                         f'and nlive={nlive}.')
+
+    cubes = rng.uniform(size=(nlive, nDims))
+    thetas = prior(cubes)
+    logl, phi = likelihood(thetas)
+    label = rng.uniform(size=nlive)
+    birth = np.full(nlive, -np.inf)
+    nlike = nlive
+
+    dead = {'samples': [], 'derived': [], 'logL': [], 'logL_birth': [],
+            'logw': []}
+    # Expected log-shrinkage when the live set drops from n to n - 1.
+    shrink = -1 / (nlive - np.arange(nbatch))
+    log_volumes = np.cumsum(shrink)
+    logX, logZ, ndead = 0.0, -np.inf, 0
+    next_dump = nlive
+    while True:
+        worst = np.lexsort((label, logl))[:nbatch]
+        logX_dead = logX + np.concatenate([[0], log_volumes[:-1]])
+        logw = logl[worst] + logX_dead + np.log(-np.expm1(shrink))
+        for key, value in [('samples', thetas), ('derived', phi),
+                           ('logL', logl), ('logL_birth', birth)]:
+            dead[key].append(value[worst])
+        dead['logw'].append(logw)
+        logZ = np.logaddexp(logZ, logsumexp(logw))
+        logX += log_volumes[-1]
+        ndead += nbatch
+
+        logl_star, label_star = logl[worst[-1]], label[worst[-1]]
+        keep = np.ones(nlive, dtype=bool)
+        keep[worst] = False
+        live = [array[keep] for array in (cubes, thetas, logl, phi, label)]
+        new, used = None, 0
+        if method != 'slice':
+            budget = max_draws if method == 'ellipsoid' \
+                else min(max_draws, nbatch * repeats * SLICE_COST)
+            new, used = _rejection(live[0], nbatch, logl_star, label_star,
+                                   prior, likelihood, enlargement, rng,
+                                   budget)
+        if new is None or len(new[0]) < nbatch:
+            if method == 'ellipsoid':
+                raise _no_replacement(logl_star, max_draws, method)
+            # Rejection now costs more than slice sampling, and only
+            # gets worse as the contour shrinks.
+            method = 'slice'
+            more, used_slice = _slice(
+                live, nbatch - (0 if new is None else len(new[0])),
+                logl_star, label_star, prior, likelihood, rng, repeats,
+                max_draws)
+            new = more if new is None else [
+                np.concatenate(pair) for pair in zip(new, more)]
+            used += used_slice
+        nlike += used
+        for array, value in [(cubes, new[0]), (thetas, new[1]),
+                             (logl, new[2]), (phi, new[3]),
+                             (label, new[4])]:
+            array[worst] = value
+        birth[worst] = logl_star
+
+        if dumper is not None and ndead >= next_dump:
+            next_dump += nlive
+            _dump(dumper, np.column_stack([thetas, phi, birth, logl]), dead,
+                  logZ, nlive)
+        logZ_live = logsumexp(logl) + logX - np.log(nlive)
+        if logZ_live < logZ + np.log(precision_criterion):
+            break
+        if max_ndead is not None and ndead >= max_ndead:
+            break
+
+    order = np.lexsort((label, logl))
+    for key, value in [('samples', thetas), ('derived', phi),
+                       ('logL', logl), ('logL_birth', birth)]:
+        dead[key].append(value[order])
+    dead['logw'].append(logl[order] + logX - np.log(nlive))
+    dead = {key: np.concatenate(value) for key, value in dead.items()}
+
+    logZ = logsumexp(dead['logw'])
+    return NestedSamplingResult(
+        logZ=logZ, logZerr=_logZerr(dead['logw'], dead['logL'], logZ, nlive),
+        nlike=nlike, ndead=ndead, nlive=nlive, **dead)
+
+
+def _logZerr(logw, logL, logZ, nlive):
+    """Skilling's error estimate, sqrt(H / nlive)."""
+    p = np.exp(logw - logZ)
+    finite = p > 0
+    H = np.sum(p[finite] * (logL[finite] - logZ))
+    return np.sqrt(max(H, 0) / nlive)
+
+
+def _dump(dumper, live, dead, logZ, nlive):
+    """Call `dumper` as PolyChord would."""
+    logw, logL = np.concatenate(dead['logw']), np.concatenate(dead['logL'])
+    dead = np.column_stack([np.concatenate(dead['samples']),
+                            np.concatenate(dead['derived']),
+                            np.concatenate(dead['logL_birth']), logL])
+    dumper(live, dead, logw, logZ, _logZerr(logw, logL, logZ, nlive))
+
+
+def _bounding_ellipsoid(live_cubes, enlargement):
+    """The mean, Cholesky factor of the covariance, and enlarged
+    Mahalanobis radius of the live points."""
+    nDims = live_cubes.shape[1]
+    mean = live_cubes.mean(axis=0)
+    cov = np.atleast_2d(np.cov(live_cubes, rowvar=False))
+    cov += np.eye(nDims) * 1e-12
+    chol = np.linalg.cholesky(cov)
+    z = np.linalg.solve(chol, (live_cubes - mean).T)
+    return mean, chol, np.sqrt((z * z).sum(axis=0).max()) * enlargement
+
+
+def _no_replacement(logl_star, drawn, method):
+    hint = ', or does the bounding ellipsoid miss the constrained ' \
+        "prior? Try method='slice'." if method == 'ellipsoid' else '?'
+    return RuntimeError(
+        f'No replacement above the contour logL = {logl_star} in '
+        f'{drawn} draws. Is the likelihood NaN{hint}')
+
+
+def _rejection(live_cubes, count, logl_star, label_star, prior, likelihood,
+               enlargement, rng, max_draws):
+    """Draw up to `count` new points above the contour, i.e. with a
+    log-likelihood above `logl_star`, or equal to it and a label above
+    `label_star`, from the bounding ellipsoid. Fewer are returned if
+    `max_draws` draws do not find them all."""
+    nDims = live_cubes.shape[1]
+    mean, chol, radius = _bounding_ellipsoid(live_cubes, enlargement)
+
+    found, nfound, used, drawn, efficiency = [], 0, 0, 0, 1.0
+    while nfound < count and drawn < max_draws:
+        needed = count - nfound
+        ndraw = int(min(max(2 * needed / efficiency, needed), 100000,
+                        max_draws - drawn))
+        drawn += ndraw
+        direction = rng.normal(size=(ndraw, nDims))
+        direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+        r = radius * rng.uniform(size=(ndraw, 1)) ** (1 / nDims)
+        cubes = mean + (r * direction) @ chol.T
+        cubes = cubes[np.all((cubes > 0) & (cubes < 1), axis=1)]
+        if len(cubes) == 0:
+            continue
+        thetas = prior(cubes)
+        logl, phi = likelihood(thetas)
+        label = rng.uniform(size=len(cubes))
+        used += len(cubes)
+        accept = (logl > logl_star) | ((logl == logl_star)
+                                       & (label > label_star))
+        efficiency = max(accept.mean(), 1e-3)
+        found.append((cubes[accept], thetas[accept], logl[accept],
+                      phi[accept], label[accept]))
+        nfound += accept.sum()
+    if not found:
+        return None, used
+    return [np.concatenate([f[i] for f in found])[:count]
+            for i in range(5)], used
+
+
+def _slice(live, count, logl_star, label_star, prior, likelihood, rng,
+           repeats, max_draws):
+    """Draw `count` new points above the contour by slice sampling
+    (Neal 2003), as PolyChord does: each starts at a random live point
+    and takes `repeats` slice steps, along random directions in the
+    coordinates whitened by the covariance of the live points, with
+    unit initial width, stepping out and shrinking. The steps of the
+    `count` chains are evaluated together, in batches.
+
+    A label is carried along as another coordinate: it is held fixed
+    during each step, and redrawn from its constrained prior after it.
+    """
+    live_cubes = live[0]
+    nDims = live_cubes.shape[1]
+    _, chol, _ = _bounding_ellipsoid(live_cubes, 1)
+    start = rng.integers(len(live_cubes), size=count)
+    state = [np.array(array[start]) for array in live]
+    drawn = [0]
+
+    def above(x, label):
+        # The rows of x above the contour, and their evaluations.
+        inside = np.all((x > 0) & (x < 1), axis=1)
+        ok = np.zeros(len(x), dtype=bool)
+        thetas = logl = phi = None
+        if inside.any():
+            thetas = prior(x[inside])
+            logl, phi = likelihood(thetas)
+            drawn[0] += len(thetas)
+            ok[inside] = (logl > logl_star) | ((logl == logl_star)
+                                               & (label[inside] > label_star))
+        if drawn[0] > max_draws:
+            raise _no_replacement(logl_star, drawn[0], 'slice')
+        return ok, inside, thetas, logl, phi
+
+    for _ in range(repeats):
+        cubes, thetas, logl, phi, label = state
+        direction = rng.normal(size=(count, nDims))
+        direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+        direction = direction @ chol.T
+        lower = -rng.uniform(size=count)
+        # Both ends of every slice are stepped out together.
+        ends = np.concatenate([lower, lower + 1])
+        step = np.repeat([-1, 1], count)
+        chain = np.tile(np.arange(count), 2)
+        active = np.arange(2 * count)
+        while len(active):
+            rows = chain[active]
+            ok = above(cubes[rows] + ends[active, None] * direction[rows],
+                       label[rows])[0]
+            active = active[ok]
+            ends[active] += step[active]
+        lower, upper = ends[:count], ends[count:]
+        active = np.arange(count)
+        while len(active):
+            t = lower[active] + (upper[active] - lower[active]) \
+                * rng.uniform(size=len(active))
+            x = cubes[active] + t[:, None] * direction[active]
+            ok, inside, new_thetas, new_logl, new_phi = above(
+                x, label[active])
+            rows = active[ok]
+            if len(rows):
+                cubes[rows] = x[ok]
+                thetas[rows] = new_thetas[ok[inside]]
+                logl[rows] = new_logl[ok[inside]]
+                phi[rows] = new_phi[ok[inside]]
+            shrink = active[~ok]
+            t = t[~ok]
+            lower[shrink] = np.where(t < 0, t, lower[shrink])
+            upper[shrink] = np.where(t < 0, upper[shrink], t)
+            active = shrink
+        label[:] = np.where(logl > logl_star, rng.uniform(size=count),
+                            rng.uniform(label_star, 1, size=count))
+    return state, drawn[0]
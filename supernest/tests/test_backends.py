@@ -0,0 +1,166 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+from supernest.framework import Settings
+from supernest.framework.backends import (DynestyBackend, ReferenceBackend,
+                                          SamplerOutput, get_backend,
+                                          merge_runs, spawn_seeds)
+from supernest.framework.gaussian_models import BoxUniformPrior
+from supernest.framework.mixtures import StochasticMixtureModel
+from supernest.framework.offset_model import OffsetModel
+
+
+class TestBackends(unittest.TestCase):
+    def setUp(self):
+        bounds = (-6, 6)
+        mu = np.array([0.5, -0.5])
+        cov = np.array([[1, 0.3], [0.3, 0.5]])
+        box = BoxUniformPrior(bounds, mu, cov)
+        # The Gaussians are normalised, and well inside the box.
+        self.logZ = -2 * np.log(12)
+        self.models = {
+            'box': box,
+            'mixture': StochasticMixtureModel(
+                [box, BoxUniformPrior(bounds, -mu, cov / 2)]),
+            'offset': OffsetModel(BoxUniformPrior(bounds, mu, cov),
+                                  np.array([1, -1])),
+        }
+
+    def assertEvidence(self, backend, **kwargs):
+        for name, model in self.models.items():
+            with self.subTest(model=name):
+                output, samples = model.nested_sample(backend, **kwargs)
+                self.assertLess(abs(output.logZ - self.logZ),
+                                3 * output.logZerr)
+                self.assertGreater(output.nlike, output.ndead)
+                self.assertIsNotNone(samples)
+
+    def test_reference(self):
+        self.assertEvidence('reference', live_points=200, seed=1)
+
+    @unittest.skipUnless(importlib.util.find_spec('dynesty'),
+                         'dynesty is not installed')
+    def test_dynesty(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                self.assertEvidence(DynestyBackend(), live_points=200,
+                                    resume=False, seed=1)
+            finally:
+                os.chdir(cwd)
+
+    def test_models_do_not_need_polychord(self):
+        if importlib.util.find_spec('pypolychord') is None:
+            self.assertNotIn('pypolychord', sys.modules)
+        model = self.models['offset']
+        self.assertIsInstance(model.settings, Settings)
+        settings = model.setup_settings(file_root='run', live_points=10,
+                                        seed=3)
+        self.assertEqual((settings.file_root, settings.nlive, settings.seed),
+                         ('run', 10, 3))
+        self.assertEqual(model.settings.file_root, 'OffsetModel')
+        self.assertIsInstance(get_backend('reference'), ReferenceBackend)
+        self.assertRaises(ValueError, get_backend, 'multinest')
+
+    @unittest.skipUnless(importlib.util.find_spec('pypolychord'),
+                         'PolyChord is not installed')
+    def test_polychord_settings(self):
+        settings = self.models['box'].setup_settings(live_points=10, seed=3)
+        settings.precision_criterion = 0.01
+        polychord = settings.to_polychord()
+        self.assertEqual((polychord.nDims, polychord.nlive, polychord.seed,
+                          polychord.precision_criterion), (2, 10, 3, 0.01))
+
+
+class RecordingBackend(ReferenceBackend):
+    """The reference backend, noting the settings of each run."""
+
+    def __init__(self, **run_kwargs):
+        super().__init__(**run_kwargs)
+        self.calls = []
+
+    def run(self, model, **kwargs):
+        self.calls.append(kwargs)
+        return super().run(model, **kwargs)
+
+
+class TestEnsembles(unittest.TestCase):
+    def setUp(self):
+        self.model = BoxUniformPrior((-6, 6), np.array([0.5, -0.5]),
+                                     np.array([[1, 0.3], [0.3, 0.5]]))
+
+    def test_runs_are_distinct(self):
+        backend = RecordingBackend()
+        output, samples = self.model.nested_sample_many(
+            3, backend, processes=1, seed=3, file_root='ens', live_points=50)
+        self.assertEqual([call['file_root'] for call in backend.calls],
+                         ['ens_0', 'ens_1', 'ens_2'])
+        seeds = [call['seed'] for call in backend.calls]
+        self.assertEqual(seeds, spawn_seeds(3, 3))
+        self.assertEqual(len(set(seeds)), 3)
+        self.assertEqual(spawn_seeds(3, 5)[:3], seeds)
+        self.assertEqual({call['live_points'] for call in backend.calls},
+                         {50})
+        self.assertEqual(len(output.raw), 3)
+        self.assertEqual(len({run.logZ for run, _ in output.raw}), 3)
+        self.assertEqual(output.nlive, 150)
+        self.assertEqual(output.ndead, sum(run.ndead for run, _ in
+                                           output.raw))
+        self.assertEqual(len(samples),
+                         sum(len(run) for _, run in output.raw))
+        self.assertLess(abs(output.logZ + 2 * np.log(12)),
+                        3 * output.logZerr)
+
+    def test_fixed_seed_is_reproducible(self):
+        first, _ = self.model.nested_sample_many(2, 'reference', processes=1,
+                                                 seed=4, live_points=50)
+        again, _ = self.model.nested_sample_many(2, 'reference', processes=1,
+                                                 seed=4, live_points=50)
+        pooled, _ = self.model.nested_sample_many(2, 'reference',
+                                                  processes=2, seed=4,
+                                                  live_points=50)
+        other, _ = self.model.nested_sample_many(2, 'reference', processes=1,
+                                                 seed=5, live_points=50)
+        self.assertEqual(first[:5], again[:5])
+        self.assertEqual(first[:5], pooled[:5])
+        self.assertNotEqual(first.logZ, other.logZ)
+
+    @staticmethod
+    def outputs(logZ, logZerr):
+        return [(SamplerOutput(logZ=z, logZerr=e, nlike=100 * (i + 1),
+                               ndead=10 * (i + 1), nlive=5), None)
+                for i, (z, e) in enumerate(zip(logZ, logZerr))]
+
+    def test_merge_runs_weights_by_inverse_variance(self):
+        results = self.outputs([-1.0, -2.0, -4.0], [0.1, 0.2, 0.4])
+        output, samples = merge_runs(results)
+        weights = np.array([100, 25, 6.25])
+        self.assertAlmostEqual(output.logZ,
+                               weights @ [-1, -2, -4] / weights.sum())
+        self.assertAlmostEqual(output.logZerr, weights.sum() ** -0.5)
+        self.assertEqual(output[2:5], (600, 60, 15))
+        self.assertEqual(output.raw, results)
+        self.assertIsNone(samples)
+
+    def test_merge_runs_without_errors(self):
+        # A run without an error estimate falls back to equal weights.
+        output, _ = merge_runs(self.outputs([-1.0, -2.0], [0.3, 0.0]))
+        self.assertAlmostEqual(output.logZ, -1.5)
+        self.assertAlmostEqual(output.logZerr, 0.3 / np.sqrt(2))
+        output, _ = merge_runs(self.outputs([-1.0, -3.0], [0.0, 0.0]))
+        self.assertEqual((output.logZ, output.logZerr), (-2.0, 0.0))
+
+    def test_merge_runs_without_samples(self):
+        run = self.model.nested_sample('reference', live_points=50, seed=2)
+        self.assertIsNotNone(run[1])
+        output, samples = merge_runs([run, (run[0], None)])
+        self.assertIsNone(samples)
+        self.assertEqual(output.nlive, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
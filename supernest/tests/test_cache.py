@@ -0,0 +1,173 @@
+import functools
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+import supernest as sn
+from supernest.cache import (CachedLikelihood, LikelihoodStore, cached,
+                             fingerprint, stored)
+from supernest.framework.cached_model import CachedModel
+from supernest.framework.gaussian_models import BoxUniformPrior
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+        def loglike(theta):
+            self.calls += 1
+            return -theta @ theta / 2, [theta.sum()]
+
+        self.loglike = loglike
+
+    def test_repeated_theta_hits(self):
+        like = CachedLikelihood(self.loglike)
+        theta = np.array([0.1, 0.2])
+        miss, hit = like(theta), like(theta.copy())
+        self.assertEqual(miss, hit)
+        for _, phi in (miss, hit):
+            self.assertIsInstance(phi, np.ndarray)
+            self.assertEqual(phi.dtype, np.float64)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(like.stats['hits'], 1)
+        self.assertEqual(like.stats['misses'], 1)
+        # The caller's copy is its own.
+        miss[1][0] = np.nan
+        self.assertEqual(like(theta), hit)
+
+    def test_lru_eviction(self):
+        like = CachedLikelihood(self.loglike, max_entries=2)
+        a, b, c = np.eye(3)
+        like(a), like(b), like(a), like(c)
+        self.assertEqual(like.stats['evictions'], 1)
+        like(a)
+        self.assertEqual(self.calls, 3)
+        like(b)
+        self.assertEqual(self.calls, 4)
+
+    def test_batch(self):
+        like = CachedLikelihood(self.loglike)
+        thetas = np.random.default_rng(0).normal(size=(10, 3))
+        like.batch(thetas[:5])
+        logl, phi = like.batch(thetas)
+        self.assertEqual(self.calls, 10)
+        self.assertEqual(like.stats['hits'], 5)
+        for theta, ll, ph in zip(thetas, logl, phi):
+            self.assertAlmostEqual(ll, self.loglike(theta)[0])
+            np.testing.assert_allclose(ph, self.loglike(theta)[1])
+
+    def test_cached_model_batches(self):
+        base = CountingModel((-6, 6), np.zeros(3), np.eye(3))
+        model = CachedModel(base)
+        thetas = np.random.default_rng(2).normal(size=(10, 3))
+        model.log_likelihood_batch(thetas[:5])
+        logl, phi = model.log_likelihood_batch(thetas)
+        self.assertEqual(base.rows, [5, 5])
+        self.assertEqual(base.calls, 0)
+        expected = base.log_likelihood_batch(thetas)
+        np.testing.assert_array_equal(logl, expected[0])
+        self.assertEqual(phi.shape, (10, 0))
+        self.assertEqual(model.cache.stats['hits'], 5)
+        self.assertEqual(model.log_likelihood(thetas[7])[0], logl[7])
+        self.assertEqual(base.calls, 0)
+        cubes = np.random.default_rng(3).uniform(size=(4, 3))
+        np.testing.assert_array_equal(model.prior_quantile_batch(cubes),
+                                      base.prior_quantile_batch(cubes))
+
+    def test_corrected_likelihood_caches_original(self):
+        proposal = sn.gaussian_proposal((-3, 3), np.zeros(2), np.eye(2),
+                                        self.loglike)
+        like = cached(proposal.likelihood)
+        theta = np.array([0.5, -0.5])
+        expected = proposal.likelihood(theta)
+        self.calls = 0
+        self.assertEqual(like(theta), expected)
+        self.assertEqual(like(theta), expected)
+        self.assertEqual(self.calls, 1)
+        self.assertIsInstance(like.original, CachedLikelihood)
+
+    def test_store_persists_across_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'evaluations.sqlite')
+            key = fingerprint(np.zeros(2), 'gaussian')
+            thetas = np.random.default_rng(1).normal(size=(6, 2))
+            first = stored(self.loglike, path, key)
+            expected = first.batch(thetas[:3])
+            self.assertEqual(self.calls, 3)
+
+            store = pickle.loads(pickle.dumps(LikelihoodStore(path)))
+            second = stored(self.loglike, store, key)
+            logl, phi = second.batch(thetas)
+            self.assertEqual(self.calls, 6)
+            np.testing.assert_array_equal(logl[:3], expected[0])
+            np.testing.assert_array_equal(phi[:3], expected[1])
+            self.assertEqual(second(thetas[4]), (logl[4], phi[4]))
+            self.assertEqual(second.stats, {'hits': 4, 'misses': 3})
+
+            other = stored(self.loglike, path, fingerprint(np.ones(2)))
+            other(thetas[0])
+            self.assertEqual(self.calls, 7)
+            self.assertEqual(len(LikelihoodStore(path)), 7)
+
+    def test_closures_are_not_fingerprinted_by_name(self):
+        def gaussian(mean):
+            def loglike(theta):
+                return -(theta - mean) @ (theta - mean) / 2, []
+            return loglike
+
+        first, second = gaussian(np.zeros(2)), gaussian(np.ones(2))
+        self.assertEqual(first.__qualname__, second.__qualname__)
+        for func in (first, lambda theta: (0.0, []), [first],
+                     sn.gaussian_proposal((-3, 3), np.zeros(2), np.eye(2),
+                                          first).likelihood):
+            with self.assertRaisesRegex(ValueError, 'explicit fingerprint'):
+                fingerprint(func)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'evaluations.sqlite')
+            with self.assertRaises(ValueError):
+                stored(first, path)
+            theta = np.array([0.5, 0.5])
+            stored(first, path, fingerprint('gaussian', np.zeros(2)))(theta)
+            like = stored(second, path, fingerprint('gaussian', np.ones(2)))
+            self.assertEqual(like(theta)[0], second(theta)[0])
+            self.assertEqual(like.stats, {'hits': 0, 'misses': 1})
+
+            # Functions, partials and bound methods are fingerprinted.
+            default = stored(_loglike, path)
+            logl, phi = default(theta)
+            self.assertIsInstance(phi, np.ndarray)
+            self.assertEqual(default(theta), (logl, phi))
+            self.assertNotEqual(
+                fingerprint(functools.partial(_shifted, shift=0)),
+                fingerprint(functools.partial(_shifted, shift=1)))
+            self.assertEqual(fingerprint(like), fingerprint(like))
+
+
+def _loglike(theta):
+    return -theta @ theta / 2, [theta.sum()]
+
+
+def _shifted(theta, shift):
+    return -(theta - shift) @ (theta - shift) / 2, []
+
+
+class CountingModel(BoxUniformPrior):
+    """Counts the calls of the likelihood, and the rows of the batches."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls, self.rows = 0, []
+
+    def log_likelihood(self, theta):
+        self.calls += 1
+        return super().log_likelihood(theta)
+
+    def log_likelihood_batch(self, thetas):
+        self.rows.append(len(thetas))
+        return super().log_likelihood_batch(thetas)
+
+
+if __name__ == '__main__':
+    unittest.main()
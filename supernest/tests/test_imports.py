@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+import supernest
+
+HEAVY = ['numba', 'anesthetic', 'pandas', 'matplotlib', 'pypolychord',
+         'scipy.special._ufuncs', 'scipy.linalg._flapack']
+
+OPTIONAL = ['pypolychord', 'anesthetic', 'scipy', 'numba']
+
+FRAMEWORK = ['polychord', 'backends', 'gaussian_models', 'mixtures',
+             'offset_model', 'cached_model', 'adaptive_model', 'sweep']
+
+# Makes every (sub)module of `blocked` fail to load, as if it weren't
+# installed, while still letting `find_spec` see it.
+BLOCKER = """
+import importlib.abc, importlib.machinery
+class Blocker(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    def find_spec(self, name, path=None, target=None):
+        if name.partition('.')[0] in blocked:
+            return importlib.machinery.ModuleSpec(name, self)
+    def create_module(self, spec):
+        return None
+    def exec_module(self, module):
+        raise ImportError(f'{module.__name__} is blocked')
+sys.meta_path.insert(0, Blocker())
+"""
+
+
+def loaded_after(statement, blocked=()):
+    """The heavy modules that are loaded after running `statement` in a
+    fresh interpreter, in which the packages `blocked` can't be
+    imported. Raises `CalledProcessError` if `statement` fails."""
+    code = (f'import sys, json\nblocked = {list(blocked)!r}\n{BLOCKER}\n'
+            f'{statement}\n'
+            f'print(json.dumps([m for m in {HEAVY + list(blocked)!r} '
+            'if m in sys.modules]))')
+    root = os.path.dirname(os.path.dirname(supernest.__file__))
+    output = subprocess.run([sys.executable, '-c', code], check=True,
+                            stdout=subprocess.PIPE, cwd=root).stdout
+    return json.loads(output.decode().splitlines()[-1])
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_import_supernest(self):
+        self.assertEqual(loaded_after('import supernest'), [])
+
+    def test_import_framework(self):
+        self.assertEqual(loaded_after('import supernest.framework'), [])
+
+    def test_import_framework_without_optional_dependencies(self):
+        for module in FRAMEWORK:
+            with self.subTest(module=module):
+                self.assertEqual(
+                    loaded_after(f'import supernest.framework.{module}',
+                                 blocked=OPTIONAL), [])
+
+    def test_loaded_on_first_use(self):
+        loaded = loaded_after(
+            'import numpy as np\n'
+            'import supernest as sn\n'
+            'from supernest import kernels\n'
+            'kernels.use("numpy")\n'
+            'sn.gaussian_proposal((-1, 1), np.zeros(2), np.eye(2)).prior(\n'
+            '    np.full(2, 0.5))')
+        self.assertIn('scipy.special._ufuncs', loaded)
+        self.assertNotIn('anesthetic', loaded)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import time
+import unittest
+import numpy as np
+import supernest as sn
+from supernest import instrument
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        def loglike(theta):
+            time.sleep(1e-3)
+            return -theta @ theta / 2, []
+
+        self.proposal = sn.gaussian_proposal((-5, 5), np.zeros(2), np.eye(2),
+                                             loglike)
+        self.theta = np.array([0.5, -0.5])
+        instrument.reset()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_disabled_records_nothing(self):
+        self.proposal.likelihood(self.theta)
+        self.proposal.prior(self.theta)
+        self.assertFalse(instrument.enabled)
+        self.assertEqual(instrument.stats(), {})
+
+    def test_counts_and_user_share(self):
+        with instrument.instrumented():
+            for _ in range(5):
+                expected = self.proposal.likelihood(self.theta)
+            self.proposal.likelihood.batch(np.tile(self.theta, (3, 1)))
+        self.assertFalse(instrument.enabled)
+        stats = instrument.stats()
+        self.assertEqual(stats['CorrectedLikelihood(TestInstrument.setUp.'
+                               '<locals>.loglike)'].count, 5)
+        self.assertEqual(stats['original(TestInstrument.setUp.'
+                               '<locals>.loglike)'].count, 5)
+        self.assertEqual(expected, self.proposal.likelihood(self.theta))
+
+        summary = instrument.summary()
+        self.assertGreater(summary['user'], 8e-3)
+        self.assertGreater(summary['user_fraction'], 0.5)
+        self.assertAlmostEqual(
+            summary['total'],
+            sum(s.total for s in stats.values()
+                if s.name.startswith('CorrectedLikelihood')))
+        for s in stats.values():
+            self.assertLessEqual(s.own, s.total)
+            self.assertLessEqual(s.percentile(50), s.percentile(99))
+        self.assertIn('[user]', instrument.report())
+
+    def test_nested_time_is_not_own_time(self):
+        outer = sn.superimpose([self.proposal, self.proposal], nDims=2)
+        with instrument.instrumented():
+            outer.likelihood(outer.prior(np.full(outer.nDims, 0.5)))
+        stats = instrument.stats()
+        dispatch = [s for name, s in stats.items()
+                    if name.startswith('Likelihood(Superimposed')][0]
+        self.assertEqual(dispatch.count, 1)
+        self.assertLess(dispatch.own, 1e-3)
+        self.assertGreater(dispatch.total, 1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import types
+import unittest
+from unittest import mock
+import numpy as np
+import scipy.special as sp
+from supernest import kernels, utils
+from supernest.kernels import numpy_backend
+
+
+@unittest.skipUnless('numba' in kernels.backends, 'Numba is not installed')
+class TestNumbaKernels(unittest.TestCase):
+    def setUp(self):
+        from supernest.kernels import numba_backend
+        self.numba = numba_backend
+        rng = np.random.default_rng(0)
+        self.nDims = 30
+        self.cubes = rng.uniform(size=(100, self.nDims))
+        self.thetas = rng.normal(size=(100, self.nDims))
+        self.mean = rng.normal(size=self.nDims)
+        factor = rng.normal(size=(self.nDims, self.nDims))
+        self.chol = np.linalg.cholesky(factor @ factor.T / self.nDims
+                                       + np.eye(self.nDims))
+        self.stdev = rng.uniform(0.5, 2, self.nDims)
+        self.a, self.b = -5, 5
+        self.beta = rng.uniform(1e-3, 1, 100)
+
+    def assertKernelsAgree(self, kernel, *args, first=None):
+        batch = getattr(self.numba, kernel)(first, *args)
+        np.testing.assert_allclose(
+            batch, getattr(numpy_backend, kernel)(first, *args),
+            rtol=1e-10, atol=1e-12)
+        np.testing.assert_allclose(
+            getattr(self.numba, kernel)(first[3], *args), batch[3],
+            rtol=1e-14)
+
+    def test_ndtri(self):
+        p = np.concatenate([np.logspace(-300, -1, 300),
+                            np.linspace(0.01, 0.99, 99),
+                            1 - np.logspace(-16, -1, 100)])
+        expected = sp.ndtri(p)
+        actual = np.array([self.numba.ndtri(x) for x in p])
+        np.testing.assert_allclose(actual, expected, rtol=1e-13)
+        self.assertEqual(self.numba.ndtri(0.0), -np.inf)
+        self.assertEqual(self.numba.ndtri(1.0), np.inf)
+        self.assertTrue(np.isnan(self.numba.ndtri(1.5)))
+
+    def test_gaussian(self):
+        self.assertKernelsAgree('gaussian_quantile', self.mean, self.chol,
+                                first=self.cubes)
+        self.assertKernelsAgree('gaussian_log_pdf', self.mean, self.chol,
+                                1.5, first=self.thetas)
+
+    def test_truncated_gaussian(self):
+        root = np.sqrt(1 / 2) / self.stdev
+        da = sp.erf((self.a - self.mean) * root)
+        db = sp.erf((self.b - self.mean) * root)
+        self.assertKernelsAgree('truncated_quantile', self.mean, self.stdev,
+                                da, db, first=self.cubes)
+        self.assertKernelsAgree('diagonal_log_pdf', self.mean,
+                                1 / self.stdev, 1.5, first=self.thetas)
+
+    def test_power_posterior(self):
+        for kernel, points in [('power_gaussian_quantile', self.cubes),
+                               ('power_gaussian_log_pdf', self.thetas)]:
+            np.testing.assert_allclose(
+                getattr(self.numba, kernel)(points, self.mean, self.stdev,
+                                            self.a, self.b, self.beta),
+                getattr(numpy_backend, kernel)(points, self.mean, self.stdev,
+                                               self.a, self.b, self.beta),
+                rtol=1e-10)
+            self.assertKernelsAgree(kernel, self.mean, self.stdev, self.a,
+                                    self.b, 0.25, first=points)
+
+    def test_use(self):
+        previous = kernels.backend
+        try:
+            self.assertIs(kernels.use('numpy'), numpy_backend)
+            self.assertIs(kernels.use('numba'), self.numba)
+        finally:
+            kernels.backend = previous
+        self.assertRaises(ValueError, kernels.use, 'fortran')
+
+    def test_tabulated(self):
+        tabulated = kernels.quantile_kernels('tabulated')
+        self.assertIs(kernels.quantile_kernels('exact'), kernels.backend)
+        self.assertRaises(ValueError, kernels.quantile_kernels, 'fast')
+        p = np.concatenate([np.logspace(-323, -1, 2000),
+                            np.random.default_rng(1).uniform(size=10000)])
+        p = np.concatenate([p, 1 - p])
+        actual = np.array([tabulated.ndtri(x) for x in p])
+        finite = np.isfinite(sp.ndtri(p))
+        np.testing.assert_allclose(actual[finite], sp.ndtri(p)[finite],
+                                   rtol=0, atol=tabulated.MAX_ERROR)
+        self.assertEqual(tabulated.ndtri(0.0), -np.inf)
+        self.assertTrue(np.isnan(tabulated.ndtri(-0.5)))
+
+        # SciPy < 1.9, which has no ndtri_exp, builds the same tables.
+        old_scipy = types.SimpleNamespace(ndtri=sp.ndtri,
+                                          log_ndtr=sp.log_ndtr)
+        with mock.patch.object(utils, 'sp', old_scipy):
+            np.testing.assert_allclose(tabulated._tail_table(),
+                                       tabulated._TAIL, rtol=1e-12,
+                                       atol=1e-12)
+
+        root = np.sqrt(1 / 2) / self.stdev
+        da = sp.erf((self.a - self.mean) * root)
+        db = sp.erf((self.b - self.mean) * root)
+        for kernel, args in [
+                ('gaussian_quantile', (self.mean, self.chol)),
+                ('truncated_quantile', (self.mean, self.stdev, da, db)),
+                ('power_gaussian_quantile', (self.mean, self.stdev, self.a,
+                                             self.b, self.beta))]:
+            np.testing.assert_allclose(
+                getattr(tabulated, kernel)(self.cubes, *args),
+                getattr(numpy_backend, kernel)(self.cubes, *args),
+                rtol=0, atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import numpy as np
+from numpy.linalg import inv, multi_dot, slogdet
+from supernest.framework.gaussian_models import BoxUniformPrior
+
+
+class TestGaussianModels(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(6)
+        self.mu = rng.normal(size=4)
+        factor = rng.normal(size=(4, 4))
+        self.cov = factor @ factor.T + 0.5 * np.eye(4)
+        self.model = BoxUniformPrior((-5, 5), self.mu, self.cov)
+        self.thetas = rng.uniform(-5, 5, size=(50, 4))
+
+    def dense_log_likelihood(self, theta):
+        # The formula that the factorisation replaced.
+        delta = theta - self.mu
+        return -slogdet(2 * np.pi * self.cov)[1] / 2 \
+            - multi_dot([delta, inv(self.cov), delta]) / 2
+
+    def test_log_likelihood_batch(self):
+        logl, phi = self.model.log_likelihood_batch(self.thetas)
+        self.assertEqual(logl.shape, (50,))
+        self.assertEqual(phi.shape, (50, 0))
+        for theta, ll in zip(self.thetas, logl):
+            self.assertAlmostEqual(ll, self.dense_log_likelihood(theta),
+                                   places=10)
+            single, derived = self.model.log_likelihood(theta)
+            self.assertAlmostEqual(ll, single, places=12)
+            self.assertEqual(len(derived), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import numpy as np
+from supernest.moments import (WeightedMoments, CholeskyMoments, cholupdate,
+                               shrink)
+
+
+class TestMoments(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.samples = 1e6 + rng.multivariate_normal(
+            [1, -2, 3], [[2, 0.5, 0], [0.5, 1, 0.3], [0, 0.3, 0.5]], size=1000)
+        self.weights = rng.exponential(size=1000)
+
+    def test_chunks_match_numpy(self):
+        moments = WeightedMoments()
+        for rows in np.array_split(np.arange(1000), [1, 10, 400, 401]):
+            moments.update(self.samples[rows], self.weights[rows])
+        self.assertEqual(moments.count, 1000)
+        np.testing.assert_allclose(
+            moments.mean, np.average(self.samples, axis=0, weights=self.weights))
+        np.testing.assert_allclose(
+            moments.covariance,
+            np.cov(self.samples.T, aweights=self.weights), rtol=1e-9)
+
+    def test_merge(self):
+        first = WeightedMoments().update(self.samples[:300], self.weights[:300])
+        second = WeightedMoments().update(self.samples[300:], self.weights[300:])
+        whole = WeightedMoments().update(self.samples, self.weights)
+        first.merge(second)
+        np.testing.assert_allclose(first.mean, whole.mean)
+        np.testing.assert_allclose(first.covariance, whole.covariance)
+        self.assertAlmostEqual(first.effective_samples, whole.effective_samples)
+
+    def test_log_weights_and_cholesky(self):
+        log_weights = np.log(self.weights) - 2000
+        moments = CholeskyMoments()
+        for rows in np.array_split(np.arange(1000), 9):
+            moments.update(self.samples[rows], log_weights=log_weights[rows])
+        expected = np.cov(self.samples.T, aweights=self.weights)
+        np.testing.assert_allclose(moments.covariance, expected, rtol=1e-9)
+        chol = moments.covariance_cholesky
+        np.testing.assert_allclose(chol, np.linalg.cholesky(expected),
+                                   rtol=1e-9)
+        self.assertGreater(moments.log_scale, -2000)
+
+    def test_cholupdate(self):
+        rng = np.random.default_rng(3)
+        a = rng.normal(size=(5, 5))
+        chol = np.linalg.cholesky(a @ a.T)
+        rows = rng.normal(size=(2, 5))
+        np.testing.assert_allclose(cholupdate(chol, rows),
+                                   np.linalg.cholesky(a @ a.T + rows.T @ rows))
+
+    def test_errors(self):
+        moments = WeightedMoments(3)
+        self.assertRaises(ValueError, moments.update, self.samples[:, :2])
+        self.assertRaises(ValueError, moments.update, self.samples,
+                          self.weights[:10])
+        self.assertRaises(ValueError, shrink, np.eye(2), 2)
+
+    def test_shrink(self):
+        covmat = np.array([[4, 1.99], [1.99, 1]])
+        shrunk = shrink(covmat, 0.5)
+        np.testing.assert_allclose(np.diag(shrunk), [4, 1])
+        self.assertAlmostEqual(shrunk[0, 1], 0.995)
+
+
+if __name__ == '__main__':
+    unittest.main()
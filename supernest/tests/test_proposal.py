@@ -1,4 +1,7 @@
+import pickle
 import unittest
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
 import supernest as sn
 import numpy as np
 import hypothesis
@@ -22,6 +25,260 @@ class TestProposal(unittest.TestCase):
         proposal = sn.gaussian_proposal(bounds, means, covs)
         self.assertEqual(len(proposal.prior(np.zeros(num))), num)
 
+    def test_correction_matches_dense_linear_algebra(self):
+        bounds = (-3, 3)
+        mean = np.array([0.1, -0.2, 0.3])
+        covmat = np.array([[2, 0.5, 0.1], [0.5, 1, 0.2], [0.1, 0.2, 0.5]])
+        proposal = sn.gaussian_proposal(bounds, mean, covmat)
+        thetas = np.random.default_rng(2).uniform(-3, 3, size=(20, 3))
+        delta = thetas - mean
+        expected = np.einsum('ij,jk,ik->i', delta, np.linalg.inv(covmat), delta) / 2
+        expected += np.linalg.slogdet(2 * np.pi * covmat)[1] / 2
+        expected -= 3 * np.log(6)
+        logl, _ = proposal.likelihood.batch(thetas)
+        np.testing.assert_allclose(logl, expected)
+        self.assertAlmostEqual(proposal.likelihood(thetas[0])[0], expected[0])
+
+    def test_tabulated_quantile(self):
+        mean = np.array([0.1, -0.2, 0.3])
+        covmat = np.array([[2, 0.5, 0.1], [0.5, 1, 0.2], [0.1, 0.2, 0.5]])
+        cubes = np.random.default_rng(8).uniform(size=(50, 3))
+        for make in [sn.gaussian_proposal, sn.truncated_gaussian_proposal]:
+            exact = make((-3, 3), mean, covmat)
+            tabulated = make((-3, 3), mean, covmat, quantile='tabulated')
+            np.testing.assert_allclose(tabulated.prior.batch(cubes),
+                                       exact.prior.batch(cubes), atol=1e-9)
+            np.testing.assert_allclose(tabulated.prior(cubes[0]),
+                                       exact.prior(cubes[0]), atol=1e-9)
+
+    def test_indefinite_covariance_is_regularised(self):
+        covmat = np.array([[1, 2], [2, 1]])
+        with self.assertWarnsRegex(UserWarning, 'not positive definite'):
+            factorisation = sn.proposals.GaussianFactorisation(np.zeros(2), covmat)
+        self.assertTrue(np.all(np.isfinite(factorisation.cholesky)))
+
+    def test_singular_covariance_is_regularised(self):
+        # Positive semi-definite, of rank 2.
+        u, v = np.array([1, 2, 3]), np.array([1, -1, 0.5])
+        covmat = np.outer(u, u) + np.outer(v, v)
+        with self.assertWarnsRegex(UserWarning, 'singular'):
+            proposal = sn.gaussian_proposal((-10, 10), np.zeros(3), covmat)
+        factorisation = proposal.prior.factorisation
+        regularised = factorisation.cholesky @ factorisation.cholesky.T
+        eigvals = np.linalg.eigvalsh(regularised)
+        self.assertGreaterEqual(eigvals[0] / eigvals[-1],
+                                0.99 * sn.proposals.factorisation.RCOND)
+
+        # On its support, the density is that of a proper Gaussian.
+        cubes = np.random.default_rng(8).uniform(size=(100, 3))
+        log_pdf = factorisation.log_pdf(proposal.prior.batch(cubes))
+        self.assertTrue(np.all(np.abs(log_pdf) < 20))
+
+        # Off it, the Mahalanobis distance is bounded by the floor.
+        thetas = np.random.default_rng(9).uniform(-10, 10, size=(100, 3))
+        log_pdf = factorisation.log_pdf(thetas)
+        bound = (thetas ** 2).sum(axis=1) / eigvals[0] / 2
+        self.assertTrue(np.all(np.isfinite(log_pdf)))
+        self.assertTrue(np.all(-log_pdf - factorisation.log_norm
+                               <= bound * (1 + 1e-6)))
+        self.assertTrue(np.all(np.abs(log_pdf) < 1e12))
+        corrections, _ = proposal.likelihood.batch(thetas)
+        np.testing.assert_allclose(corrections, -np.log(20) * 3 - log_pdf)
+
+        with self.assertWarns(UserWarning):
+            sharper = sn.proposals.GaussianFactorisation(np.zeros(3), covmat,
+                                                         rcond=1e-4)
+        self.assertLess(np.abs(sharper.log_pdf(thetas)).max(),
+                        np.abs(log_pdf).max())
+
+    def test_gaussian_mixture(self):
+        from scipy.stats import multivariate_normal
+        bounds = (-6, 6)
+        weights = np.array([1, 3])
+        means = np.array([[-2, 0], [2, 1]])
+        covs = np.array([[[1, 0.3], [0.3, 0.5]], [[0.5, 0], [0, 2]]])
+
+        def mixture(theta):
+            return np.log(sum(w / 4 * multivariate_normal(m, c).pdf(theta)
+                              for w, m, c in zip(weights, means, covs)))
+
+        def loglike(theta):
+            return mixture(theta), [theta.sum()]
+
+        proposal = sn.gaussian_mixture_proposal(bounds, weights, means, covs,
+                                                loglike)
+        self.assertEqual(proposal.nDims, 3)
+        cubes = np.random.default_rng(5).uniform(size=(4000, 3))
+        thetas = proposal.prior.batch(cubes)
+        np.testing.assert_allclose(thetas[:50],
+                                   [proposal.prior(c) for c in cubes[:50]])
+        self.assertLess(abs((thetas[:, -1] == 1).mean() - 0.75), 0.03)
+
+        logl, phi = proposal.likelihood.batch(thetas)
+        np.testing.assert_allclose(phi[:, 0], thetas[:, :2].sum(axis=1))
+        np.testing.assert_allclose(logl, -2 * np.log(12), atol=1e-9)
+        self.assertAlmostEqual(proposal.likelihood(thetas[0])[0], logl[0])
+
+        correction = sn.gaussian_mixture_proposal(bounds, weights, means,
+                                                  covs).likelihood
+        theta = np.array([0.5, -0.5, 0])
+        self.assertAlmostEqual(correction(theta)[0],
+                               -2 * np.log(12) - mixture(theta[:2]))
+        self.assertRaises(ValueError, sn.gaussian_mixture_proposal, bounds,
+                          [1, 1, 1], means, covs)
+
+    def test_correlated_truncated_gaussian(self):
+        bounds = (-3, 3)
+        mean = np.array([1, -1])
+        covmat = 4 * np.array([[1, 0.9], [0.9, 1]])
+        proposal = sn.correlated_truncated_gaussian_proposal(bounds, mean,
+                                                             covmat)
+        cubes = np.random.default_rng(6).uniform(size=(1000, 2))
+        cubes[:2] = [[0, 0], [1, 1]]
+        thetas = proposal.prior.batch(cubes)
+        self.assertTrue(np.all((thetas >= -3) & (thetas <= 3)))
+        np.testing.assert_allclose(thetas[:2], [[-3, -3], [3, 3]])
+        np.testing.assert_allclose(thetas[10], proposal.prior(cubes[10]))
+
+        # The correction is log(uniform / q), and q integrates to one.
+        edges = np.linspace(-3, 3, 301)
+        centres = (edges[1:] + edges[:-1]) / 2
+        grid = np.stack(np.meshgrid(centres, centres), -1).reshape(-1, 2)
+        logl, _ = proposal.likelihood.batch(grid)
+        q = np.exp(-np.log(36) - logl)
+        self.assertAlmostEqual(q.sum() * 0.02**2, 1, places=4)
+        self.assertAlmostEqual(proposal.likelihood(grid[7])[0], logl[7])
+
+        diagonal = np.diag([1, 2])
+        correlated = sn.correlated_truncated_gaussian_proposal(bounds, mean,
+                                                               diagonal)
+        uncorrelated = sn.truncated_gaussian_proposal(bounds, mean, diagonal)
+        np.testing.assert_allclose(correlated.prior.batch(cubes[2:50]),
+                                   [uncorrelated.prior(c) for c in cubes[2:50]])
+
+    def test_truncated_gaussian_tails(self):
+        # The second parameter is confined to 20-22 sigma above its mean.
+        a, b = np.array([-3, 40]), np.array([3, 44])
+        proposal = sn.truncated_gaussian_proposal((a, b), np.array([1, 0]),
+                                                  np.diag([4, 4]))
+        cubes = np.random.default_rng(7).uniform(size=(1000, 2))
+        cubes[:2] = [[0, 0], [1, 1]]
+        thetas = proposal.prior.batch(cubes)
+        self.assertTrue(np.all((thetas >= a) & (thetas <= b)))
+        np.testing.assert_allclose(thetas[:2], [a, b])
+        np.testing.assert_allclose(thetas[10], proposal.prior(cubes[10]))
+        self.assertLess(np.median(thetas[:, 1]), 40.1)
+
+        # The correction is log(uniform / q), and q integrates to one.
+        edges = [np.linspace(a[0], b[0], 301), np.linspace(a[1], b[1], 2001)]
+        centres = [(e[1:] + e[:-1]) / 2 for e in edges]
+        grid = np.stack(np.meshgrid(*centres), -1).reshape(-1, 2)
+        logl, _ = proposal.likelihood.batch(grid)
+        self.assertTrue(np.all(np.isfinite(logl)))
+        q = np.exp(-np.log(24) - logl)
+        self.assertAlmostEqual(q.sum() * 0.02 * 0.002, 1, places=4)
+
+    def test_ndtri_exp_without_scipy_support(self):
+        # SciPy < 1.9 has no ndtri_exp.
+        import types
+        from supernest import utils
+        log_p = np.concatenate([-np.logspace(-300, 5, 1000),
+                                [0, -np.inf, -700, -746]])
+        np.testing.assert_allclose(utils._ndtri_exp(log_p),
+                                   utils.ndtri_exp(log_p), rtol=1e-12)
+        self.assertIsInstance(utils._ndtri_exp(-3.0), float)
+        old_scipy = types.SimpleNamespace(ndtri=utils.sp.ndtri,
+                                          log_ndtr=utils.sp.log_ndtr)
+        u = np.random.default_rng(8).uniform(size=100)
+        a, b = np.array([-3, 40]), np.array([3, 44])
+        expected = utils.truncated_ndtri(u[:, None], a, b)
+        scalar = utils.truncated_ndtri_scalar(u[0], 40.0, 44.0)
+        with mock.patch.object(utils, 'sp', old_scipy):
+            np.testing.assert_allclose(
+                utils.truncated_ndtri(u[:, None], a, b), expected,
+                rtol=1e-12)
+            self.assertAlmostEqual(
+                utils.truncated_ndtri_scalar(u[0], 40.0, 44.0), scalar,
+                places=12)
+
+    def test_power_gaussian_memoises_beta(self):
+        from supernest.kernels import numpy_backend as reference
+        mean, sigma = np.array([0.5, -1, 0]), np.array([1, 2, 0.5])
+        power = sn.proposals.PowerGaussian(mean, sigma, -3, 3, maxsize=2)
+        cubes = np.random.default_rng(4).uniform(size=(20, 3))
+        betas = np.linspace(0.01, 1, 20)
+        thetas = power.quantile(cubes, betas)
+        np.testing.assert_allclose(
+            thetas, reference.power_gaussian_quantile(cubes, mean, sigma, -3,
+                                                      3, betas))
+        for cube, theta, beta in zip(cubes, thetas, betas):
+            np.testing.assert_allclose(power.quantile(cube, beta), theta)
+            self.assertAlmostEqual(
+                power.log_pdf(theta, beta),
+                reference.power_gaussian_log_pdf(theta, mean, sigma, -3, 3,
+                                                 beta))
+        self.assertEqual(list(power._cache), [betas[-2], betas[-1]])
+        self.assertIs(power.terms(betas[-1]), power.terms(betas[-1]))
+
+    def test_power_gaussian_quantised_beta(self):
+        from supernest.kernels import numpy_backend as reference
+        mean, sigma = np.array([0.5, -1, 0]), np.array([1, 2, 0.5])
+        power = sn.proposals.PowerGaussian(mean, sigma, -3, 3, levels=16)
+        rng = np.random.default_rng(5)
+        cubes = rng.uniform(size=(1000, 3))
+        betas = power.beta(rng.uniform(size=1000), 1e-3, 1)
+        self.assertEqual(len(np.unique(betas)), 16)
+        np.testing.assert_allclose(np.unique(betas),
+                                   1e-3 + (1 - 1e-3) * (np.arange(16) + 0.5)
+                                   / 16)
+        thetas = power.quantile(cubes, betas)
+        log_pdfs = power.log_pdf(thetas, betas)
+        for cube, theta, beta, log_pdf in zip(cubes, thetas, betas,
+                                              log_pdfs):
+            np.testing.assert_allclose(power.quantile(cube, beta), theta)
+            self.assertEqual(power.log_pdf(theta, beta), log_pdf)
+        # The cached terms agree with the uncached kernels at the same
+        # beta: quantising beta costs no accuracy.
+        np.testing.assert_allclose(
+            thetas, reference.power_gaussian_quantile(cubes, mean, sigma, -3,
+                                                      3, betas))
+        np.testing.assert_allclose(
+            log_pdfs, reference.power_gaussian_log_pdf(thetas, mean, sigma,
+                                                       -3, 3, betas))
+        self.assertEqual(power.misses, 16)
+        self.assertGreater(power.hits, 100 * power.misses)
+        self.assertEqual(power.beta(1, 0, 1), 31 / 32)
+        self.assertEqual(power.beta(0, 0, 1), 1 / 32)
+
+    def test_proposals_pickle(self):
+        bounds, mean = (-5, 5), np.zeros(3)
+        covmat = np.array([[1, 0.3, 0], [0.3, 1, 0], [0, 0, 0.5]])
+        proposals = [
+            sn.gaussian_proposal(bounds, mean, covmat, _loglike),
+            sn.truncated_gaussian_proposal(bounds, mean, np.diag([1, 2, 3]),
+                                           _loglike),
+            sn.correlated_truncated_gaussian_proposal(bounds, mean, covmat),
+            sn.gaussian_mixture_proposal(bounds, [0.3, 0.7], [mean, mean + 1],
+                                         covmat, _loglike),
+            sn.AdaptiveProposal(bounds, mean, covmat, _loglike),
+        ]
+        proposals.append(sn.superimpose(proposals[:3], nDims=3))
+        cubes = np.random.default_rng(5).uniform(size=(10, 6))
+        for proposal in proposals:
+            copy = pickle.loads(pickle.dumps(proposal))
+            points = cubes[:, :proposal.nDims]
+            np.testing.assert_array_equal(copy.prior.batch(points),
+                                          proposal.prior.batch(points))
+            theta = proposal.prior(points[0])
+            self.assertEqual(copy.likelihood(theta)[0],
+                             proposal.likelihood(theta)[0])
+
+        superposition = proposals[-1]
+        with ProcessPoolExecutor(2) as pool:
+            thetas = list(pool.map(superposition.prior, cubes))
+        np.testing.assert_array_equal(
+            thetas, [superposition.prior(cube) for cube in cubes])
+
     try:
         @hypothesis.given(hypothesis.extra.numpy.arrays(np.float64, (2)))
         def test_constructing_proposal(self, arr):
@@ -31,6 +288,9 @@ class TestProposal(unittest.TestCase):
         print(e)
 
 
+def _loglike(theta):
+    return -theta @ theta / 2, []
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import numpy as np
+import supernest as sn
+from supernest.sampler import nested_sample
+
+
+class TestReferenceSampler(unittest.TestCase):
+    def setUp(self):
+        self.nDims = 3
+        self.bounds = (-5, 5)
+
+        def loglike(theta):
+            return (-theta @ theta / 2 - self.nDims / 2 * np.log(2 * np.pi),
+                    [theta.sum()])
+
+        self.loglike = loglike
+        self.logZ = -self.nDims * np.log(self.bounds[1] - self.bounds[0])
+
+    def test_uniform_evidence(self):
+        a, b = self.bounds
+        result = nested_sample(lambda cube: a + (b - a) * cube, self.loglike,
+                               self.nDims, nlive=200, seed=0)
+        self.assertLess(abs(result.logZ - self.logZ), 4 * result.logZerr)
+        self.assertEqual(len(result.logL), result.ndead + result.nlive)
+        self.assertTrue(np.all(np.diff(result.logL[:result.ndead]) >= 0))
+        np.testing.assert_allclose(result.derived[:, 0],
+                                   result.samples.sum(axis=1))
+        self.assertAlmostEqual(result.weights.sum(), 1)
+
+    def test_gaussian_proposal_evidence(self):
+        proposal = sn.gaussian_proposal(self.bounds, np.zeros(self.nDims),
+                                        2 * np.eye(self.nDims), self.loglike)
+        result = nested_sample(proposal.prior, proposal.likelihood,
+                               proposal.nDims, nlive=200, seed=0)
+        self.assertLess(abs(result.logZ - self.logZ), 4 * result.logZerr)
+
+    def uniform(self):
+        a, b = self.bounds
+
+        def quantile(cube):
+            return a + (b - a) * cube
+
+        return sn.proposals.Prior(quantile, quantile)
+
+    def superpositions(self, selection):
+        mean = np.full(self.nDims, 0.3)
+        uniform = (self.uniform(), self.loglike)
+        gaussian = sn.gaussian_proposal(self.bounds, mean,
+                                        2 * np.eye(self.nDims), self.loglike)
+        # Too narrow, and off centre, so that its likelihood rises
+        # towards the edges of the hypercube.
+        truncated = sn.truncated_gaussian_proposal(
+            self.bounds, -mean, np.diag([1.0, 2, 1]), self.loglike)
+        return {
+            'uniform+gaussian': sn.superimpose(
+                [uniform, gaussian], self.nDims, selection),
+            'gaussian+truncated': sn.superimpose(
+                [gaussian, truncated], self.nDims, selection),
+            'all three': sn.superimpose(
+                [uniform, gaussian, truncated], self.nDims, selection)}
+
+    def test_superposition_evidence(self):
+        proposals = self.superpositions('scan')
+        proposals['all three, cumulative'] = self.superpositions(
+            'cumulative')['all three']
+        for name, proposal in proposals.items():
+            with self.subTest(proposal=name):
+                result = nested_sample(proposal.prior, proposal.likelihood,
+                                       proposal.nDims, nlive=100, seed=1)
+                self.assertLess(abs(result.logZ - self.logZ),
+                                4 * result.logZerr)
+                # Rejection from one ellipsoid took 130 to 350 calls.
+                self.assertLess(result.nlike, 100 * result.ndead)
+
+    def test_superposition_speed_up(self):
+        # Sampled the same way, with as many slice steps per point, a
+        # Gaussian proposal needs fewer likelihood calls than the
+        # uniform prior.
+        proposal = self.superpositions('scan')['uniform+gaussian']
+        uniform, superposition = [
+            nested_sample(prior, likelihood, nDims, nlive=100, seed=2,
+                          method='slice', repeats=6)
+            for prior, likelihood, nDims in [
+                (self.uniform(), self.loglike, self.nDims), proposal]]
+        self.assertLess(superposition.nlike, 0.9 * uniform.nlike)
+        for result in uniform, superposition:
+            self.assertLess(abs(result.logZ - self.logZ),
+                            4 * result.logZerr)
+
+    def test_flat_likelihood_terminates(self):
+        result = nested_sample(lambda cube: cube, lambda theta: (0.0, []), 2,
+                               nlive=50, seed=2)
+        self.assertAlmostEqual(result.logZ, 0)
+        self.assertAlmostEqual(result.weights.sum(), 1)
+
+        # A plateau at the peak, reached part of the way through.
+        def plateau(theta):
+            return min(-theta @ theta / 2, -0.5), []
+
+        result = nested_sample(lambda cube: 6 * cube - 3, plateau, 2,
+                               nlive=100, seed=3)
+        self.assertLess(abs(result.logZ + 1.84612), 4 * result.logZerr)
+
+    def test_gives_up_after_max_draws(self):
+        with self.assertRaisesRegex(RuntimeError, 'No replacement'), \
+                np.errstate(invalid='ignore'):
+            nested_sample(lambda cube: cube, lambda theta: (np.nan, []), 2,
+                          nlive=50, seed=2, max_draws=10000)
+
+    def test_seed_is_reproducible(self):
+        a, b = self.bounds
+        first, second = [nested_sample(lambda cube: a + (b - a) * cube,
+                                       self.loglike, self.nDims, nlive=50,
+                                       seed=1) for _ in range(2)]
+        self.assertEqual(first.logZ, second.logZ)
+        self.assertEqual(first.nlike, second.nlike)
+
+    def test_adaptive_proposal(self):
+        mean = np.array([0.5, -0.5, 0.2])
+
+        def loglike(theta):
+            delta = theta - mean
+            return (-delta @ delta / 2 - self.nDims / 2 * np.log(2 * np.pi),
+                    [])
+
+        adaptive = sn.AdaptiveProposal(self.bounds, np.full(self.nDims, 2.0),
+                                       4 * np.eye(self.nDims), loglike)
+        calls = []
+
+        def dumper(live, dead, logweights, logZ, logZerr):
+            calls.append((live.shape, dead.shape, len(logweights)))
+            adaptive(live, dead, logweights, logZ, logZerr)
+
+        first = nested_sample(adaptive.prior, adaptive.likelihood,
+                              adaptive.nDims, nlive=200, seed=0,
+                              dumper=dumper)
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(calls[0][0], (200, self.nDims + 2))
+        self.assertEqual(calls[-1][1][0], calls[-1][2])
+        adaptive.rebuild()
+        np.testing.assert_allclose(adaptive.mean, mean, atol=0.3)
+        np.testing.assert_allclose(adaptive.covmat, np.eye(self.nDims),
+                                   atol=0.4)
+        second = nested_sample(adaptive.prior, adaptive.likelihood,
+                               adaptive.nDims, nlive=200, seed=1)
+        for result in first, second:
+            self.assertLess(abs(result.logZ - self.logZ), 4 * result.logZerr)
+        self.assertLess(second.ndead, first.ndead)
+
+    def test_nbatch_validation(self):
+        self.assertRaises(ValueError, nested_sample, lambda cube: cube,
+                          self.loglike, self.nDims, nlive=10, nbatch=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,6 +12,83 @@ class TestSuperposition(unittest.TestCase):
     def test_proposal_calculates_nDims(self):
         self.assertEqual(sn.superimpose([self.proposal, self.proposal], nDims=1).nDims, 3)
 
+    def test_batch_prior_matches_pointwise(self):
+        bounds = (-5, 5)
+        mean = np.array([0.5, -0.5, 1])
+        covmat = np.diag([1, 2, 3])
+        uniform = (lambda cube: bounds[0] + (bounds[1] - bounds[0]) * cube,
+                   lambda theta: (0, []))
+        proposal = sn.superimpose(
+            [uniform, sn.gaussian_proposal(bounds, mean, covmat),
+             sn.truncated_gaussian_proposal(bounds, mean, covmat)], nDims=3)
+        cubes = np.random.default_rng(0).uniform(size=(50, proposal.nDims))
+        expected = np.array([proposal.prior(c) for c in cubes])
+        np.testing.assert_allclose(proposal.prior.batch(cubes), expected)
+
+    def test_prior_writes_into_out(self):
+        proposals = [sn.gaussian_proposal((-5, 5), np.zeros(2) + i, np.eye(2))
+                     for i in range(3)]
+        for selection in ('scan', 'cumulative'):
+            proposal = sn.superimpose(proposals, nDims=2, selection=selection)
+            cubes = np.random.default_rng(5).uniform(size=(50, proposal.nDims))
+            expected = proposal.prior.batch(cubes)
+            out = np.empty(proposal.nDims)
+            for cube, row in zip(cubes, expected):
+                self.assertIs(proposal.prior(cube, out), out)
+                np.testing.assert_array_equal(out, row)
+            out = np.full(cubes.shape, np.nan)
+            self.assertIs(proposal.prior.batch(cubes, out), out)
+            np.testing.assert_array_equal(out, expected)
+
+    def test_component_choice_is_stateless(self):
+        import random
+        random.seed(42)
+        state = random.getstate()
+        points = np.random.default_rng(3).uniform(size=(10000, 4))
+        u = sn.utils.hash_to_uniform(points)
+        self.assertEqual(random.getstate(), state)
+        np.testing.assert_array_equal(
+            u, [sn.utils.hash_to_uniform(p) for p in points])
+        np.testing.assert_array_equal(u, sn.utils.hash_to_uniform(points.copy()))
+        self.assertTrue(np.all((0 <= u) & (u < 1)))
+        self.assertAlmostEqual(u.mean(), 0.5, places=1)
+        self.assertAlmostEqual(sn.utils.hash_to_uniform(np.array([0.25, 0.5])),
+                               0.9304779760247345)
+
+    def test_cumulative_selection(self):
+        proposals = [sn.gaussian_proposal(self.bounds, self.mean + i, self.stdev)
+                     for i in range(50)]
+        proposal = sn.superimpose(proposals, nDims=1, selection='cumulative')
+        cubes = np.random.default_rng(4).uniform(size=(200, proposal.nDims))
+        batch = proposal.prior.batch(cubes)
+        np.testing.assert_allclose(batch, [proposal.prior(c) for c in cubes])
+        edges = np.cumsum(cubes[:, 1:-1], axis=1)
+        rand = sn.utils.hash_to_uniform(cubes[:, :1]) * np.maximum(edges[:, -1], 1)
+        np.testing.assert_array_equal(batch[:, -1], (edges <= rand[:, None]).sum(1))
+        self.assertRaises(ValueError, sn.superimpose, proposals, selection='alias')
+
+    def test_batch_likelihood_matches_pointwise(self):
+        bounds = (-5, 5)
+        mean = np.array([0.5, -0.5, 1])
+        covmat = np.diag([1, 2, 3])
+
+        def loglike(theta):
+            return -theta @ theta / 2, [theta.sum()]
+
+        uniform = (lambda cube: bounds[0] + (bounds[1] - bounds[0]) * cube,
+                   loglike)
+        proposal = sn.superimpose(
+            [uniform, sn.gaussian_proposal(bounds, mean, covmat, loglike),
+             sn.truncated_gaussian_proposal(bounds, mean, covmat, loglike)],
+            nDims=3)
+        cubes = np.random.default_rng(1).uniform(size=(50, proposal.nDims))
+        thetas = proposal.prior.batch(cubes)
+        logl, phi = proposal.likelihood.batch(thetas)
+        for theta, ll, ph in zip(thetas, logl, phi):
+            expected_ll, expected_phi = proposal.likelihood(theta)
+            self.assertAlmostEqual(ll, expected_ll)
+            np.testing.assert_allclose(ph, expected_phi)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,166 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+from supernest.framework import sweep
+from supernest.framework.backends import DynestyBackend, ReferenceBackend
+from supernest.framework.sweep import Sweep
+
+BOX = 'supernest.framework.gaussian_models.BoxUniformPrior'
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'sweep.sqlite')
+        self.config = {
+            'models': {
+                'wide': {'class': BOX,
+                         'args': [[-6, 6], [0.5, -0.5],
+                                  [[1, 0.3], [0.3, 0.5]]]},
+                'narrow': {'class': BOX,
+                           'args': [[-6, 6], [0, 1], [[0.1, 0], [0, 0.2]]]},
+            },
+            'settings': {'live_points': [20, 30]},
+            'repeats': 2,
+            'seed': 7,
+            'backend': 'reference',
+            'path': self.path,
+        }
+        self.config_path = os.path.join(directory.name, 'sweep.json')
+        with open(self.config_path, 'w') as f:
+            json.dump(self.config, f)
+
+    def sweep(self, **kwargs):
+        return Sweep.from_config(dict(self.config, **kwargs))
+
+    def keys(self, **kwargs):
+        return [cell[0] for cell in self.sweep(**kwargs).cells()]
+
+    def test_from_config(self):
+        grid = Sweep.from_config(self.config_path)
+        self.assertEqual(list(grid.models), ['wide', 'narrow'])
+        np.testing.assert_array_equal(grid.models['narrow'].mu, [0, 1])
+        self.assertIsInstance(grid.backend, ReferenceBackend)
+        cells = grid.cells()
+        self.assertEqual(len(cells), 2 * 2 * 2)
+        self.assertEqual(len({key for key, *_ in cells}), len(cells))
+        self.assertEqual({(name, settings['live_points'])
+                          for _, name, settings, _ in cells},
+                         {(name, n) for name in ['wide', 'narrow']
+                          for n in [20, 30]})
+        self.assertEqual(len({seed for *_, seed in cells}), 2)
+        self.assertEqual(grid.pending(), cells)
+        self.assertEqual(cells, self.sweep().cells())
+
+    def test_run_skips_completed_cells(self):
+        grid = self.sweep()
+        results = grid.run(processes=1)
+        self.assertEqual(len(results), len(grid.cells()))
+        self.assertEqual(sorted(results.key),
+                         sorted(key for key, *_ in grid.cells()))
+        self.assertEqual(sorted(results.live_points), [20] * 4 + [30] * 4)
+        self.assertTrue(np.all(results.logZerr > 0))
+        self.assertTrue(np.all(np.isfinite(results.D)))
+        self.assertEqual(grid.pending(), [])
+        with mock.patch.object(sweep, '_run_cell') as run_cell:
+            again = self.sweep().run(processes=1)
+        run_cell.assert_not_called()
+        self.assertEqual(again.to_dict(), results.to_dict())
+
+    def test_interrupted_sweep_resumes(self):
+        run_cell = sweep._run_cell
+        calls = []
+
+        def interrupt(*args):
+            calls.append(args)
+            if len(calls) > 3:
+                raise KeyboardInterrupt
+            return run_cell(*args)
+
+        with mock.patch.object(sweep, '_run_cell', interrupt):
+            self.assertRaises(KeyboardInterrupt, self.sweep().run,
+                              processes=1)
+        grid = self.sweep()
+        self.assertEqual(len(grid.results()), 3)
+        self.assertEqual(len(grid.pending()), 5)
+        with mock.patch.object(sweep, '_run_cell',
+                               side_effect=run_cell) as resumed:
+            results = grid.run(processes=1)
+        self.assertEqual(resumed.call_count, 5)
+        self.assertEqual(len(results), 8)
+        self.assertEqual(grid.pending(), [])
+
+    def test_key_changes_with_arguments(self):
+        keys = self.keys()
+        models = json.loads(json.dumps(self.config['models']))
+        models['narrow']['args'][1] = [0, 1.5]
+        changed = self.keys(models=models)
+        self.assertEqual(changed[:4], keys[:4])
+        self.assertTrue(set(changed[4:]).isdisjoint(keys))
+        self.assertEqual(self.keys(backend=ReferenceBackend()), keys)
+        backends = [ReferenceBackend(max_draws=1000),
+                    ReferenceBackend(max_draws=2000), DynestyBackend(),
+                    DynestyBackend(bound='single'),
+                    DynestyBackend(queue_size=4)]
+        seen = set(keys)
+        for backend in backends:
+            with self.subTest(backend=backend.fingerprint):
+                changed = set(self.keys(backend=backend))
+                self.assertTrue(changed.isdisjoint(seen))
+                seen |= changed
+        # The pool does not change the results.
+        self.assertEqual(self.keys(backend=DynestyBackend(pool=object())),
+                         self.keys(backend=DynestyBackend()))
+        self.assertTrue(set(self.keys(seed=8)).isdisjoint(keys))
+        renamed = {'other': self.config['models']['wide'],
+                   'narrow': self.config['models']['narrow']}
+        self.assertTrue(set(self.keys(models=renamed)[:4]).isdisjoint(keys))
+        self.assertEqual(self.keys(models=renamed)[4:], keys[4:])
+        self.assertTrue(set(self.keys(settings={'live_points': [40]}))
+                        .isdisjoint(keys))
+
+    def test_results_are_those_of_the_sweep(self):
+        self.sweep().run(processes=1)
+        other = self.sweep(settings={'live_points': [25]}, repeats=1)
+        results = other.run(processes=1)
+        self.assertEqual(len(results), len(other.cells()))
+        self.assertEqual(list(results.live_points), [25, 25])
+        self.assertEqual(len(self.sweep().results()), 8)
+
+    def test_equal_models_with_different_names(self):
+        models = {'first': self.config['models']['wide'],
+                  'second': self.config['models']['wide']}
+        grid = self.sweep(models=models, settings={'live_points': [20]},
+                          repeats=1)
+        self.assertEqual(len({key for key, *_ in grid.cells()}), 2)
+        results = grid.run(processes=1)
+        self.assertEqual(sorted(results.model), ['first', 'second'])
+
+    def test_main(self):
+        self.config['settings'] = {'live_points': [20]}
+        self.config['repeats'] = 1
+        with open(self.config_path, 'w') as f:
+            json.dump(self.config, f)
+        stdout = io.StringIO()
+        with mock.patch.object(sys, 'argv', ['sweep', self.config_path,
+                                             '-j', '1']), \
+                contextlib.redirect_stdout(stdout):
+            sweep.main()
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('live_points', lines[0])
+        self.assertEqual(sorted(line.split()[2] for line in lines[1:]),
+                         ['narrow', 'wide'])
+        self.assertEqual(self.sweep(settings={'live_points': [20]},
+                                    repeats=1).pending(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,38 +1,98 @@
+import importlib
+import importlib.util
+import math
+import sys
+import types
 import numpy as np
 import warnings
 
 
+class LazyModule(types.ModuleType):
+    """A stand-in for the module of the same name, which is imported on
+    first attribute access, and whose namespace is then copied over, so
+    that later lookups cost no more than on the module itself."""
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    r"""The module `name`, to be executed on first attribute access.
+
+    SciPy's subpackages and Numba take longer to import than the rest
+    of supernest together, and every MPI rank and pool worker pays for
+    them, so they are imported when they are first used instead.
+    Modules that are already imported are returned as they are.
+
+    If the parent package is not imported either, nothing is looked up
+    until then, not even the parent, so that a missing optional
+    dependency is only an error for the code that uses it. The module
+    is then stood in for by a `LazyModule`.
+    """
+    try:
+        return sys.modules[name]
+    except KeyError:
+        pass
+    parent, _, child = name.rpartition('.')
+    if parent not in sys.modules:
+        return LazyModule(name)
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    setattr(sys.modules[parent], child, module)
+    return module
+
+
+sp = lazy_import('scipy.special')
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+
+
 def eitheriter(ab):
     a, b = ab
     return hasattr(a, '__iter__') or hasattr(b, '__iterb__')
 
 
+def _at_edges(cube):
+    # The coordinates that `np.isclose` to 0, and to 1.
+    cube = np.asarray(cube)
+    return np.abs(cube) <= 1e-8, np.abs(cube - 1) <= 1e-8 + 1e-5
+
+
 def snap_to_edges(cube, theta, a, b):
-    ret = theta
-    if np.any(np.isclose(cube, 0)) or np.any(np.isclose(cube, 1)):
-        for i in range(len(cube)):
-            if np.isclose(cube[i], 0):
-                ret[i] = a[i] if hasattr(a, '__iter__') else a
-            elif np.isclose(cube[i], 1):
-                ret[i] = b[i] if hasattr(b, '__iter__') else b
-            else:
-                pass
-    return ret
+    r"""Set the parameters whose hypercube coordinates are at 0 or 1 to
+    the bounds `a` or `b`, in place.
+
+    Works for a single point, and for an (N, D) array of points.
+    """
+    low, high = _at_edges(cube)
+    if low.any() or high.any():
+        theta[...] = np.where(low, a, np.where(high, b, theta))
+    return theta
 
 
 def guard_against_inf_nan(cube, theta, logzero, loginf):
-    ret = theta
-    if not np.all(np.isfinite(ret)):
-        for i in range(len(cube)):
-            if np.isclose(cube[i], 0):
-                ret[i] = logzero
-            elif np.isclose(cube[i], 1):
-                ret[i] = loginf
-            elif not np.isfinite(ret[i]):
-                ret[i] = logzero
-            else:
-                pass
-    return ret
+    r"""Replace the parameters of points with infinite or NaN values,
+    in place: those whose hypercube coordinate is at 1 by `loginf`,
+    and those at 0, or not finite, by `logzero`.
+
+    Works for a single point, and for an (N, D) array of points, of
+    which only the points with non-finite values are changed.
+    """
+    bad = ~np.isfinite(theta)
+    if bad.any():
+        points = bad.any(axis=-1, keepdims=True)
+        low, high = _at_edges(cube)
+        theta[points & high & ~low] = loginf
+        theta[points & (low | bad & ~high)] = logzero
+    return theta
 
 
 def process_stdev(stdev, mean, bounds):
@@ -67,3 +127,198 @@ def process_stdev(stdev, mean, bounds):
                 f'len(a)={len(a)} vs len(mean)={len(mean)}')
 
     return stdev, a, b
+
+
+def _splitmix64(z):
+    z = z + _GOLDEN_GAMMA
+    z = (z ^ (z >> np.uint64(30))) * _MIX_1
+    z = (z ^ (z >> np.uint64(27))) * _MIX_2
+    return z ^ (z >> np.uint64(31))
+
+
+def hash_to_uniform(x, seed=0):
+    r"""Map points deterministically to uniform deviates in [0, 1).
+
+    The little-endian bytes of each float64 coordinate are folded into
+    a 64-bit state with the splitmix64 finaliser, so the result depends
+    only on the bits of `x` and the `seed`. It is the same in every
+    process and on every platform, and no global random state is used
+    or modified.
+
+    Parameters
+    ----------
+    x: array-like
+        A single point of shape (D,), or (N, D) points.
+
+    seed: int
+        Selects an independent stream of deviates.
+
+    Returns
+    -------
+    u: float or np.ndarray
+        One deviate per point: a float for a single point, an (N,)
+        array otherwise.
+    """
+    x = np.asarray(x, dtype='<f8')
+    bits = np.ascontiguousarray(x).view('<u8').reshape(-1, x.shape[-1])
+    h = np.full(len(bits), seed, dtype=np.uint64)
+    for column in bits.T:
+        h = _splitmix64(h ^ column)
+    u = (h >> np.uint64(11)) * 2.0 ** -53
+    return u[0] if x.ndim == 1 else u.reshape(x.shape[:-1])
+
+
+def choice_probabilities(choice_params, out=None):
+    r"""Normalise the choice parameters along the last axis, into `out`
+    if it is given.
+
+    A single choice parameter is used as is, as are choice parameters
+    that sum to zero.
+    """
+    if choice_params.shape[-1] == 1:
+        norm = 1
+    else:
+        norm = choice_params.sum(axis=-1, keepdims=True)
+        norm[norm == 0] = 1
+    return np.divide(choice_params, norm, out=out)
+
+
+def first_exceeded(probs, rand):
+    r"""Pick a component by a linear scan over `probs`.
+
+    The index is that of the first probability that `rand` exceeds,
+    or `len(probs)` if there is no such probability. Works for a
+    single point as well as along the rows of an (N, K-1) array.
+    """
+    above = np.asarray(rand)[..., None] > probs
+    return np.where(above.any(axis=-1), above.argmax(axis=-1), probs.shape[-1])
+
+
+def cumulative_choice(weights, rand):
+    r"""Pick a component by bisection of the cumulative weights.
+
+    The K-1 `weights` are the probabilities of the first K-1
+    components, and the last component gets whatever is left of
+    unity. Weights that sum to more than one are rescaled to sum to
+    one. Component `i` is picked when `rand` lies in
+    [cumsum[i-1], cumsum[i]).
+
+    Works for a single point, in which case this is a single
+    `np.searchsorted`, and along the rows of an (N, K-1) array, for
+    which the bisection is vectorised over rows. Either way it costs
+    O(log K) comparisons per point after the O(K) cumulative sum.
+    Since the weights differ from point to point, the cumulative sum
+    cannot be shared between points, and neither could an alias table.
+    """
+    edges = np.cumsum(weights, axis=-1, dtype=np.float64)
+    if edges.shape[-1]:
+        # Rescale the deviate rather than the K-1 edges.
+        rand = rand * np.maximum(edges[..., -1], 1)
+    if edges.ndim == 1:
+        return np.searchsorted(edges, rand, side='right')
+    rows, width = np.arange(len(edges)), edges.shape[1]
+    lo = np.zeros(len(edges), dtype=np.intp)
+    hi = np.full(len(edges), width, dtype=np.intp)
+    active = lo < hi
+    while active.any():
+        mid = (lo + hi) // 2
+        below = edges[rows, np.minimum(mid, width - 1)] <= rand
+        lo = np.where(active & below, mid + 1, lo)
+        hi = np.where(active & ~below, mid, hi)
+        active = lo < hi
+    return lo
+
+
+def _log1mexp(x):
+    # log(1 - exp(x)) for x <= 0, accurate on either side of -log(2).
+    x = np.asarray(x, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        return np.where(x > -np.log(2), np.log(-np.expm1(x)),
+                        np.log1p(-np.exp(x)))
+
+
+def ndtri_exp(log_p):
+    r"""The standard normal quantile of `exp(log_p)`.
+
+    This is `scipy.special.ndtri_exp`, which SciPy only has from 1.9,
+    and which needs Python 3.8. With older versions, `_ndtri_exp` is
+    used instead.
+    """
+    try:
+        function = sp.ndtri_exp
+    except AttributeError:
+        function = _ndtri_exp
+    return function(log_p)
+
+
+def _ndtri_exp(log_p):
+    # ndtri(exp(log_p)), from the upper tail near log_p = 0. Below
+    # log_p = -700, where exp(log_p) loses precision or underflows, the
+    # asymptotic expansion of the lower tail is refined by Newton's
+    # method on log_ndtr, which is exact to rounding after four steps.
+    log_p = np.asarray(log_p, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(log_p > -np.log(2), -sp.ndtri(-np.expm1(log_p)),
+                     sp.ndtri(np.exp(log_p)))
+        tail = np.isfinite(log_p) & (log_p < -700)
+        if np.any(tail):
+            target = log_p[tail]
+            t = -2 * target
+            x = -np.sqrt(t - np.log(t) - np.log(2 * np.pi))
+            for _ in range(4):
+                log_cdf = sp.log_ndtr(x)
+                x = x - (log_cdf - target) * np.exp(
+                    x ** 2 / 2 + np.log(2 * np.pi) / 2 + log_cdf)
+            z[tail] = x
+    return z[()]
+
+
+def log_ndtr_diff(a, b):
+    r"""Log of the standard normal probability of [a, b], for a <= b.
+
+    Computed as log(Phi(b) - Phi(a)) from `scipy.special.log_ndtr`,
+    on whichever side of zero keeps both ends in the lower tail, so
+    that there is no cancellation however far in either tail the
+    interval lies.
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64),
+                               np.asarray(b, dtype=np.float64))
+    flip = a > 0
+    lo, hi = np.where(flip, -b, a), np.where(flip, -a, b)
+    log_hi = sp.log_ndtr(hi)
+    return log_hi + _log1mexp(sp.log_ndtr(lo) - log_hi)
+
+
+def truncated_ndtri(u, a, b):
+    r"""Quantile `u` of the standard normal truncated to [a, b].
+
+    Works in log-probabilities, on the same side of zero as
+    `log_ndtr_diff`, so that intervals deep in either tail keep their
+    precision. The result is clipped to [a, b] against rounding, so
+    that u = 0 and u = 1 map to the bounds exactly.
+    """
+    u, a, b = np.broadcast_arrays(np.asarray(u, dtype=np.float64),
+                                  np.asarray(a, dtype=np.float64),
+                                  np.asarray(b, dtype=np.float64))
+    flip = a > 0
+    lo, hi = np.where(flip, -b, a), np.where(flip, -a, b)
+    u = np.where(flip, 1 - u, u)
+    with np.errstate(divide='ignore'):
+        log_p = np.logaddexp(sp.log_ndtr(lo),
+                             np.log(u) + log_ndtr_diff(lo, hi))
+    z = np.clip(ndtri_exp(log_p), lo, hi)
+    return np.where(flip, -z, z)
+
+
+def truncated_ndtri_scalar(u, a, b):
+    r"""`truncated_ndtri` for Python floats, without array overhead."""
+    sign = 1
+    if a > 0:
+        u, a, b, sign = 1 - u, -b, -a, -1
+    log_lo, log_hi = sp.log_ndtr(a), sp.log_ndtr(b)
+    x = log_lo - log_hi
+    log_diff = log_hi + (math.log(-math.expm1(x)) if x > -math.log(2)
+                         else math.log1p(-math.exp(x)))
+    log_p = float(np.logaddexp(log_lo, math.log(u) + log_diff)) \
+        if u > 0 else log_lo
+    return sign * min(max(float(ndtri_exp(log_p)), a), b)